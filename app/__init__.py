@@ -7,6 +7,7 @@ from flask_migrate import Migrate
 from app.models import db
 from app.utils.spotify import SpotifyAPI
 from app.utils.chatgpt import ChatGPT
+from app.utils.mood_engine import rule_set_from_config
 from config import config
 
 # Initialize extensions globally
@@ -28,6 +29,10 @@ def create_app(config_name='development'):
     
     app.config.from_object(config[config_name])
 
+    # Compile the configured mood rules now, so a bad MOOD_RULES or
+    # MOOD_RULES_VERSION stops the app at startup instead of failing ingests
+    rule_set_from_config(app.config)
+
     # Secret key
     app.secret_key = app.config.get('SECRET_KEY')
     print("app.secret_key:", app.secret_key)
@@ -55,5 +60,9 @@ def create_app(config_name='development'):
     from app.routes.admin_routes import admin_bp
     app.register_blueprint(admin_bp)
 
+    # Maintenance commands (flask rescore-moods, ...)
+    from app.cli import register_commands
+    register_commands(app)
+
 
     return app
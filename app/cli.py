@@ -0,0 +1,92 @@
+# app/cli.py
+
+import click
+
+from app.services.gpt_batch import apply_batch, load_manifest, poll_batch, prepare_batch, run_batch, submit_batch
+from app.services.mood_scoring import rescore_audio_features
+
+
+def register_commands(app):
+    """
+    Attach maintenance commands to the `flask` CLI.
+    """
+
+    @app.cli.command('rescore-moods')
+    @click.option('--chunk-size', default=5000, show_default=True, help='Rows scored and committed per round.')
+    @click.option('--all', 'rescore_all', is_flag=True, help='Also re-score rows already on the current rules version.')
+    def rescore_moods(chunk_size, rescore_all):
+        """Re-score AudioFeatures moods scored under older mood rules."""
+        result = rescore_audio_features(chunk_size=chunk_size, only_stale=not rescore_all)
+        click.echo(f"✅ Re-scored {result['scanned']} rows with rules {result['version']}, "
+                   f"{result['changed']} moods changed")
+
+    @app.cli.group('gpt-batch')
+    @click.option('--dir', 'workdir', default=None, help='Job directory (defaults to GPT_BATCH_DIR).')
+    @click.pass_context
+    def gpt_batch(ctx, workdir):
+        """Backfill missing Track genres/moods through the OpenAI Batch API."""
+        ctx.obj = workdir or app.config.get('GPT_BATCH_DIR')
+        if not ctx.obj:
+            raise click.ClickException("No job directory; pass --dir or set GPT_BATCH_DIR")
+
+    @gpt_batch.command('prepare')
+    @click.option('--limit', type=int, default=None, help='Scan at most this many distinct tracks.')
+    @click.option('--chunk-size', type=int, default=None, help='Tracks per request (defaults to OPENAI_BATCH_SIZE).')
+    @click.option('--force', is_flag=True, help='Replace a job that was not applied yet.')
+    @click.pass_obj
+    def prepare(workdir, limit, chunk_size, force):
+        """Write the batch input file for tracks missing a genre or mood."""
+        from app import gpt
+        try:
+            manifest = prepare_batch(workdir, gpt, limit=limit, chunk_size=chunk_size, force=force)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"✅ {len(manifest['chunks'])} requests written to {workdir}")
+
+    @gpt_batch.command('submit')
+    @click.pass_obj
+    def submit(workdir):
+        """Upload the input file and create the batch."""
+        from app import gpt
+        _echo_state(_step(submit_batch, workdir, gpt))
+
+    @gpt_batch.command('poll')
+    @click.option('--wait', is_flag=True, help='Keep polling until the batch is finished.')
+    @click.option('--interval', default=30.0, show_default=True, help='Seconds between polls.')
+    @click.pass_obj
+    def poll(workdir, wait, interval):
+        """Check the batch and download its results once it has completed."""
+        from app import gpt
+        _echo_state(_step(poll_batch, workdir, gpt, wait=wait, interval=interval))
+
+    @gpt_batch.command('apply')
+    @click.pass_obj
+    def apply(workdir):
+        """Write the downloaded labels onto Track rows and the catalog."""
+        _echo_state(_step(apply_batch, workdir))
+
+    @gpt_batch.command('run')
+    @click.option('--interval', default=30.0, show_default=True, help='Seconds between polls.')
+    @click.option('--timeout', type=float, default=None, help='Stop waiting after this many seconds (resume later).')
+    @click.pass_obj
+    def run(workdir, interval, timeout):
+        """Prepare if needed, then submit, wait for and apply the batch (resumes an interrupted job)."""
+        from app import gpt
+        manifest = load_manifest(workdir)
+        if manifest is None or manifest['state'] == 'applied':
+            prepare_batch(workdir, gpt)
+        _echo_state(_step(run_batch, workdir, gpt, interval=interval, timeout=timeout))
+
+
+def _step(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+
+def _echo_state(manifest):
+    click.echo(f"Batch job is {manifest['state']}"
+               + (f" (batch {manifest['batch_id']}: {manifest['batch_status']})" if manifest.get('batch_id') else ""))
+    if manifest.get('applied'):
+        click.echo(f"✅ Applied {manifest['applied']['genres']} genres and {manifest['applied']['moods']} moods")
@@ -116,4 +116,116 @@ class AudioFeatures(db.Model):
     tempo = db.Column(db.Float)
     duration_ms = db.Column(db.Integer)
     time_signature = db.Column(db.Integer)
-    mood = db.Column(db.String(20))
\ No newline at end of file
+    mood = db.Column(db.String(20))
+    mood_rules_version = db.Column(db.String(20), index=True)  # MoodRuleSet.version that produced mood
+
+class TrackAnnotation(db.Model):
+    """
+    Global, user-independent GPT labels for a Spotify track, so the same song
+    is never classified twice across users.
+    """
+    __tablename__ = 'track_annotation'
+
+    id = db.Column(db.String(50), primary_key=True)  # Spotify track ID
+    genre = db.Column(db.String(100))
+    mood = db.Column(db.String(20))
+    model = db.Column(db.String(50))  # OpenAI model that produced the labels
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class IngestJob(db.Model):
+    """
+    Database-backed queue entry for a background Spotify ingest + GPT insights run.
+    """
+    __tablename__ = 'ingest_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(50), db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), default='queued', index=True)  # 'queued', 'running', 'done', 'failed'
+    stage = db.Column(db.String(100))  # human-readable progress step
+    progress = db.Column(db.Integer, default=0)  # percent complete
+    attempts = db.Column(db.Integer, default=0)
+    worker_id = db.Column(db.String(100))
+    result = db.Column(db.Text)  # JSON-encoded insights
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def is_finished(self):
+        """Check if the job has either completed or failed."""
+        return self.status in ('done', 'failed')
+
+
+class IngestLock(db.Model):
+    """
+    Cross-process mutex row. Holding the row for a key (e.g. 'ingest:<user_id>')
+    means holding the lock; expired rows may be taken over by another owner.
+    """
+    __tablename__ = 'ingest_lock'
+
+    key = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(150), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class IngestState(db.Model):
+    """
+    Per-user freshness record: when the user's Spotify data was last ingested,
+    a content hash of each time range's track ID list, and the derived GPT
+    insights together with hashes of the inputs they were computed from.
+    """
+    __tablename__ = 'ingest_state'
+
+    user_id = db.Column(db.String(50), db.ForeignKey('user.id'), primary_key=True)
+    last_ingested_at = db.Column(db.DateTime)
+    range_hashes = db.Column(db.Text)  # JSON: {time_range: sha256 of ordered track IDs}
+    insights = db.Column(db.Text)  # JSON: insights keyed like INSIGHT_SESSION_KEYS
+    insight_hashes = db.Column(db.Text)  # JSON: {insight key: sha256 of its inputs}
+
+
+class SearchCache(db.Model):
+    """
+    Cached Spotify Search results for (track name, artist) pairs, shared by all
+    users. A row with found=False records that the search matched nothing.
+    """
+    __tablename__ = 'search_cache'
+
+    key = db.Column(db.String(255), primary_key=True)  # normalised "name|artist"
+    found = db.Column(db.Boolean, nullable=False, default=True)
+    track_id = db.Column(db.String(50))  # Spotify track ID
+    name = db.Column(db.String(200))
+    artist = db.Column(db.String(200))
+    album = db.Column(db.String(200))
+    images = db.Column(db.Text)  # JSON list of album image dicts
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Artist(db.Model):
+    """
+    Spotify artists with their micro-genres, cached so each artist's genres
+    are fetched once and shared by every user's ingest.
+    """
+    __tablename__ = 'artist'
+
+    id = db.Column(db.String(50), primary_key=True)  # Spotify artist ID
+    name = db.Column(db.String(200))
+    genres = db.Column(db.Text)  # JSON list of Spotify micro-genres (empty if Spotify has none)
+    display_genre = db.Column(db.String(100))  # genres mapped through app.utils.genre_taxonomy
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class GPTResponse(db.Model):
+    """
+    Cached ChatGPT completions keyed by a hash of the request, shared by every
+    user and process. Rows past expires_at are ignored and overwritten.
+    """
+    __tablename__ = 'gpt_response_cache'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of (method, model, messages, temperature)
+    method = db.Column(db.String(50), index=True)  # ChatGPT method that made the request
+    model = db.Column(db.String(100))
+    content = db.Column(db.Text, nullable=False)  # message content of the completion
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime)
@@ -1,7 +1,9 @@
 # app/routes/admin_routes.py
 
-from flask import Blueprint, render_template, current_app
+from flask import Blueprint, render_template, current_app, jsonify
 from app.models import db, User, Friend, Track, AudioFeatures
+from app.services.search_cache import get_search_cache_stats
+from app.services.track_catalog import get_catalog_stats
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -56,3 +58,26 @@ def inspect_db(secret_token):
                            friendship_details=friendship_details,
                            tracks_by_user=tracks_by_user,
                            stats=stats)
+
+
+@admin_bp.route('/api-stats/<secret_token>', methods=['GET'])
+def api_stats(secret_token):
+    """
+    Counters for outbound API usage in this process: Spotify rate limiting
+    (requests, throttled, retried, dropped), catalog / search / GPT response cache
+    hit rates, GPT prompt token savings and micro-batch sizes.
+    """
+    if secret_token != current_app.config.get('SECRET_KEY', ''):
+        return "Unauthorized", 401
+
+    from app import spotify_api, gpt
+    return jsonify({
+        'spotify_rate_limit': spotify_api.governor.get_stats(),
+        'track_catalog': get_catalog_stats(),
+        'search_cache': get_search_cache_stats(),
+        'gpt_response_cache': gpt.response_cache.get_stats() if gpt.response_cache else {},
+        'gpt_prompt_compaction': gpt.get_prompt_stats(),
+        'gpt_microbatch': {
+            batcher.name: batcher.get_stats() for batcher in (gpt.genre_batcher, gpt.mood_batcher) if batcher
+        }
+    })
@@ -2,6 +2,7 @@
 
 from flask import Blueprint, render_template, redirect, request, flash, session, jsonify, url_for
 from app.models import db, User, Friend, Track, AudioFeatures
+from app.services.mood_scoring import refresh_stale_moods
 from collections import Counter
 
 friend_bp = Blueprint('friend', __name__)
@@ -194,6 +195,7 @@ def friend_visualise(friend_id):
     all_features = AudioFeatures.query.join(Track, AudioFeatures.track_id == Track.id).filter(
         Track.user_id == friend_id
     ).all()
+    refresh_stale_moods(all_features)
 
     mood_counts = Counter(f.mood for f in all_features if f.mood)
     total = sum(mood_counts.values()) or 1
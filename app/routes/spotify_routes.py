@@ -8,7 +8,9 @@ import uuid
 from app import spotify_api
 from app import gpt
 from app.models import db, User, Track, AudioFeatures
-from app.services.spotify_ingest import refresh_token, fetch_and_store_user_data, fetch_audio_features, enrich_recommended_tracks_with_album_art
+from app.services.freshness import get_fresh_insights
+from app.services.insights import store_insights_in_session
+from app.services.ingest_jobs import enqueue_ingest, get_job_result, run_job, wait_for_job
 
 from flask_wtf import FlaskForm
 from wtforms import PasswordField, SubmitField
@@ -42,6 +44,43 @@ def ajax_spotify_logo():
         'timestamp': datetime.utcnow().isoformat()
     })
 
+# ----------------------------------------------------------
+# Start Spotify ingest + GPT insights for a logged-in user
+# ----------------------------------------------------------
+def start_user_ingest(user_id):
+    """
+    With INGEST_BACKGROUND enabled, queue the ingest for worker.py and remember
+    the job in the session so the visualise page can poll it. Otherwise run it
+    inline and store the insights in the session straight away.
+
+    Either way, a login that arrives while the same user's ingest is already in
+    flight attaches to that job instead of starting a second one, and a user
+    ingested within INGEST_FRESHNESS_TTL gets their stored insights instantly.
+    """
+    insights = get_fresh_insights(user_id, current_app.config.get('INGEST_FRESHNESS_TTL', 0))
+    if insights:
+        store_insights_in_session(insights, session)
+        return
+
+    if current_app.config.get('INGEST_BACKGROUND', False):
+        job, attached = enqueue_ingest(user_id)
+        session['ingest_job_id'] = job.id
+        return
+
+    job, attached = enqueue_ingest(user_id, run_inline=True)
+    if attached:
+        # Another request is already ingesting this user; reuse its result
+        job = wait_for_job(job.id, current_app.config.get('INGEST_ATTACH_TIMEOUT', 120))
+    else:
+        job = run_job(job, spotify_api, gpt)
+
+    if job.status == 'done':
+        store_insights_in_session(get_job_result(job), session)
+    elif not job.is_finished:
+        # Still running elsewhere; let the visualise page poll for it
+        session['ingest_job_id'] = job.id
+
+
 # ----------------------------------------------------------
 # Spotify OAuth Callback
 # ----------------------------------------------------------
@@ -134,47 +173,8 @@ def callback():
             session['user_email'] = existing_local_user.email
             session['first_name'] = existing_local_user.first_name
 
-            # Fetch mood data and ChatGPT summary
-            mood_counts = fetch_and_store_user_data(existing_local_user.id, spotify_api, gpt)
-            session['mood_counts'] = mood_counts
-
-            tracks = Track.query.filter_by(user_id=existing_local_user.id).all()
-
-            gpt_input = []
-            for track in tracks:
-                gpt_input.append({
-                    "name": track.name,
-                    "artist": track.artist,
-                    "album": track.album,
-                    "genre": track.genre or "Unknown",
-                    "mood": track.mood or "Unknown"
-                })
-
-            # 🧠 Generate mood summary
-            mood_summary = gpt.analyze_user_tracks(gpt_input)
-            session['mood_summary'] = mood_summary
-
-            # 💬 Generate GPT-based mood-based song recommendations
-            gpt_recs_by_mood = gpt.recommend_tracks_by_mood(gpt_input)
-
-            # 🧬 Infer MBTI type (e.g., "INTJ")
-            session['mbti_type'] = gpt.infer_mbti_type(gpt_input)
-
-            # 🧠 Generate one-line personality summary
-            session['mbti_summary'] = gpt.infer_mbti_summary(gpt_input)
-
-            # 🎨 Generate MBTI + mood-based personality image
-            dominant_mood = max(mood_counts, key=mood_counts.get, default="Chill")
-            personality_image_url = gpt.generate_personality_image_url(session['mbti_type'], dominant_mood)
-            session['personality_image_url'] = personality_image_url
-            
-            # ⏰ NEW: Infer mood-wise usual time of day
-            mood_time_ranges = gpt.infer_mood_time_ranges(gpt_input)
-            session['mood_time_ranges'] = mood_time_ranges
-
-            # 🎵 Enrich GPT recommendations with album art
-            recommended_tracks = enrich_recommended_tracks_with_album_art(gpt_recs_by_mood, access_token, spotify_api)
-            session['recommended_tracks_by_mood'] = recommended_tracks
+            # Fetch mood data and ChatGPT summary (queued for the worker by default)
+            start_user_ingest(existing_local_user.id)
 
             return redirect(url_for('visual.visualise'))
     
@@ -213,51 +213,8 @@ def callback():
                 session['user_email'] = existing_user.email or ''
                 session['first_name'] = existing_user.first_name or existing_user.display_name.split()[0]
 
-                # Fetch mood data again
-                mood_counts = fetch_and_store_user_data(existing_user.id, spotify_api, gpt)
-                session['mood_counts'] = mood_counts
-                
-                # NEW: Generate ChatGPT mood summary based on updated DB
-
-                # Fetch tracks and audio features from DB
-                tracks = Track.query.filter_by(user_id=user.id).all()
-
-                # Prepare track data for GPT
-                gpt_input = []
-                for track in tracks:
-                    gpt_input.append({
-                        "name": track.name,
-                        "artist": track.artist,
-                        "album": track.album,
-                        "genre": track.genre or "Unknown",
-                        "mood": track.mood or "Unknown"
-                    })
-
-                # 🧠 Generate mood summary
-                mood_summary = gpt.analyze_user_tracks(gpt_input)
-                session['mood_summary'] = mood_summary
-
-                # 💬 Generate GPT-based mood-based song recommendations
-                gpt_recs_by_mood = gpt.recommend_tracks_by_mood(gpt_input)
-
-                # 🧬 Infer MBTI type (e.g., "INTJ")
-                session['mbti_type'] = gpt.infer_mbti_type(gpt_input)
-
-                # 🧠 Generate one-line personality summary
-                session['mbti_summary'] = gpt.infer_mbti_summary(gpt_input)
-
-                # 🎨 Generate MBTI + mood-based personality image
-                dominant_mood = max(mood_counts, key=mood_counts.get, default="Chill")
-                personality_image_url = gpt.generate_personality_image_url(session['mbti_type'], dominant_mood)
-                session['personality_image_url'] = personality_image_url
-                
-                # ⏰ NEW: Infer mood-wise usual time of day
-                mood_time_ranges = gpt.infer_mood_time_ranges(gpt_input)
-                session['mood_time_ranges'] = mood_time_ranges
-
-                # 🎵 Enrich GPT recommendations with album art
-                recommended_tracks = enrich_recommended_tracks_with_album_art(gpt_recs_by_mood, access_token, spotify_api)
-                session['recommended_tracks_by_mood'] = recommended_tracks
+                # Fetch mood data again (queued for the worker by default)
+                start_user_ingest(existing_user.id)
 
                 return redirect(url_for('visual.visualise'))
                 
@@ -300,50 +257,7 @@ def callback():
         session['first_name'] = user.display_name.split()[0] if user.display_name else 'User'
 
     try:
-        mood_counts = fetch_and_store_user_data(user.id, spotify_api, gpt)
-        print("✅ Imported Spotify data for user", user.id)
-        print("🎵 Mood breakdown:", mood_counts)
-        session['mood_counts'] = mood_counts
-
-        # Fetch tracks and audio features from DB
-        tracks = Track.query.filter_by(user_id=user.id).all()
-
-        # Prepare track data for GPT
-        gpt_input = []
-        for track in tracks:
-            gpt_input.append({
-                "name": track.name,
-                "artist": track.artist,
-                "album": track.album,
-                "genre": track.genre or "Unknown",
-                "mood": track.mood or "Unknown"
-            })
-
-        # 🧠 Generate mood summary
-        mood_summary = gpt.analyze_user_tracks(gpt_input)
-        session['mood_summary'] = mood_summary
-
-        # 💬 Generate GPT-based mood-based song recommendations
-        gpt_recs_by_mood = gpt.recommend_tracks_by_mood(gpt_input)
-
-        # 🧬 Infer MBTI type (e.g., "INTJ")
-        session['mbti_type'] = gpt.infer_mbti_type(gpt_input)
-
-        # 🧠 Generate one-line personality summary
-        session['mbti_summary'] = gpt.infer_mbti_summary(gpt_input)
-
-        # 🎨 Generate MBTI + mood-based personality image
-        dominant_mood = max(mood_counts, key=mood_counts.get, default="Chill")
-        personality_image_url = gpt.generate_personality_image_url(session['mbti_type'], dominant_mood)
-        session['personality_image_url'] = personality_image_url
-        
-        # ⏰ NEW: Infer mood-wise usual time of day
-        mood_time_ranges = gpt.infer_mood_time_ranges(gpt_input)
-        session['mood_time_ranges'] = mood_time_ranges
-        
-        # 🎵 Enrich GPT recommendations with album art
-        recommended_tracks = enrich_recommended_tracks_with_album_art(gpt_recs_by_mood, access_token, spotify_api)
-        session['recommended_tracks_by_mood'] = recommended_tracks
+        start_user_ingest(user.id)
 
     except Exception as e:
         print("❌ Error while importing Spotify data:", str(e))
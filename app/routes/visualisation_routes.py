@@ -3,7 +3,9 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, flash, jsonify
 from collections import Counter, defaultdict
 
-from app.models import User, Track, AudioFeatures
+from app.models import db, User, Track, AudioFeatures, IngestJob
+from app.services.ingest_jobs import get_job_result
+from app.services.insights import store_insights_in_session
 
 visual_bp = Blueprint('visual', __name__)
 
@@ -25,6 +27,22 @@ def visualise():
         session.clear()
         return redirect(url_for('user.login'))
 
+    # Pick up the results of a background ingest job once it has finished
+    ingest_pending = False
+    job_id = session.get('ingest_job_id')
+    if job_id:
+        job = db.session.get(IngestJob, job_id)
+        if not job or job.user_id != user_id:
+            session.pop('ingest_job_id', None)
+        elif job.status == 'done':
+            store_insights_in_session(get_job_result(job), session)
+            session.pop('ingest_job_id', None)
+        elif job.status == 'failed':
+            flash('We could not import your Spotify data. Please try logging in again.', 'danger')
+            session.pop('ingest_job_id', None)
+        else:
+            ingest_pending = True
+
     # Get selected time range (default to medium_term)
     time_range = request.args.get('time_range', 'medium_term')
 
@@ -118,10 +136,28 @@ def visualise():
         mood_summary=mood_summary,
         mood_counts=mood_counts,
         recommended_songs=recommended_songs,
-        genre_data=top_genres  # Fix: Pass the correct variable
+        genre_data=top_genres,  # Fix: Pass the correct variable
+        ingest_job_id=job_id if ingest_pending else None
     )
 
 
+@visual_bp.route('/api/ingest-status/<int:job_id>')
+def ingest_status_api(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    job = db.session.get(IngestJob, job_id)
+    if not job or job.user_id != session['user_id']:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({
+        'status': job.status,
+        'stage': job.stage,
+        'progress': job.progress or 0,
+        'finished': job.is_finished
+    })
+
+
 @visual_bp.route('/api/mood-data')
 def mood_data_api():
     if 'user_id' not in session:
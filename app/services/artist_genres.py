@@ -0,0 +1,95 @@
+# app/services/artist_genres.py
+
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.models import Artist
+from app.services.db_utils import bulk_upsert
+from app.utils.genre_taxonomy import map_genres
+
+
+# ----------------------------------------------------------
+# Genre resolution from Spotify artist genres
+# ----------------------------------------------------------
+def load_artists(artist_ids, ttl_seconds):
+    """
+    Load cached artists with one IN query, ignoring rows older than the TTL.
+
+    Returns:
+        dict: {artist_id: Artist} for every fresh row found.
+    """
+    artist_ids = list(artist_ids)
+    if not artist_ids:
+        return {}
+
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl_seconds)
+    return {
+        artist.id: artist
+        for artist in Artist.query.filter(Artist.id.in_(artist_ids)).all()
+        if artist.fetched_at and artist.fetched_at >= cutoff
+    }
+
+
+def resolve_track_genres(items, access_token, spotify_api):
+    """
+    Derive a display genre for each track from its credited artists' Spotify
+    genres, fetching uncached artists in bulk (50 per request) and storing
+    them in the artist table.
+
+    Artists Spotify has no genres for are cached with an empty list, so they
+    are not asked for again until ARTIST_GENRE_TTL passes; their tracks are
+    left for GPT.
+
+    Args:
+        items (dict): {track_id: Spotify track item} needing a genre.
+        access_token (str): Spotify access token.
+        spotify_api (SpotifyAPI): Client providing get_artists_genres().
+
+    Returns:
+        dict: {track_id: display genre} for every track that could be resolved.
+    """
+    if not items:
+        return {}
+
+    ttl = current_app.config.get('ARTIST_GENRE_TTL', 30 * 24 * 3600)
+
+    # Credited artists per track, primary artist first
+    artists_by_track, artist_names = {}, {}
+    for track_id, item in items.items():
+        ids = []
+        for artist in item.get('artists', []):
+            if artist.get('id'):
+                ids.append(artist['id'])
+                artist_names.setdefault(artist['id'], artist.get('name'))
+        artists_by_track[track_id] = ids
+
+    cached = load_artists(artist_names, ttl)
+    genres_by_artist = {artist_id: json.loads(artist.genres or '[]') for artist_id, artist in cached.items()}
+
+    missing = [artist_id for artist_id in artist_names if artist_id not in cached]
+    if missing:
+        fetched = spotify_api.get_artists_genres(access_token, missing)
+        now = datetime.utcnow()
+        rows = [{
+            'id': artist_id,
+            'name': artist_names[artist_id],
+            'genres': json.dumps(genres),
+            'display_genre': map_genres(genres),
+            'fetched_at': now
+        } for artist_id, genres in fetched.items() if artist_id in artist_names]
+        bulk_upsert(Artist, rows, index_elements=['id'],
+                    update_columns=['name', 'genres', 'display_genre', 'fetched_at'])
+        genres_by_artist.update(fetched)
+
+    resolved = {}
+    for track_id, artist_ids in artists_by_track.items():
+        micro_genres = [genre for artist_id in artist_ids for genre in genres_by_artist.get(artist_id, [])]
+        genre = map_genres(micro_genres)
+        if genre:
+            resolved[track_id] = genre
+
+    print(f"[Artists] {len(cached)} cached / {len(missing)} fetched artists; "
+          f"resolved {len(resolved)} of {len(items)} genres without GPT")
+    return resolved
@@ -0,0 +1,56 @@
+# app/services/db_utils.py
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import db
+
+
+# ----------------------------------------------------------
+# Dialect-native bulk upsert (INSERT ... ON CONFLICT)
+# ----------------------------------------------------------
+def bulk_upsert(model, rows, index_elements, update_columns, connection=None):
+    """
+    Insert or update many rows of a model in a single statement.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE on SQLite and PostgreSQL, and falls
+    back to session.merge() row by row on any other database.
+
+    Args:
+        model: SQLAlchemy model class to write to.
+        rows (list): List of column dictionaries, one per row.
+        index_elements (list): Columns of the primary key / unique constraint to match on.
+        update_columns (list): Columns to overwrite when the row already exists.
+        connection: Core connection to write through instead of db.session
+            (for writes that must commit independently of the ORM session).
+
+    Returns:
+        int: Number of rows written.
+    """
+    if not rows:
+        return 0
+
+    executor = connection if connection is not None else db.session
+    dialect = (connection.engine if connection is not None else db.session.get_bind()).dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(model.__table__).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+        executor.execute(stmt)
+    elif connection is not None:
+        table = model.__table__
+        for row in rows:
+            match = db.and_(*(table.c[column] == row[column] for column in index_elements))
+            updated = connection.execute(
+                table.update().where(match).values({column: row[column] for column in update_columns})
+            )
+            if not updated.rowcount:
+                connection.execute(table.insert().values(row))
+    else:
+        for row in rows:
+            db.session.merge(model(**row))
+
+    return len(rows)
@@ -0,0 +1,115 @@
+# app/services/freshness.py
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from app.models import db, IngestState
+
+
+# ----------------------------------------------------------
+# Per-user ingest freshness and content hashes
+# ----------------------------------------------------------
+def content_hash(value):
+    """
+    Stable SHA-256 of any JSON-serialisable value (dict keys are sorted).
+    """
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def get_ingest_state(user_id, create=False):
+    """
+    Load the user's IngestState row, optionally creating an empty one.
+    """
+    state = db.session.get(IngestState, user_id)
+    if state is None and create:
+        state = IngestState(user_id=user_id)
+        db.session.add(state)
+    return state
+
+
+def load_json(text):
+    return json.loads(text) if text else {}
+
+
+def get_fresh_insights(user_id, ttl_seconds):
+    """
+    Return the stored insights if the user was ingested less than ttl_seconds ago.
+
+    Returns:
+        dict: Stored insights, or None if the data is stale, missing or TTL is 0.
+    """
+    if not ttl_seconds:
+        return None
+
+    state = get_ingest_state(user_id)
+    if not state or not state.last_ingested_at or not state.insights:
+        return None
+
+    if datetime.utcnow() - state.last_ingested_at > timedelta(seconds=ttl_seconds):
+        return None
+
+    print(f"⚡ Spotify data for user {user_id} is fresh (ingested {state.last_ingested_at}); skipping re-ingest")
+    return load_json(state.insights)
+
+
+class InsightCache:
+    """
+    Reuses a stored insight when the hash of its inputs is unchanged,
+    and records the new value and hash otherwise.
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.values = load_json(state.insights)
+        self.hashes = load_json(state.insight_hashes)
+        self.recomputed = []
+
+    def get(self, key, inputs, compute):
+        """
+        Return the cached value for key if inputs are unchanged, else compute() it.
+        """
+        digest = content_hash(inputs)
+        if self.hashes.get(key) == digest and self.values.get(key) is not None:
+            return self.values[key]
+
+        value = compute()
+        self.values[key] = value
+        self.hashes[key] = digest
+        self.recomputed.append(key)
+        return value
+
+    def lookup(self, key, inputs):
+        """
+        Return the cached value for key if inputs are unchanged, else None.
+        Read-only, so it is safe to call from worker threads.
+        """
+        if self.hashes.get(key) == content_hash(inputs):
+            return self.values.get(key)
+        return None
+
+    def get_many(self, keys, inputs, compute):
+        """
+        Like get(), for several insights derived from the same inputs in one go:
+        compute() must return a dict with every key, and runs only if any of
+        them is stale.
+        """
+        digest = content_hash(inputs)
+        if all(self.hashes.get(key) == digest and self.values.get(key) is not None for key in keys):
+            return {key: self.values[key] for key in keys}
+
+        values = compute()
+        for key in keys:
+            self.values[key] = values.get(key)
+            self.hashes[key] = digest
+            self.recomputed.append(key)
+        return {key: values.get(key) for key in keys}
+
+    def save(self, extra=None):
+        """
+        Persist the cached insights (plus any extra keys) on the state row.
+        """
+        self.values.update(extra or {})
+        self.state.insights = json.dumps(self.values)
+        self.state.insight_hashes = json.dumps(self.hashes)
@@ -0,0 +1,351 @@
+# app/services/gpt_batch.py
+
+import json
+import os
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam, update
+
+from app.models import db, Track, AudioFeatures
+from app.services.track_catalog import lookup_annotations, resolve_from_catalog, store_annotations
+from app.utils.chatgpt import ChatGPT
+
+MANIFEST = 'manifest.json'
+REQUESTS_FILE = 'requests.jsonl'
+OUTPUT_FILE = 'output.jsonl'
+
+# Batch API statuses after which a batch will not change any more
+FINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+# ----------------------------------------------------------
+# Resumable offline backfill through the OpenAI Batch API
+# ----------------------------------------------------------
+# A batch job lives in one working directory: requests.jsonl (the Batch API
+# input), output.jsonl (its results) and manifest.json, which records how far
+# the job got (prepared -> submitting -> submitted -> completed -> applied).
+# Every step reads the manifest first and skips work that is already done, so
+# an interrupted run can simply be started again.
+
+def load_manifest(workdir):
+    """
+    Return the job manifest in workdir, or None if no job was prepared there.
+    """
+    path = os.path.join(workdir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(workdir, manifest):
+    # Write-then-rename so an interrupted save never leaves a torn manifest
+    path = os.path.join(workdir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _unlabelled_tracks(limit=None):
+    """
+    Distinct tracks with no genre or no usable mood on some Track row.
+
+    Returns:
+        tuple: ({track_id: (name, artist, album)} needing a genre,
+                {track_id: mood prompt details} needing a mood)
+    """
+    query = (
+        db.session.query(Track.id, Track.name, Track.artist, Track.album, Track.genre, Track.mood)
+        .filter(db.or_(Track.genre.is_(None), Track.mood.is_(None), Track.mood == "Unavailable"))
+        .order_by(Track.id)
+    )
+    genres_needed, moods_needed, seen = {}, {}, set()
+    for track_id, name, artist, album, genre, mood in query:
+        if track_id not in seen:
+            if limit and len(seen) >= limit:
+                break
+            seen.add(track_id)
+        if not genre:
+            genres_needed[track_id] = (name, artist, album)
+        if not mood or mood == "Unavailable":
+            moods_needed[track_id] = {"name": name, "artist": artist}
+
+    # Features for the mood prompt, looked up in IN-query slices
+    track_ids = list(moods_needed)
+    for i in range(0, len(track_ids), 500):
+        for row in AudioFeatures.query.filter(AudioFeatures.id.in_(track_ids[i:i + 500])):
+            moods_needed[row.id].update(valence=row.valence, energy=row.energy)
+    return genres_needed, moods_needed
+
+
+def _fill_tracks(genres, moods):
+    """
+    Write labels onto every Track row of each track that still lacks them.
+
+    Returns:
+        tuple: (genre rows updated, mood rows updated)
+    """
+    genre_rows = mood_rows = 0
+    # One executemany UPDATE per label kind, parameterised by track ID (Core
+    # statements: the ORM's bulk form would match on the full primary key)
+    table = Track.__table__
+    if genres:
+        genre_rows = db.session.execute(
+            update(table).where(table.c.id == bindparam('track_id'), table.c.genre.is_(None))
+            .values(genre=bindparam('label')),
+            [{'track_id': track_id, 'label': genre} for track_id, genre in genres.items()]
+        ).rowcount
+    if moods:
+        mood_rows = db.session.execute(
+            update(table).where(table.c.id == bindparam('track_id'),
+                                db.or_(table.c.mood.is_(None), table.c.mood == "Unavailable"))
+            .values(mood=bindparam('label')),
+            [{'track_id': track_id, 'label': mood} for track_id, mood in moods.items()]
+        ).rowcount
+    return genre_rows, mood_rows
+
+
+def prepare_batch(workdir, gpt, limit=None, chunk_size=None, force=False):
+    """
+    Scan Track for missing genres/moods and write them as a Batch API input file.
+
+    Labels already in the cross-user catalog are applied straight away; only
+    catalog misses become requests. Each request is one structured-JSON chunk
+    using the same prompts as ingest.
+
+    Args:
+        workdir (str): Job directory (created if needed).
+        gpt (ChatGPT): Provides the model name.
+        limit (int): Cap on the number of distinct tracks scanned.
+        chunk_size (int): Tracks per request (defaults to OPENAI_BATCH_SIZE).
+        force (bool): Replace an unfinished job in workdir.
+
+    Returns:
+        dict: The new manifest.
+
+    Raises:
+        RuntimeError: If workdir holds a job that was not applied yet and force is False.
+    """
+    existing = load_manifest(workdir)
+    if existing and existing['state'] != 'applied' and not force:
+        raise RuntimeError(f"Batch job in {workdir} is still '{existing['state']}'; "
+                           "run it to completion or prepare with --force")
+    os.makedirs(workdir, exist_ok=True)
+    for name in (REQUESTS_FILE, OUTPUT_FILE):
+        if os.path.exists(os.path.join(workdir, name)):
+            os.remove(os.path.join(workdir, name))
+
+    chunk_size = chunk_size or current_app.config.get('OPENAI_BATCH_SIZE', 25)
+    genres_needed, moods_needed = _unlabelled_tracks(limit)
+
+    catalog = lookup_annotations(set(genres_needed) | set(moods_needed))
+    genre_hits, genre_misses = resolve_from_catalog(genres_needed, catalog, 'genre')
+    mood_hits, mood_misses = resolve_from_catalog(moods_needed, catalog, 'mood')
+    filled = _fill_tracks(genre_hits, mood_hits)
+    db.session.commit()
+
+    chunks = {}
+    with open(os.path.join(workdir, REQUESTS_FILE), 'w', encoding='utf-8') as f:
+        for kind, misses, build in (('genre', genre_misses, ChatGPT.genre_batch_messages),
+                                    ('mood', mood_misses, ChatGPT.mood_batch_messages)):
+            items = list(misses.items())
+            for i in range(0, len(items), chunk_size):
+                chunk = items[i:i + chunk_size]
+                custom_id = f"{kind}-{i // chunk_size:05d}"
+                chunks[custom_id] = {'kind': kind, 'track_ids': [track_id for track_id, _ in chunk]}
+                f.write(json.dumps({
+                    'custom_id': custom_id,
+                    'method': 'POST',
+                    'url': '/v1/chat/completions',
+                    'body': {'model': gpt.model, 'messages': build(chunk), 'temperature': 0.3}
+                }, ensure_ascii=False) + '\n')
+
+    manifest = {
+        'state': 'prepared' if chunks else 'applied',
+        'model': gpt.model,
+        'created_at': datetime.utcnow().isoformat(),
+        'chunks': chunks,
+        'genre_requests': len(genre_misses),
+        'mood_requests': len(mood_misses),
+        'catalog_rows_filled': sum(filled),
+        'input_file_id': None,
+        'batch_id': None,
+        'batch_status': None,
+        'output_file_id': None,
+        'applied': None,
+    }
+    save_manifest(workdir, manifest)
+    print(f"[Batch] Prepared {len(chunks)} requests for {len(genre_misses)} genres and {len(mood_misses)} moods "
+          f"({sum(filled)} track rows filled from the catalog)")
+    return manifest
+
+
+def _openai(gpt, method, path, **kwargs):
+    base = current_app.config.get('OPENAI_API_BASE', 'https://api.openai.com/v1').rstrip('/')
+    headers = {"Authorization": f"Bearer {gpt.api_key}"}
+    response = gpt.http.request(method, f"{base}{path}", headers=headers, **kwargs)
+    if not response.ok:
+        raise RuntimeError(f"OpenAI Batch API error {response.status_code} on {path}: {response.text}")
+    return response
+
+
+def _find_batch(gpt, input_file_id):
+    """
+    Look for a batch already created from input_file_id (newest first).
+
+    Returns:
+        dict: The batch object, or None if there is none.
+    """
+    params = {'limit': 100}
+    while True:
+        page = _openai(gpt, 'GET', '/batches', params=params).json()
+        for batch in page.get('data', []):
+            if batch.get('input_file_id') == input_file_id:
+                return batch
+        if not page.get('has_more') or not page.get('data'):
+            return None
+        params['after'] = page['data'][-1]['id']
+
+
+def submit_batch(workdir, gpt):
+    """
+    Upload the input file and create the batch, unless that already happened.
+
+    The manifest is marked 'submitting' before the batch is created, so a run
+    interrupted between creating it and recording its ID picks up the batch
+    already made from the same input file instead of paying for a second one.
+    """
+    manifest = _require_manifest(workdir)
+    if manifest['state'] not in ('prepared', 'submitting'):
+        return manifest
+
+    if not manifest['input_file_id']:
+        with open(os.path.join(workdir, REQUESTS_FILE), 'rb') as f:
+            uploaded = _openai(gpt, 'POST', '/files', files={'file': (REQUESTS_FILE, f, 'application/jsonl')},
+                               data={'purpose': 'batch'}).json()
+        manifest['input_file_id'] = uploaded['id']
+        save_manifest(workdir, manifest)
+
+    batch = _find_batch(gpt, manifest['input_file_id']) if manifest['state'] == 'submitting' else None
+    if batch is not None:
+        print(f"[Batch] Found batch {batch['id']} from an interrupted submit")
+    else:
+        manifest['state'] = 'submitting'
+        save_manifest(workdir, manifest)
+        batch = _openai(gpt, 'POST', '/batches', json={
+            'input_file_id': manifest['input_file_id'],
+            'endpoint': '/v1/chat/completions',
+            'completion_window': '24h',
+            'metadata': {'description': 'EchoMood genre/mood backfill'}
+        }).json()
+        print(f"[Batch] Submitted batch {batch['id']} ({len(manifest['chunks'])} requests)")
+    manifest.update(state='submitted', batch_id=batch['id'], batch_status=batch.get('status'))
+    save_manifest(workdir, manifest)
+    return manifest
+
+
+def poll_batch(workdir, gpt, wait=False, interval=30, timeout=None):
+    """
+    Refresh the batch status, optionally waiting until it is final, and
+    download the output file once the batch has completed.
+    """
+    manifest = _require_manifest(workdir)
+    if manifest['state'] != 'submitted':
+        return manifest
+
+    started = time.monotonic()
+    while True:
+        batch = _openai(gpt, 'GET', f"/batches/{manifest['batch_id']}").json()
+        manifest.update(batch_status=batch['status'], output_file_id=batch.get('output_file_id'),
+                        request_counts=batch.get('request_counts'))
+        save_manifest(workdir, manifest)
+        print(f"[Batch] {manifest['batch_id']} is {batch['status']} {batch.get('request_counts') or ''}")
+        if batch['status'] in FINAL_STATUSES or not wait:
+            break
+        if timeout is not None and time.monotonic() - started + interval > timeout:
+            break
+        time.sleep(interval)
+
+    if batch['status'] == 'completed' and manifest['output_file_id']:
+        content = _openai(gpt, 'GET', f"/files/{manifest['output_file_id']}/content").content
+        with open(os.path.join(workdir, OUTPUT_FILE + '.tmp'), 'wb') as f:
+            f.write(content)
+        os.replace(os.path.join(workdir, OUTPUT_FILE + '.tmp'), os.path.join(workdir, OUTPUT_FILE))
+        manifest['state'] = 'completed'
+    elif batch['status'] in FINAL_STATUSES:
+        manifest['state'] = 'failed'
+    save_manifest(workdir, manifest)
+    return manifest
+
+
+def apply_batch(workdir):
+    """
+    Parse the downloaded results and bulk-apply them to Track rows and the
+    catalog. Only rows still missing a label are written, so re-applying is
+    harmless; tracks whose entries failed are picked up by the next prepare.
+    """
+    manifest = _require_manifest(workdir)
+    if manifest['state'] != 'completed':
+        return manifest
+
+    genres, moods, failed = {}, {}, 0
+    with open(os.path.join(workdir, OUTPUT_FILE), encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            chunk = manifest['chunks'].get(entry.get('custom_id'))
+            response = entry.get('response') or {}
+            if not chunk or entry.get('error') or response.get('status_code') != 200:
+                failed += 1
+                continue
+            try:
+                content = response['body']['choices'][0]['message']['content']
+                result = ChatGPT._parse_json_content(content)
+            except (KeyError, IndexError, TypeError, ValueError):
+                failed += 1
+                continue
+            if not isinstance(result, dict):
+                failed += 1
+                continue
+
+            for track_id in chunk['track_ids']:
+                if chunk['kind'] == 'genre':
+                    genre = result.get(track_id)
+                    if isinstance(genre, str) and genre.strip():
+                        genres[track_id] = genre.strip()
+                else:
+                    mood = ChatGPT._normalize_mood(result.get(track_id))
+                    if mood:
+                        moods[track_id] = mood
+
+    store_annotations(genres, moods, manifest['model'])
+    genre_rows, mood_rows = _fill_tracks(genres, moods)
+    db.session.commit()
+
+    manifest.update(state='applied', applied={
+        'genres': len(genres), 'moods': len(moods),
+        'genre_rows': genre_rows, 'mood_rows': mood_rows, 'failed_requests': failed
+    })
+    save_manifest(workdir, manifest)
+    print(f"[Batch] Applied {len(genres)} genres and {len(moods)} moods to {genre_rows + mood_rows} track rows "
+          f"({failed} failed requests)")
+    return manifest
+
+
+def run_batch(workdir, gpt, wait=True, interval=30, timeout=None):
+    """
+    Drive a prepared job as far as it can go: submit, poll, apply.
+    """
+    submit_batch(workdir, gpt)
+    poll_batch(workdir, gpt, wait=wait, interval=interval, timeout=timeout)
+    return apply_batch(workdir)
+
+
+def _require_manifest(workdir):
+    manifest = load_manifest(workdir)
+    if manifest is None:
+        raise RuntimeError(f"No batch job in {workdir}; run prepare first")
+    return manifest
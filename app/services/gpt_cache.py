@@ -0,0 +1,227 @@
+# app/services/gpt_cache.py
+
+import hashlib
+import json
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from app.models import db, GPTResponse
+from app.services.db_utils import bulk_upsert
+from app.utils.lru import LRUCache
+
+# Methods whose replies are a pure function of the prompt (labels sent at a
+# low temperature), cached unless GPT_CACHE_METHODS says otherwise. Methods
+# sampled at higher temperatures, such as analyze_mood (0.7) or
+# recommend_tracks_by_mood, must be opted in.
+DETERMINISTIC_METHODS = ('classify_genre', 'classify_genres_batch', 'analyze_moods_batch')
+
+
+# ----------------------------------------------------------
+# Two-tier cache of ChatGPT completions
+# ----------------------------------------------------------
+class GPTResponseCache:
+    """
+    Content-addressed cache of chat completion replies: an in-process LRU in
+    front of the gpt_response_cache table.
+
+    Entries are keyed by a hash of (method, model, messages, temperature), so
+    byte-identical prompts are answered once per TTL across users and
+    processes. New replies are buffered and written as part of the app's next
+    session commit (so GPT calls made from worker threads without an app
+    context are persisted too, and no second writer contends for SQLite's lock).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.methods = set(DETERMINISTIC_METHODS)
+        self.ttls = {}
+        self.default_ttl = 7 * 24 * 3600
+        self.max_rows = 50000
+        self.memory = LRUCache(0)
+        self.stats = Counter()
+        self.method_stats = defaultdict(Counter)
+        self._pending = {}  # {key: row to upsert, or None to delete}
+        self._lock = threading.Lock()
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Read GPT_CACHE_* settings from the app config.
+        """
+        self.app = app
+        config = app.config
+        self.enabled = config.get('GPT_CACHE_ENABLED', True)
+        methods = config.get('GPT_CACHE_METHODS')
+        if methods is not None:
+            self.methods = set(methods)
+        self.ttls = dict(config.get('GPT_CACHE_TTLS') or {})
+        self.default_ttl = config.get('GPT_CACHE_DEFAULT_TTL', self.default_ttl)
+        self.max_rows = config.get('GPT_CACHE_MAX_ROWS', self.max_rows)
+        self.memory = LRUCache(config.get('GPT_CACHE_MEMORY_SIZE', 1000))
+
+        # The app's commits flush this cache's buffered replies (see _flush_before_commit)
+        app.extensions['gpt_response_cache'] = self
+
+    def enabled_for(self, method):
+        return self.enabled and method in self.methods
+
+    def ttl_for(self, method):
+        return self.ttls.get(method, self.default_ttl)
+
+    @staticmethod
+    def make_key(method, model, messages, temperature):
+        """
+        Hash a request into its cache key; any change to the prompt, model or
+        temperature gives a different key.
+        """
+        payload = json.dumps([method, model, messages, temperature], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, method):
+        """
+        Return the cached reply content for key, or None on a miss.
+        """
+        content = self.memory.get(key)
+        if content is not None:
+            self._count(method, 'memory_hits')
+            return content
+
+        # A forgotten entry stays in the table until the next commit; don't read it back
+        with self._lock:
+            forgotten = key in self._pending and self._pending[key] is None
+        if forgotten:
+            self._count(method, 'misses')
+            return None
+
+        row = self._db_read(key)
+        if row is not None:
+            content, expires_at = row
+            remaining = (expires_at - datetime.utcnow()).total_seconds() if expires_at else None
+            if remaining is None or remaining > 0:
+                self.memory.set(key, content, ttl=remaining)
+                self._count(method, 'db_hits')
+                return content
+            self._count(method, 'expired')
+
+        self._count(method, 'misses')
+        return None
+
+    def set(self, key, method, model, content):
+        """
+        Store a reply in memory and queue it for the database (see flush()).
+        """
+        ttl = self.ttl_for(method)
+        self.memory.set(key, content, ttl=ttl)
+        now = datetime.utcnow()
+        with self._lock:
+            self._pending[key] = {
+                'key': key,
+                'method': method,
+                'model': model,
+                'content': content,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=ttl) if ttl else None
+            }
+        self._count(method, 'writes')
+
+    def forget(self, key):
+        """
+        Drop an entry, e.g. a cached reply that turned out to be unparseable.
+        """
+        self.memory.delete(key)
+        with self._lock:
+            self._pending[key] = None
+
+    def get_stats(self):
+        """
+        Return hit / miss / eviction counters, overall and per method.
+        """
+        with self._lock:
+            stats = Counter(self.stats)
+            by_method = {method: dict(counts) for method, counts in self.method_stats.items()}
+        hits = stats['memory_hits'] + stats['db_hits']
+        lookups = hits + stats['misses'] + stats['expired']
+        return dict(
+            stats,
+            memory_entries=len(self.memory),
+            memory_evictions=self.memory.evictions,
+            hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+            by_method=by_method
+        )
+
+    def _count(self, method, name):
+        # Called from request and worker threads alike
+        with self._lock:
+            self.stats[name] += 1
+            self.method_stats[method][name] += 1
+
+    # ------------------------------------------------------
+    # Database tier
+    # ------------------------------------------------------
+    def _in_own_app(self):
+        return has_app_context() and current_app._get_current_object() is self.app
+
+    def _db_read(self, key):
+        if self.app is None:
+            return None
+        table = GPTResponse.__table__
+        query = db.select(table.c.content, table.c.expires_at).where(table.c.key == key)
+        try:
+            if self._in_own_app():
+                row = db.session.execute(query).first()
+            else:
+                # Worker thread: read through a short-lived app context of our own
+                with self.app.app_context():
+                    row = db.session.execute(query).first()
+                    db.session.remove()
+        except Exception as e:
+            # The memory tier keeps working if the table is missing
+            print(f"[GPT Cache ERROR] Database read failed: {e}")
+            return None
+        return tuple(row) if row else None
+
+    def flush(self, session=None):
+        """
+        Write buffered replies (and deletions) through the session, then evict
+        the oldest rows beyond GPT_CACHE_MAX_ROWS. The caller commits.
+        """
+        session = session or db.session
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        table = GPTResponse.__table__
+        rows = [row for row in pending.values() if row]
+        deleted = [key for key, row in pending.items() if row is None]
+        if deleted:
+            session.execute(table.delete().where(table.c.key.in_(deleted)))
+        bulk_upsert(GPTResponse, rows, index_elements=['key'],
+                    update_columns=['method', 'model', 'content', 'created_at', 'expires_at'],
+                    connection=session.connection())
+
+        total = session.execute(db.select(db.func.count()).select_from(table)).scalar()
+        excess = total - self.max_rows
+        if excess > 0:
+            oldest = db.select(table.c.key).order_by(table.c.created_at).limit(excess)
+            session.execute(table.delete().where(table.c.key.in_(oldest)))
+            with self._lock:
+                self.stats['evictions'] += excess
+
+
+@event.listens_for(db.session, 'before_commit')
+def _flush_before_commit(session):
+    # One listener for the process: write the replies buffered by the current
+    # app's cache in the same transaction as the commit
+    if not has_app_context():
+        return
+    cache = current_app.extensions.get('gpt_response_cache')
+    if cache is not None and cache._pending:
+        cache.flush(session)
@@ -0,0 +1,222 @@
+# app/services/ingest_jobs.py
+
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.models import db, IngestJob
+from app.services.insights import generate_user_insights
+from app.services.single_flight import single_flight_lock
+
+
+# ----------------------------------------------------------
+# Enqueue / inspect ingest jobs
+# ----------------------------------------------------------
+def enqueue_ingest(user_id, run_inline=False):
+    """
+    Queue an ingest + insights run for a user, unless one is already in flight.
+
+    A per-user single-flight lock (shared by all processes through the database)
+    makes the check-then-insert atomic, so double-submitted logins or two open
+    tabs attach to the same job instead of running the whole pipeline twice.
+
+    Parameters:
+        user_id (str): User to ingest.
+        run_inline (bool): Create the job already claimed as 'running' because the
+            caller will execute it itself instead of leaving it for a worker.
+
+    Returns:
+        tuple: (IngestJob, attached) where attached is True if an in-flight job was reused.
+    """
+    timeout = current_app.config.get('INGEST_JOB_TIMEOUT', 600)
+
+    with single_flight_lock(f"ingest:{user_id}"):
+        active = find_active_job(user_id, timeout)
+        if active:
+            print(f"🔗 Attaching to in-flight ingest job {active.id} for user {user_id}")
+            return active, True
+
+        job = IngestJob(user_id=user_id, status='queued', stage='Waiting for a worker', progress=0)
+        if run_inline:
+            job.status = 'running'
+            job.stage = 'Starting'
+            job.worker_id = f"inline:{socket.gethostname()}:{os.getpid()}"
+            job.started_at = datetime.utcnow()
+            job.attempts = 1
+        db.session.add(job)
+        db.session.commit()
+
+    print(f"📥 Queued ingest job {job.id} for user {user_id}")
+    return job, False
+
+
+def find_active_job(user_id, timeout_seconds):
+    """
+    Return the user's queued or running job, ignoring runs older than the job
+    timeout (their worker is presumed dead).
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    return (
+        IngestJob.query.filter(
+            IngestJob.user_id == user_id,
+            db.or_(
+                IngestJob.status == 'queued',
+                db.and_(IngestJob.status == 'running', IngestJob.started_at >= cutoff)
+            )
+        )
+        .order_by(IngestJob.id.desc())
+        .first()
+    )
+
+
+def wait_for_job(job_id, timeout, poll_interval=1.0):
+    """
+    Block until a job finishes or the timeout passes.
+
+    Returns:
+        IngestJob: The job in its latest state (may still be unfinished on timeout).
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        db.session.expire_all()
+        job = db.session.get(IngestJob, job_id)
+        if job.is_finished or time.monotonic() >= deadline:
+            return job
+        time.sleep(poll_interval)
+
+
+def get_job_result(job):
+    """
+    Decode the insights stored on a finished job.
+
+    Returns:
+        dict: Insights keyed like INSIGHT_SESSION_KEYS (empty if none stored).
+    """
+    return json.loads(job.result) if job and job.result else {}
+
+
+# ----------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest queued job to 'running' for this worker.
+
+    The conditional UPDATE (status must still be 'queued') means two workers
+    polling at the same time can never claim the same job.
+
+    Returns:
+        IngestJob: The claimed job, or None if the queue is empty.
+    """
+    while True:
+        job = (
+            IngestJob.query.filter_by(status='queued')
+            .order_by(IngestJob.created_at, IngestJob.id)
+            .first()
+        )
+        if not job:
+            return None
+
+        claimed = IngestJob.query.filter_by(id=job.id, status='queued').update({
+            'status': 'running',
+            'worker_id': worker_id,
+            'started_at': datetime.utcnow(),
+            'attempts': IngestJob.attempts + 1,
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed == 1:
+            db.session.refresh(job)
+            return job
+
+
+def requeue_stale_jobs(timeout_seconds, max_attempts):
+    """
+    Recover jobs whose worker died mid-run: put them back in the queue,
+    or mark them failed once they have used up their attempts.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    stale = IngestJob.query.filter(IngestJob.status == 'running', IngestJob.started_at < cutoff).all()
+
+    for job in stale:
+        if job.attempts >= max_attempts:
+            job.status = 'failed'
+            job.error = 'Worker timed out'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.stage = 'Retrying'
+        print(f"⚠️ Recovered stale ingest job {job.id} -> {job.status}")
+
+    if stale:
+        db.session.commit()
+
+
+def run_job(job, spotify_api, gpt):
+    """
+    Execute one claimed job and persist its insights or error.
+    """
+    job_id = job.id
+
+    def on_progress(stage, percent):
+        job.stage = stage
+        job.progress = percent
+        db.session.commit()
+
+    try:
+        insights = generate_user_insights(job.user_id, spotify_api, gpt, on_progress=on_progress)
+        if insights is None:
+            raise RuntimeError('Spotify import failed (missing or expired access token)')
+
+        job.result = json.dumps(insights)
+        job.status = 'done'
+        job.stage = 'Done'
+        job.progress = 100
+    except Exception as e:
+        print(f"❌ Ingest job {job_id} failed: {e}")
+        db.session.rollback()
+        job = db.session.get(IngestJob, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    print(f"🏁 Ingest job {job_id} finished with status '{job.status}'")
+    return job
+
+
+def run_worker(app, spotify_api, gpt, once=False):
+    """
+    Poll the ingest_job table and run queued jobs until interrupted.
+
+    Needs no broker: workers coordinate purely through the database, so any
+    number of them can run against SQLite or PostgreSQL.
+
+    Parameters:
+        app (Flask): Application providing config and database access.
+        spotify_api (SpotifyAPI): Initialised Spotify client.
+        gpt (ChatGPT): Initialised ChatGPT client.
+        once (bool): Drain the queue and return instead of polling forever.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    poll_interval = app.config.get('INGEST_WORKER_POLL_INTERVAL', 2.0)
+    timeout = app.config.get('INGEST_JOB_TIMEOUT', 600)
+    max_attempts = app.config.get('INGEST_JOB_MAX_ATTEMPTS', 2)
+    print(f"👷 Ingest worker {worker_id} started")
+
+    while True:
+        # A fresh app context per job keeps the session's identity map small
+        with app.app_context():
+            requeue_stale_jobs(timeout, max_attempts)
+            job = claim_next_job(worker_id)
+            if job:
+                run_job(job, spotify_api, gpt)
+                continue
+
+        if once:
+            return
+        time.sleep(poll_interval)
@@ -0,0 +1,100 @@
+# app/services/insight_orchestrator.py
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# ----------------------------------------------------------
+# Concurrent execution of independent insight calls
+# ----------------------------------------------------------
+def run_insight_calls(calls, dependents=None, max_workers=6, call_timeout=30, deadline=60):
+    """
+    Run independent (network-bound) insight calls concurrently on a bounded
+    thread pool, so total latency is roughly the slowest call rather than the
+    sum of all of them.
+
+    A dependent call starts as soon as the call it depends on succeeds, and
+    receives that call's result; if the dependency fails or times out it is
+    skipped. Calls still running when their own timeout or the overall
+    deadline passes are abandoned: their result is left out and the worker
+    thread is not waited for.
+
+    Args:
+        calls (dict): {name: callable()} of independent calls.
+        dependents (dict): {name: (dependency name, callable(dependency result))}.
+        max_workers (int): Thread pool bound.
+        call_timeout (float): Seconds a single call may run once started.
+        deadline (float): Seconds to wait for the whole set before assembling what finished.
+
+    Returns:
+        tuple: ({name: result} for every call that finished in time,
+                {name: {'status': 'ok' | 'error' | 'timeout' | 'skipped', 'seconds': float or None}})
+    """
+    dependents = dependents or {}
+    started, finished = {}, {}
+    results, report = {}, {}
+
+    def timed(name, fn, *args):
+        started[name] = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            finished[name] = time.monotonic()
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='insight')
+    futures = {pool.submit(timed, name, fn): name for name, fn in calls.items()}
+    waiting = dict(dependents)
+    end = time.monotonic() + deadline
+
+    try:
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            call_ends = [started[futures[f]] + call_timeout for f in pending if futures[f] in started]
+            timeout = min([end] + call_ends) - now
+            if timeout <= 0:
+                break
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                seconds = finished.get(name, time.monotonic()) - started.get(name, time.monotonic())
+                error = future.exception()
+                if error is not None:
+                    print(f"[Insights ERROR] {name} failed: {error}")
+                    report[name] = {'status': 'error', 'seconds': seconds}
+                else:
+                    results[name] = future.result()
+                    report[name] = {'status': 'ok', 'seconds': seconds}
+
+                # Start whatever was waiting on this call
+                for dependent, (dependency, fn) in list(waiting.items()):
+                    if dependency == name and name in results:
+                        del waiting[dependent]
+                        new = pool.submit(timed, dependent, fn, results[name])
+                        futures[new] = dependent
+                        pending.add(new)
+
+            # Abandon calls that have run past their own timeout
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                if name in started and now - started[name] >= call_timeout:
+                    pending.discard(future)
+                    report[name] = {'status': 'timeout', 'seconds': now - started[name]}
+
+        now = time.monotonic()
+        for future in pending:
+            name = futures[future]
+            report[name] = {'status': 'timeout', 'seconds': now - started[name] if name in started else None}
+        for name in list(calls) + list(dependents):
+            report.setdefault(name, {'status': 'skipped', 'seconds': None})
+    finally:
+        # Don't block on abandoned calls; queued ones are cancelled
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    print("[Insights] " + ", ".join(
+        f"{name} {entry['status']}" + (f" in {entry['seconds']:.2f}s" if entry['seconds'] is not None else "")
+        for name, entry in report.items()
+    ))
+    return results, report
@@ -0,0 +1,191 @@
+# app/services/insights.py
+
+import re
+
+from flask import current_app
+
+from app.models import db, User, Track
+from app.services.freshness import InsightCache, get_ingest_state
+from app.services.insight_orchestrator import run_insight_calls
+from app.services.spotify_ingest import fetch_and_store_user_data, enrich_recommended_tracks_with_album_art
+
+# Session keys the visualise page reads the insights from
+INSIGHT_SESSION_KEYS = (
+    'mood_counts',
+    'mood_summary',
+    'mbti_type',
+    'mbti_summary',
+    'personality_image_url',
+    'mood_time_ranges',
+    'recommended_tracks_by_mood',
+)
+
+# Insight cache keys filled by the single combined GPT call, and the
+# ChatGPT.infer_user_insights field each one comes from
+TEXT_INSIGHT_KEYS = ('mood_summary', 'gpt_recs_by_mood', 'mbti_type', 'mbti_summary', 'mood_time_ranges')
+_COMBINED_FIELD_FOR_KEY = {'gpt_recs_by_mood': 'recommendations'}
+
+# What each single-purpose ChatGPT method returns when its call fails, used for
+# parallel calls that error out or miss the deadline
+_PARALLEL_FALLBACKS = {
+    'mood_summary': None,
+    'gpt_recs_by_mood': {},
+    'mbti_type': 'INTJ',
+    'mbti_summary': 'Calm and introspective listener',
+    'mood_time_ranges': {},
+}
+
+
+def _rename_combined_insights(combined):
+    return {key: combined.get(_COMBINED_FIELD_FOR_KEY.get(key, key)) for key in TEXT_INSIGHT_KEYS}
+
+
+def _parallel_insights(gpt, gpt_input, portrait):
+    """
+    Run the five single-purpose insight calls concurrently, starting the
+    portrait as soon as the MBTI type is known.
+
+    Calls that fail or run past their timeout get the value their method falls
+    back to on its own. The portrait is returned under 'personality_image_url'
+    along with its status, since a timed-out call may still be running.
+
+    Args:
+        portrait (callable): portrait(mbti_type) -> image URL; runs on a worker
+            thread, so it must not write shared state.
+    """
+    config = current_app.config
+    results, report = run_insight_calls(
+        {
+            'mood_summary': lambda: gpt.analyze_user_tracks(gpt_input),
+            'gpt_recs_by_mood': lambda: gpt.recommend_tracks_by_mood(gpt_input),
+            'mbti_type': lambda: gpt.infer_mbti_type(gpt_input),
+            'mbti_summary': lambda: gpt.infer_mbti_summary(gpt_input),
+            'mood_time_ranges': lambda: gpt.infer_mood_time_ranges(gpt_input),
+        },
+        dependents={'personality_image_url': ('mbti_type', portrait)},
+        max_workers=config.get('INSIGHT_MAX_WORKERS', 6),
+        call_timeout=config.get('INSIGHT_CALL_TIMEOUT', 30),
+        deadline=config.get('INSIGHT_DEADLINE', 60),
+    )
+    insights = {
+        key: results[key] if results.get(key) is not None else fallback
+        for key, fallback in _PARALLEL_FALLBACKS.items()
+    }
+    insights['personality_image_url'] = results.get('personality_image_url')
+    insights['personality_image_status'] = report['personality_image_url']['status']
+    return insights
+
+
+# ----------------------------------------------------------
+# Ingest + GPT insights for one user
+# ----------------------------------------------------------
+def generate_user_insights(user_id, spotify_api, gpt, on_progress=None):
+    """
+    Runs the full Spotify ingest for a user and derives every GPT insight
+    shown on the visualise page.
+
+    Parameters:
+        user_id (str): Primary key of the user to ingest.
+        spotify_api (SpotifyAPI): Spotify client used for ingest and album art search.
+        gpt (ChatGPT): ChatGPT client used for classification and summaries.
+        on_progress (callable): Optional callback(stage, percent) for job progress.
+
+    Returns:
+        dict: Insights keyed by INSIGHT_SESSION_KEYS, or None if ingest failed.
+    """
+    def progress(stage, percent):
+        if on_progress:
+            on_progress(stage, percent)
+
+    progress('Importing your Spotify tracks', 10)
+    mood_counts = fetch_and_store_user_data(user_id, spotify_api, gpt)
+    if mood_counts is False:
+        return None
+    print("✅ Imported Spotify data for user", user_id)
+    print("🎵 Mood breakdown:", mood_counts)
+
+    # Fetch tracks from DB and prepare track data for GPT (ordered, so its hash is stable)
+    user = db.session.get(User, user_id)
+    tracks = Track.query.filter_by(user_id=user_id).order_by(Track.time_range, Track.rank, Track.id).all()
+    gpt_input = []
+    for track in tracks:
+        gpt_input.append({
+            "name": track.name,
+            "artist": track.artist,
+            "album": track.album,
+            "genre": track.genre or "Unknown",
+            "mood": track.mood or "Unknown"
+        })
+
+    # Only recompute the summaries whose inputs changed since the last ingest
+    state = get_ingest_state(user_id, create=True)
+    cache = InsightCache(state)
+    insights = {'mood_counts': mood_counts}
+
+    # 🎨 MBTI + mood-based personality image (regenerated only when either changes)
+    dominant_mood = max(mood_counts, key=mood_counts.get, default="Chill")
+
+    def portrait(mbti_type):
+        return cache.lookup('personality_image_url', [mbti_type, dominant_mood]) \
+            or gpt.generate_personality_image_url(mbti_type, dominant_mood)
+
+    # 🧠 Mood summary, 💬 recommendations, 🧬 MBTI type + summary and ⏰ mood time ranges,
+    # all derived from the same track list: either in one structured GPT call, or as
+    # separate calls run concurrently with the portrait chained after the MBTI type
+    progress('Reading your music personality', 50)
+    parallel = {}
+
+    def compute_parallel():
+        parallel.update(_parallel_insights(gpt, gpt_input, portrait))
+        return parallel
+
+    if current_app.config.get('INSIGHT_MODE', 'combined') == 'parallel':
+        compute = compute_parallel
+    else:
+        compute = lambda: _rename_combined_insights(gpt.infer_user_insights(gpt_input))
+    text_insights = cache.get_many(TEXT_INSIGHT_KEYS, gpt_input, compute)
+    gpt_recs_by_mood = text_insights.pop('gpt_recs_by_mood')
+    insights.update(text_insights)
+
+    # In parallel mode the portrait was already requested alongside the MBTI type.
+    # It is only generated here if the orchestrator never started it (the MBTI call
+    # failed) and a usable type is left; a portrait call that errored or timed out
+    # is not repeated, since it may still be running
+    progress('Painting your personality portrait', 80)
+    mbti_type = insights['mbti_type']
+    status = parallel.get('personality_image_status')
+    if status == 'ok':
+        generate = lambda: parallel['personality_image_url']
+    elif status is None or (status == 'skipped' and re.fullmatch(r"[EI][NS][TF][JP]", mbti_type or '')):
+        generate = lambda: portrait(mbti_type)
+    else:
+        generate = None
+    insights['personality_image_url'] = cache.get(
+        'personality_image_url', [mbti_type, dominant_mood], generate
+    ) if generate else None
+
+    # 🎵 Enrich GPT recommendations with album art
+    progress('Adding album art', 90)
+    insights['recommended_tracks_by_mood'] = cache.get(
+        'recommended_tracks_by_mood', gpt_recs_by_mood,
+        lambda: enrich_recommended_tracks_with_album_art(gpt_recs_by_mood, user.access_token, spotify_api)
+    )
+
+    if cache.recomputed:
+        print(f"[Insights] Recomputed {', '.join(cache.recomputed)} for user {user_id}")
+    else:
+        print(f"[Insights] Inputs unchanged for user {user_id}; reused every stored insight")
+
+    cache.save(insights)
+    db.session.commit()
+
+    return insights
+
+
+def store_insights_in_session(insights, session):
+    """
+    Copy generated insights into the Flask session for the visualise page.
+    """
+    for key in INSIGHT_SESSION_KEYS:
+        if key in insights:
+            session[key] = insights[key]
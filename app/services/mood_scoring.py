@@ -0,0 +1,91 @@
+# app/services/mood_scoring.py
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import update
+
+from app.models import db, AudioFeatures
+from app.utils.mood_engine import FEATURE_COLUMNS, features_to_matrix, rule_set_from_config
+
+
+def current_rule_set():
+    """
+    The compiled mood rules configured for this app (MOOD_RULES / MOOD_RULES_VERSION).
+    """
+    return rule_set_from_config(current_app.config)
+
+
+# ----------------------------------------------------------
+# Batch re-scoring of stored AudioFeatures moods
+# ----------------------------------------------------------
+def rescore_audio_features(chunk_size=5000, only_stale=True, rule_set=None):
+    """
+    Recompute AudioFeatures.mood with the vectorised rules, walking the table
+    in primary-key order one chunk at a time so memory stays bounded.
+
+    Each chunk is read as plain column tuples (no ORM objects), scored in one
+    NumPy pass, and written back in one executemany UPDATE that also stamps
+    the rule-set version.
+
+    Args:
+        chunk_size (int): Rows read, scored and committed per round.
+        only_stale (bool): Skip rows already scored by the current rule-set version.
+        rule_set (MoodRuleSet): Rules to apply (defaults to current_rule_set()).
+
+    Returns:
+        dict: {'scanned': rows read, 'changed': rows whose mood changed, 'version': rule-set version}
+    """
+    rule_set = rule_set or current_rule_set()
+    columns = [getattr(AudioFeatures, name) for name in FEATURE_COLUMNS]
+    scanned = changed = 0
+    last_id = None
+
+    while True:
+        query = db.session.query(AudioFeatures.id, AudioFeatures.mood, *columns).order_by(AudioFeatures.id)
+        if only_stale:
+            query = query.filter(db.or_(AudioFeatures.mood_rules_version.is_(None),
+                                        AudioFeatures.mood_rules_version != rule_set.version))
+        if last_id is not None:
+            query = query.filter(AudioFeatures.id > last_id)
+        rows = query.limit(chunk_size).all()
+        if not rows:
+            break
+
+        matrix = np.array([row[2:] for row in rows], dtype=float, order='F')
+        labels = rule_set.classify(matrix)
+
+        db.session.execute(update(AudioFeatures), [
+            {'id': row[0], 'mood': str(label), 'mood_rules_version': rule_set.version}
+            for row, label in zip(rows, labels)
+        ])
+        db.session.commit()
+
+        scanned += len(rows)
+        changed += sum(1 for row, label in zip(rows, labels) if row[1] != label)
+        last_id = rows[-1][0]
+        print(f"[Moods] Re-scored {scanned} audio feature rows ({changed} changed) with rules {rule_set.version}")
+
+    return {'scanned': scanned, 'changed': changed, 'version': rule_set.version}
+
+
+def refresh_stale_moods(features_rows, rule_set=None):
+    """
+    Lazily re-score loaded AudioFeatures objects stamped with an older rule-set
+    version, in one vectorised pass, before their moods are displayed.
+
+    Returns:
+        int: Number of rows that were re-scored.
+    """
+    rule_set = rule_set or current_rule_set()
+    stale = [row for row in features_rows if row.mood_rules_version != rule_set.version]
+    if not stale:
+        return 0
+
+    matrix, _ = features_to_matrix([{name: getattr(row, name) for name in FEATURE_COLUMNS} for row in stale])
+    for row, label in zip(stale, rule_set.classify(matrix)):
+        row.mood = str(label)
+        row.mood_rules_version = rule_set.version
+    db.session.commit()
+
+    print(f"[Moods] Lazily re-scored {len(stale)} stale audio feature rows with rules {rule_set.version}")
+    return len(stale)
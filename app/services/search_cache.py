@@ -0,0 +1,160 @@
+# app/services/search_cache.py
+
+import json
+import re
+import unicodedata
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+
+from app.models import SearchCache
+from app.services.db_utils import bulk_upsert
+from app.utils.lru import LRUCache
+
+# Process-wide counters, e.g. {'memory_hits': 40, 'db_hits': 12, 'api_searches': 3, 'negative_hits': 1}
+search_cache_stats = Counter()
+
+# In-process LRU in front of the search_cache table (sized from config on first use)
+_memory = None
+_MISSING = object()
+
+
+def _memory_cache():
+    global _memory
+    if _memory is None:
+        _memory = LRUCache(current_app.config.get('SEARCH_CACHE_MEMORY_SIZE', 2000))
+    return _memory
+
+
+def normalize_search_key(track_name, artist_name):
+    """
+    Build the cache key for a search: case, accents-compatible forms and
+    whitespace differences in GPT's spelling of a song map to the same key.
+    """
+    def clean(text):
+        text = unicodedata.normalize('NFKC', text or '').casefold()
+        return re.sub(r'\s+', ' ', text).strip(' "\'')
+
+    return f"{clean(track_name)}|{clean(artist_name)}"[:255]
+
+
+# ----------------------------------------------------------
+# Cached Spotify track search
+# ----------------------------------------------------------
+def search_tracks_cached(queries, access_token, spotify_api):
+    """
+    Resolve (track name, artist) pairs to Spotify tracks, checking the
+    in-process LRU, then the search_cache table, and only then the Search API.
+
+    Misses are cached too (for SEARCH_CACHE_NEGATIVE_TTL) so songs Spotify
+    does not know stop costing a search on every login; failed requests are
+    never cached.
+
+    Args:
+        queries (list): List of (track_name, artist_name) tuples.
+        access_token (str): Spotify access token for uncached searches.
+        spotify_api (SpotifyAPI): Client providing search_tracks().
+
+    Returns:
+        list: One search_track-shaped result (or None) per query, in order.
+    """
+    ttl = current_app.config.get('SEARCH_CACHE_TTL', 30 * 24 * 3600)
+    negative_ttl = current_app.config.get('SEARCH_CACHE_NEGATIVE_TTL', 24 * 3600)
+    memory = _memory_cache()
+
+    keys = [normalize_search_key(name, artist) for name, artist in queries]
+    resolved = {}
+
+    # 1. In-process LRU
+    for key in set(keys):
+        value = memory.get(key, _MISSING)
+        if value is not _MISSING:
+            resolved[key] = value
+            search_cache_stats['memory_hits'] += 1
+
+    # 2. Database, one IN query for everything the LRU did not have
+    pending = [key for key in set(keys) if key not in resolved]
+    if pending:
+        now = datetime.utcnow()
+        for row in SearchCache.query.filter(SearchCache.key.in_(pending)).all():
+            row_ttl = ttl if row.found else negative_ttl
+            age = (now - row.fetched_at).total_seconds() if row.fetched_at else row_ttl
+            if age >= row_ttl:
+                continue
+            value = _row_to_result(row)
+            resolved[row.key] = value
+            memory.set(row.key, value, ttl=row_ttl - age)
+            search_cache_stats['db_hits'] += 1
+
+    # 3. Spotify Search API for the rest, one search per distinct key
+    first_query = {}
+    for key, query in zip(keys, queries):
+        if key not in resolved:
+            first_query.setdefault(key, query)
+
+    if first_query:
+        search_keys = list(first_query)
+        results = spotify_api.search_tracks([first_query[key] for key in search_keys], access_token)
+        search_cache_stats['api_searches'] += len(search_keys)
+
+        rows = []
+        now = datetime.utcnow()
+        for key, result in zip(search_keys, results):
+            if result is False:
+                # Request failed (token, network, throttling): don't remember it
+                resolved[key] = None
+                continue
+            resolved[key] = result
+            memory.set(key, result, ttl=ttl if result else negative_ttl)
+            rows.append(_result_to_row(key, result, now))
+
+        bulk_upsert(
+            SearchCache, rows,
+            index_elements=['key'],
+            update_columns=['found', 'track_id', 'name', 'artist', 'album', 'images', 'fetched_at']
+        )
+
+    search_cache_stats['negative_hits'] += sum(
+        1 for key in set(keys) if key not in first_query and resolved.get(key) is None
+    )
+    return [resolved.get(key) for key in keys]
+
+
+def _row_to_result(row):
+    if not row.found:
+        return None
+    return {
+        "name": row.name,
+        "artist": row.artist,
+        "album": {
+            "name": row.album,
+            "images": json.loads(row.images) if row.images else []
+        },
+        "id": row.track_id
+    }
+
+
+def _result_to_row(key, result, fetched_at):
+    if not result:
+        return {'key': key, 'found': False, 'track_id': None, 'name': None, 'artist': None,
+                'album': None, 'images': None, 'fetched_at': fetched_at}
+    return {
+        'key': key,
+        'found': True,
+        'track_id': result['id'],
+        'name': result['name'],
+        'artist': result['artist'],
+        'album': result['album']['name'],
+        'images': json.dumps(result['album']['images']),
+        'fetched_at': fetched_at
+    }
+
+
+def get_search_cache_stats():
+    """
+    Return the cumulative cache counters and hit rate for this process.
+    """
+    hits = search_cache_stats['memory_hits'] + search_cache_stats['db_hits']
+    lookups = hits + search_cache_stats['api_searches']
+    return dict(search_cache_stats, hit_rate=round(hits / lookups, 3) if lookups else 0.0)
@@ -0,0 +1,74 @@
+# app/services/single_flight.py
+
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, IngestLock
+
+
+class LockTimeout(RuntimeError):
+    """Raised when a single-flight lock could not be acquired in time."""
+
+
+# ----------------------------------------------------------
+# Cross-process lock backed by a database row
+# ----------------------------------------------------------
+@contextmanager
+def single_flight_lock(key, ttl=30, wait=10, poll_interval=0.05):
+    """
+    Hold a named lock shared by every web and worker process using the database.
+
+    The lock is a row in ingest_lock: inserting it acquires the lock (a primary key
+    conflict means someone else holds it) and deleting it releases it. Rows past
+    their expiry are taken over, so a crashed holder can't block others forever.
+    This works the same on SQLite and PostgreSQL.
+
+    Must be entered with no pending changes in db.session, since a failed
+    acquisition rolls the session back.
+
+    Args:
+        key (str): Lock name, e.g. 'ingest:<user_id>'.
+        ttl (int): Seconds before a held lock is considered abandoned.
+        wait (float): Seconds to keep retrying before raising LockTimeout.
+        poll_interval (float): Seconds between acquisition attempts.
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}:{uuid.uuid4().hex[:8]}"
+    deadline = time.monotonic() + wait
+
+    while not _try_acquire(key, owner, ttl):
+        if time.monotonic() >= deadline:
+            raise LockTimeout(f"Could not acquire lock '{key}' within {wait}s")
+        time.sleep(poll_interval)
+
+    try:
+        yield
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        IngestLock.query.filter_by(key=key, owner=owner).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _try_acquire(key, owner, ttl):
+    now = datetime.utcnow()
+
+    # Take over a lock whose holder died without releasing it
+    IngestLock.query.filter(IngestLock.key == key, IngestLock.expires_at < now).delete(synchronize_session=False)
+
+    try:
+        db.session.execute(db.insert(IngestLock).values(
+            key=key, owner=owner, expires_at=now + timedelta(seconds=ttl)
+        ))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
@@ -1,23 +1,29 @@
 # app/services/spotify_ingest.py
 
-from collections import Counter
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from flask import current_app
 from app.models import db, User, Track, AudioFeatures
-from app.utils.spotify import SpotifyAPI
 from app.utils.chatgpt import ChatGPT
-from sqlalchemy.exc import IntegrityError
+from app.utils.mood_engine import features_to_matrix, label_confident_moods
+from app.services.artist_genres import resolve_track_genres
+from app.services.db_utils import bulk_upsert
+from app.services.freshness import content_hash, get_ingest_state, load_json
+from app.services.mood_scoring import current_rule_set
+from app.services.search_cache import search_tracks_cached
+from app.services.track_catalog import lookup_annotations, resolve_from_catalog, store_annotations
 from sqlalchemy import func
 
 def refresh_token(user, spotify_api):
     import base64
-    import requests
 
     if not user.refresh_token:
         print("❌ No refresh token available.")
         return False
 
-    # Spotify token endpoint
-    token_url = "https://accounts.spotify.com/api/token"
+    # Spotify token endpoint (TOKEN_URL)
+    token_url = spotify_api.token_url or "https://accounts.spotify.com/api/token"
 
     auth_string = f"{spotify_api.client_id}:{spotify_api.client_secret}"
     auth_bytes = auth_string.encode('utf-8')
@@ -33,7 +39,7 @@ def refresh_token(user, spotify_api):
         'refresh_token': user.refresh_token
     }
 
-    response = requests.post(token_url, headers=headers, data=data)
+    response = spotify_api.http.post(token_url, headers=headers, data=data)
 
     if response.status_code != 200:
         print("❌ Failed to refresh token:", response.text)
@@ -56,16 +62,24 @@ def refresh_token(user, spotify_api):
 # ----------------------------------------------------------
 # Fetch and Store User's Spotify Data
 # ----------------------------------------------------------
-def fetch_and_store_user_data(user_id, spotify_api, gpt):
+def fetch_and_store_user_data(user_id, spotify_api, gpt, concurrent=None):
     """
     Fetches and stores Spotify data (tracks and audio features) for a given user,
     enriches each track with mood and ChatGPT-derived genre information,
     and stores it in the database.
 
+    The top tracks of all three time ranges are fetched first and merged into the
+    set of unique track IDs, so a song that appears in several ranges is enriched
+    (audio features, catalog lookup, artist genres, local moods, GPT labels) exactly once and the result is
+    fanned out to its per-range Track rows. In concurrent mode the network-bound
+    stages run in a bounded thread pool, while every database read and write stays
+    on the caller's session.
+
     Parameters:
         user_id (str): Spotify user ID (same as primary key in User table).
         spotify_api (SpotifyAPI): Instance of SpotifyAPI wrapper for making Spotify requests.
         gpt (ChatGPT): Instance of ChatGPT class to call OpenAI API for genre classification.
+        concurrent (bool): Run the network stages in parallel (defaults to INGEST_CONCURRENT).
 
     Returns:
         dict: A dictionary containing mood counts inferred from genres.
@@ -82,88 +96,75 @@ def fetch_and_store_user_data(user_id, spotify_api, gpt):
         if not refresh_token(user, spotify_api):
             return False
 
+    if concurrent is None:
+        concurrent = current_app.config.get('INGEST_CONCURRENT', False)
+
     time_ranges = ['short_term', 'medium_term', 'long_term']
-    mood_counts = Counter()
+    access_token = user.access_token
 
-    for time_range in time_ranges:
+    pool = ThreadPoolExecutor(max_workers=current_app.config.get('INGEST_MAX_WORKERS', 3)) if concurrent else None
+    try:
         # 🎧 Get user's top tracks for each time range
-        tracks_data = spotify_api.get_top_tracks(user.access_token, time_range)
-        if not tracks_data:
-            continue
-
-        track_ids = []
-
-        for i, item in enumerate(tracks_data['items']):
-            track_id = item['id']
-            artist_name = item['artists'][0]['name']
-            track_name = item['name']
-            album_name = item['album']['name']
-
-            # Check if track already exists for this user and time_range
-            existing_track = Track.query.filter_by(
-                id=track_id,
-                user_id=user.id,
-                time_range=time_range
-            ).first()
-
-            # Only call GPT if genre or mood is missing or marked Unavailable
-            genre = existing_track.genre if existing_track and existing_track.genre else gpt.classify_genre(track_name, artist_name, album_name)
-            if not existing_track or not existing_track.genre:
-                print(f"[GPT] Genre for '{track_name}' by {artist_name}: {genre}")
-
-            features = spotify_api.get_audio_features(user.access_token, [track_id]).get(track_id, {})
-            mood_input = f"{track_name} by {artist_name} with valence {features.get('valence')} and energy {features.get('energy')}"
-            mood = existing_track.mood if existing_track and existing_track.mood and existing_track.mood != "Unavailable" else gpt.analyze_mood(mood_input)
-            if not existing_track or not existing_track.mood or existing_track.mood == "Unavailable":
-                print(f"[GPT] Mood for '{track_name}': {mood}")
-
-            try:
-                if existing_track:
-                    # Update essential fields
-                    existing_track.rank = i + 1
-                    existing_track.popularity = item['popularity']
-                    existing_track.created_at = datetime.utcnow()
-
-                    if not existing_track.genre:
-                        existing_track.genre = genre
-                    if not existing_track.mood or existing_track.mood == "Unavailable":
-                        existing_track.mood = mood
-
-                    print(f"✅ Updated track: {track_name} ({track_id})")
-
-                else:
-                    # Add new track
-                    new_track = Track(
-                        id=track_id,
-                        user_id=user.id,
-                        name=track_name,
-                        artist=artist_name,
-                        album=album_name,
-                        album_image_url=item['album']['images'][0]['url'] if item['album']['images'] else None,
-                        popularity=item['popularity'],
-                        time_range=time_range,
-                        rank=i + 1,
-                        created_at=datetime.utcnow(),
-                        genre=genre,
-                        mood=mood
-                    )
-                    db.session.add(new_track)
-                    print(f"➕ Added new track: {track_name} ({track_id})")
-
-                track_ids.append(track_id)
-
-            except IntegrityError as e:
-                db.session.rollback()
-                print(f"⚠️ IntegrityError for track {track_id}: {str(e)}")
-
-        try:
-            db.session.commit()
-        except IntegrityError as e:
-            db.session.rollback()
-            print(f"❌ Commit failed for time range {time_range}: {str(e)}")
-
-        # Fetch and update audio features (optional but still useful)
-        fetch_audio_features(track_ids, user.access_token, spotify_api)
+        run = pool.map if pool else map
+        items_by_range = {
+            time_range: items
+            for time_range, items in zip(time_ranges, run(
+                lambda time_range: _fetch_top_tracks(spotify_api, access_token, time_range), time_ranges
+            ))
+            if items is not None
+        }
+
+        # Skip ranges whose track ID list is unchanged since the last complete ingest
+        state = get_ingest_state(user.id, create=True)
+        stored_hashes = load_json(state.range_hashes)
+        range_hashes = {
+            time_range: content_hash([item['id'] for item in items])
+            for time_range, items in items_by_range.items()
+        }
+        unchanged = [time_range for time_range in items_by_range if stored_hashes.get(time_range) == range_hashes[time_range]]
+        if unchanged:
+            print(f"[Ingest] Top tracks unchanged for {', '.join(unchanged)}; skipping those ranges")
+        items_by_range = {
+            time_range: items for time_range, items in items_by_range.items() if time_range not in unchanged
+        }
+
+        # Merge the ranges into one set of unique tracks to enrich
+        unique_items = {}
+        for items in items_by_range.values():
+            for item in items:
+                unique_items.setdefault(item['id'], item)
+        appearances = sum(len(items) for items in items_by_range.values())
+        print(f"[Ingest] {len(unique_items)} unique tracks across {len(items_by_range)} time ranges; "
+              f"avoided {appearances - len(unique_items)} duplicate enrichments")
+
+        # Fetch audio features for every unique track once (up to 100 IDs per call);
+        # the same map feeds the mood prompt and the AudioFeatures upsert
+        features_map = spotify_api.get_audio_features(access_token, list(unique_items)) if unique_items else {}
+
+        plan = _plan_enrichment(user, unique_items, features_map)
+        _resolve_artist_genres(plan, unique_items, access_token, spotify_api)
+        _resolve_local_moods(plan)
+        labels = _classify_misses(gpt, plan, pool)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    rows = _store_tracks(user, items_by_range, plan, labels, spotify_api, gpt)
+
+    # Remember the hash of every range whose rows are fully labelled, so an
+    # unchanged range is skipped next time (incomplete ones are retried)
+    incomplete = {
+        row['time_range'] for row in rows
+        if not row['genre'] or not row['mood'] or row['mood'] == "Unavailable"
+    }
+    for time_range in items_by_range:
+        if time_range in incomplete:
+            stored_hashes.pop(time_range, None)
+        else:
+            stored_hashes[time_range] = range_hashes[time_range]
+    state.range_hashes = json.dumps(stored_hashes)
+    state.last_ingested_at = datetime.utcnow()
+    db.session.commit()
 
     # Aggregate mood counts from Track table (not AudioFeatures)
     track_moods = (
@@ -176,64 +177,254 @@ def fetch_and_store_user_data(user_id, spotify_api, gpt):
 
     return mood_counts
 
+
+def _fetch_top_tracks(spotify_api, access_token, time_range):
+    """
+    Network stage: get one range's top tracks.
+    Safe to run off the request thread (no database access).
+
+    Returns:
+        list: Track items with repeated IDs removed, or None if Spotify returned nothing.
+    """
+    tracks_data = spotify_api.get_top_tracks(access_token, time_range)
+    if not tracks_data:
+        return None
+
+    # Drop repeated IDs so one upsert statement never touches the same row twice
+    seen = set()
+    return [item for item in tracks_data['items'] if not (item['id'] in seen or seen.add(item['id']))]
+
+
+def _plan_enrichment(user, unique_items, features_map):
+    """
+    Database stage: work out which unique tracks still need a genre or mood,
+    serving whatever we can from the user's rows (in any time range) and the
+    shared catalog.
+
+    Returns:
+        dict: Everything the classify and store stages need.
+    """
+    track_ids = list(unique_items)
+
+    # Load the user's existing rows for these tracks, across all ranges, with one IN query
+    existing_tracks = {}
+    known_genres, known_moods = {}, {}
+    for track in Track.query.filter(Track.user_id == user.id, Track.id.in_(track_ids)).all():
+        existing_tracks[(track.id, track.time_range)] = track
+        if track.genre:
+            known_genres.setdefault(track.id, track.genre)
+        if track.mood and track.mood != "Unavailable":
+            known_moods.setdefault(track.id, track.mood)
+
+    # Tracks with no genre on any of this user's rows
+    genres_needed = {
+        track_id: (item['name'], item['artists'][0]['name'], item['album']['name'])
+        for track_id, item in unique_items.items()
+        if track_id not in known_genres
+    }
+
+    # Tracks with no usable mood on any of this user's rows
+    moods_needed = {}
+    for track_id, item in unique_items.items():
+        if track_id in known_moods:
+            continue
+        features = features_map.get(track_id, {})
+        moods_needed[track_id] = {
+            "name": item['name'],
+            "artist": item['artists'][0]['name'],
+            "valence": features.get('valence'),
+            "energy": features.get('energy')
+        }
+
+    # Consult the cross-user catalog first; only catalog misses go to GPT
+    catalog = lookup_annotations(set(genres_needed) | set(moods_needed))
+    genre_hits, genre_misses = resolve_from_catalog(genres_needed, catalog, 'genre')
+    mood_hits, mood_misses = resolve_from_catalog(moods_needed, catalog, 'mood')
+    print(f"[Catalog] {len(genre_hits)} genre hits / {len(genre_misses)} misses, "
+          f"{len(mood_hits)} mood hits / {len(mood_misses)} misses")
+
+    known_genres.update(genre_hits)
+    known_moods.update(mood_hits)
+
+    return {
+        'track_ids': track_ids,
+        'features_map': features_map,
+        'existing_tracks': existing_tracks,
+        'known_genres': known_genres,
+        'known_moods': known_moods,
+        'genre_misses': genre_misses,
+        'mood_misses': mood_misses
+    }
+
+
+def _resolve_artist_genres(plan, unique_items, access_token, spotify_api):
+    """
+    Genre stage: label catalog misses from their artists' Spotify genres
+    (bulk-fetched and cached in the artist table), leaving only tracks whose
+    artists Spotify has no genres for in plan['genre_misses'] for GPT.
+    """
+    misses = plan['genre_misses']
+    artist_genres = resolve_track_genres(
+        {track_id: unique_items[track_id] for track_id in misses}, access_token, spotify_api
+    )
+
+    plan['artist_genres'] = artist_genres
+    plan['known_genres'].update(artist_genres)
+    plan['genre_misses'] = {
+        track_id: details for track_id, details in misses.items() if track_id not in artist_genres
+    }
+
+
+def _resolve_local_moods(plan):
+    """
+    Mood stage: label catalog misses from their audio features with the local
+    rule engine, leaving only low-confidence or feature-less tracks in
+    plan['mood_misses'] for GPT.
+    """
+    if not current_app.config.get('MOOD_ENGINE_ENABLED', True):
+        return
+
+    misses = plan['mood_misses']
+    local_moods, escalate = label_confident_moods(
+        {track_id: plan['features_map'].get(track_id) for track_id in misses},
+        current_app.config.get('MOOD_ENGINE_MIN_CONFIDENCE', 0.1),
+        rule_set=current_rule_set()
+    )
+    print(f"[Moods] {len(local_moods)} labelled from audio features, {len(escalate)} escalated to GPT")
+
+    plan['known_moods'].update(local_moods)
+    plan['mood_misses'] = {track_id: misses[track_id] for track_id in escalate}
+
+
+def _classify_misses(gpt, plan, pool=None):
+    """
+    Network stage: classify the catalog misses in batched GPT requests,
+    running the genre and mood batches side by side when a pool is given.
+    Safe to run off the request thread: this stage writes nothing, and on a
+    worker thread the GPT response cache reads gpt_response_cache through an
+    app context of its own (see GPTResponseCache._db_read).
+
+    Returns:
+        tuple: ({track_id: genre}, {track_id: mood}) as returned by GPT.
+    """
+    def classify_genres():
+        return gpt.classify_genres_batch(plan['genre_misses']) if plan['genre_misses'] else {}
+
+    def classify_moods():
+        return gpt.analyze_moods_batch(plan['mood_misses']) if plan['mood_misses'] else {}
+
+    if pool:
+        genres_future = pool.submit(classify_genres)
+        moods_future = pool.submit(classify_moods)
+        return genres_future.result(), moods_future.result()
+
+    return classify_genres(), classify_moods()
+
+
+def _store_tracks(user, items_by_range, plan, labels, spotify_api, gpt):
+    """
+    Database stage: remember new labels in the catalog, fan them out to the
+    per-range Track rows in one upsert and store the audio features.
+    """
+    gpt_genres, gpt_moods = labels
+    print(f"[GPT] Classified {len(gpt_genres)} genres and {len(gpt_moods)} moods in batches")
+    store_annotations(plan.get('artist_genres', {}), {}, 'spotify-artist-genres')
+    store_annotations(gpt_genres, gpt_moods, gpt.model)
+
+    genres = dict(plan['known_genres'], **gpt_genres)
+    moods = dict(plan['known_moods'], **gpt_moods)
+    existing_tracks = plan['existing_tracks']
+
+    # Build every row up front, keeping stored genre/mood values where present
+    now = datetime.utcnow()
+    rows = []
+    for time_range, items in items_by_range.items():
+        for i, item in enumerate(items):
+            track_id = item['id']
+            existing_track = existing_tracks.get((track_id, time_range))
+
+            genre = existing_track.genre if existing_track and existing_track.genre else genres.get(track_id)
+            if existing_track and existing_track.mood and existing_track.mood != "Unavailable":
+                mood = existing_track.mood
+            else:
+                mood = moods.get(track_id)
+
+            rows.append({
+                'id': track_id,
+                'user_id': user.id,
+                'time_range': time_range,
+                'name': item['name'],
+                'artist': item['artists'][0]['name'],
+                'album': item['album']['name'],
+                'album_image_url': item['album']['images'][0]['url'] if item['album']['images'] else None,
+                'popularity': item['popularity'],
+                'rank': i + 1,
+                'genre': genre,
+                'mood': mood,
+                'created_at': now
+            })
+
+    # Insert new tracks and update existing ones in a single upsert statement
+    bulk_upsert(
+        Track, rows,
+        index_elements=['id', 'user_id', 'time_range'],
+        update_columns=['name', 'artist', 'album', 'album_image_url', 'popularity',
+                        'rank', 'genre', 'mood', 'created_at']
+    )
+    db.session.commit()
+    updated = sum(1 for row in rows if (row['id'], row['time_range']) in existing_tracks)
+    print(f"✅ Upserted {len(rows)} tracks ({updated} updated, {len(rows) - updated} added)")
+
+    # Store the audio features fetched above (optional but still useful)
+    fetch_audio_features(plan['track_ids'], user.access_token, spotify_api, features_map=plan['features_map'])
+
+    return rows
+
 # ----------------------------------------------------------
 # Fetch Audio Features Helper Function
 # ----------------------------------------------------------
-def fetch_audio_features(track_ids, access_token, spotify_api):
-    print(f"[DEBUG] Fetching audio features for {len(track_ids)} tracks")
-    # Use the unified SpotifyAPI class
-    features_map = spotify_api.get_audio_features(access_token, track_ids)
+def fetch_audio_features(track_ids, access_token, spotify_api, features_map=None):
+    """
+    Upsert AudioFeatures rows for the given tracks.
+
+    If features_map is provided (e.g. already fetched by the ingest loop),
+    it is used as-is instead of calling Spotify again.
+    """
+    if features_map is None:
+        print(f"[DEBUG] Fetching audio features for {len(track_ids)} tracks")
+        # Use the unified SpotifyAPI class
+        features_map = spotify_api.get_audio_features(access_token, track_ids)
     print(f"[DEBUG] Received features for {len(features_map)} tracks")
 
+    # Skip missing features and the fallback placeholder returned on 403s
+    usable = []
     for track_id in track_ids:
         features = features_map.get(track_id)
-
         if not features:
             continue
-        
-        # Check if it's a fallback feature due to 403
         if features.get("mood") == "Unavailable":
             print(f"⚠️ Skipping track {track_id}: Premium-only feature access.")
             continue
-
-        audio_feature = AudioFeatures.query.filter_by(id=track_id).first()
-
-        if not audio_feature:
-            audio_feature = AudioFeatures(
-                id=track_id,
-                track_id=track_id,
-                danceability=features['danceability'],
-                energy=features['energy'],
-                key=features['key'],
-                loudness=features['loudness'],
-                mode=features['mode'],
-                speechiness=features['speechiness'],
-                acousticness=features['acousticness'],
-                instrumentalness=features['instrumentalness'],
-                liveness=features['liveness'],
-                valence=features['valence'],
-                tempo=features['tempo'],
-                duration_ms=features['duration_ms'],
-                time_signature=features['time_signature'],
-                mood=SpotifyAPI.analyze_mood_from_features(features)
-            )
-            db.session.add(audio_feature)
-        else:
-            audio_feature.danceability = features['danceability']
-            audio_feature.energy = features['energy']
-            audio_feature.key = features['key']
-            audio_feature.loudness = features['loudness']
-            audio_feature.mode = features['mode']
-            audio_feature.speechiness = features['speechiness']
-            audio_feature.acousticness = features['acousticness']
-            audio_feature.instrumentalness = features['instrumentalness']
-            audio_feature.liveness = features['liveness']
-            audio_feature.valence = features['valence']
-            audio_feature.tempo = features['tempo']
-            audio_feature.duration_ms = features['duration_ms']
-            audio_feature.time_signature = features['time_signature']
-            audio_feature.mood = SpotifyAPI.analyze_mood_from_features(features)
-
+        usable.append((track_id, features))
+
+    if not usable:
+        return
+
+    # Score every track's mood in one vectorised pass with the configured rules
+    rule_set = current_rule_set()
+    matrix, _ = features_to_matrix([features for _, features in usable])
+    moods = rule_set.classify(matrix)
+
+    columns = ['danceability', 'energy', 'key', 'loudness', 'mode', 'speechiness', 'acousticness',
+               'instrumentalness', 'liveness', 'valence', 'tempo', 'duration_ms', 'time_signature']
+    rows = [
+        dict({column: features[column] for column in columns},
+             id=track_id, track_id=track_id, mood=str(mood), mood_rules_version=rule_set.version)
+        for (track_id, features), mood in zip(usable, moods)
+    ]
+
+    # Insert new rows and update existing ones in a single upsert statement
+    bulk_upsert(AudioFeatures, rows, index_elements=['id'], update_columns=columns + ['mood', 'mood_rules_version'])
     db.session.commit()
     
 def enrich_recommended_tracks_with_album_art(gpt_recs_by_mood, access_token, spotify_api):
@@ -249,12 +440,16 @@ def enrich_recommended_tracks_with_album_art(gpt_recs_by_mood, access_token, spo
     Returns:
         dict: Same structure but with album image included.
     """
-    enriched = {}
+    # Resolve every recommendation at once: cached songs skip Spotify entirely,
+    # the rest are searched concurrently instead of one round-trip per track
+    queries = [(track['name'], track['artist']) for tracks in gpt_recs_by_mood.values() for track in tracks]
+    results = iter(search_tracks_cached(queries, access_token, spotify_api))
 
+    enriched = {}
     for mood, tracks in gpt_recs_by_mood.items():
         enriched[mood] = []
-        for track in tracks:
-            result = spotify_api.search_track(track['name'], track['artist'], access_token)
+        for _ in tracks:
+            result = next(results)
             if result:
                 enriched[mood].append({
                     "name": result["name"],
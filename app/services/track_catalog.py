@@ -0,0 +1,98 @@
+# app/services/track_catalog.py
+
+from collections import Counter
+from datetime import datetime
+
+from app.models import TrackAnnotation
+from app.services.db_utils import bulk_upsert
+
+# Process-wide hit/miss counters, e.g. {'genre_hits': 120, 'genre_misses': 4, ...}
+catalog_stats = Counter()
+
+
+# ----------------------------------------------------------
+# Cross-user track annotation catalog
+# ----------------------------------------------------------
+def lookup_annotations(track_ids):
+    """
+    Load stored annotations for the given Spotify track IDs with one IN query.
+
+    Returns:
+        dict: {track_id: TrackAnnotation} for every ID found in the catalog.
+    """
+    track_ids = list(track_ids)
+    if not track_ids:
+        return {}
+
+    return {
+        annotation.id: annotation
+        for annotation in TrackAnnotation.query.filter(TrackAnnotation.id.in_(track_ids)).all()
+    }
+
+
+def resolve_from_catalog(needed, catalog, field):
+    """
+    Split the tracks needing a label into catalog hits and misses.
+
+    Args:
+        needed (dict): {track_id: prompt details} of tracks missing the label.
+        catalog (dict): Result of lookup_annotations().
+        field (str): 'genre' or 'mood'.
+
+    Returns:
+        tuple: ({track_id: label} for hits, {track_id: prompt details} for misses)
+    """
+    hits, misses = {}, {}
+    for track_id, details in needed.items():
+        label = getattr(catalog.get(track_id), field, None)
+        if label:
+            hits[track_id] = label
+        else:
+            misses[track_id] = details
+
+    catalog_stats[f'{field}_hits'] += len(hits)
+    catalog_stats[f'{field}_misses'] += len(misses)
+    return hits, misses
+
+
+def store_annotations(genres, moods, model):
+    """
+    Upsert freshly classified labels into the catalog, keeping any label
+    already stored for a field that was not re-classified.
+
+    Args:
+        genres (dict): {track_id: genre} returned by GPT.
+        moods (dict): {track_id: mood} returned by GPT.
+        model (str): OpenAI model name that produced the labels.
+    """
+    track_ids = {tid for tid, genre in genres.items() if genre} | {tid for tid, mood in moods.items() if mood}
+    if not track_ids:
+        return 0
+
+    existing = lookup_annotations(track_ids)
+    now = datetime.utcnow()
+    rows = []
+    for track_id in track_ids:
+        stored = existing.get(track_id)
+        rows.append({
+            'id': track_id,
+            'genre': genres.get(track_id) or (stored.genre if stored else None),
+            'mood': moods.get(track_id) or (stored.mood if stored else None),
+            'model': model,
+            'updated_at': now
+        })
+
+    return bulk_upsert(
+        TrackAnnotation, rows,
+        index_elements=['id'],
+        update_columns=['genre', 'mood', 'model', 'updated_at']
+    )
+
+
+def get_catalog_stats():
+    """
+    Return the cumulative hit/miss counters and hit rate for this process.
+    """
+    hits = catalog_stats['genre_hits'] + catalog_stats['mood_hits']
+    lookups = hits + catalog_stats['genre_misses'] + catalog_stats['mood_misses']
+    return dict(catalog_stats, hit_rate=round(hits / lookups, 3) if lookups else 0.0)
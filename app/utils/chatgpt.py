@@ -4,7 +4,39 @@
 
 import openai
 import os
-import requests
+import json
+import re
+import threading
+
+from collections import Counter
+
+from app.services.gpt_cache import GPTResponseCache
+from app.utils.gpt_batcher import MicroBatcher
+from app.utils.http import PooledHTTPClient, client_from_config
+from app.utils.prompt_compaction import compact_tracks
+
+# Mood labels every GPT mood prompt is restricted to
+MOOD_LABELS = ("Happy", "Sad", "Angry", "Chill", "Focused")
+
+# Fields of the combined per-user insights document (see ChatGPT.infer_user_insights)
+INSIGHT_FIELDS = ("mood_summary", "recommendations", "mbti_type", "mbti_summary", "mood_time_ranges")
+
+
+class _CachedResponse:
+    """
+    Stands in for a requests.Response when a chat completion is served from
+    the response cache, so every method parses cached and live replies alike.
+    """
+    ok = True
+    status_code = 200
+
+    def __init__(self, content):
+        self.text = content
+        self._body = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+    def json(self):
+        return self._body
+
 
 # ----------------------------------------------------------
 # ChatGPT – GPT interface class for music mood inference
@@ -17,7 +49,22 @@ class ChatGPT:
         """
         self.api_key = None
         self.api_url = None
+        self.images_url = "https://api.openai.com/v1/images/generations"
         self.model = None
+        self.batch_size = 25
+        self.batch_retries = 2
+        # POSTs are only retried on connection errors (nothing was sent yet); failed
+        # completions are retried explicitly (OPENAI_BATCH_RETRIES), never image generations
+        self.http = PooledHTTPClient(read_timeout=60)
+        self.response_cache = None
+        self.prompt_compaction = True
+        self.prompt_token_budget = 3000
+        self.prompt_aggregate = False
+        self.prompt_top_artists = 10
+        self.prompt_stats = Counter()
+        self.prompt_stats_lock = threading.Lock()  # parallel insight calls update prompt_stats together
+        self.genre_batcher = None
+        self.mood_batcher = None
 
         if app:
             self.init_app(app)
@@ -30,6 +77,37 @@ class ChatGPT:
         self.api_key = app.config.get("OPENAI_API_KEY")
         self.api_url = app.config.get("OPENAI_API_URL")
         self.model = app.config.get("OPENAI_MODEL")
+        self.images_url = app.config.get("OPENAI_IMAGES_URL", self.images_url)
+        self.batch_size = app.config.get("OPENAI_BATCH_SIZE", self.batch_size)
+        self.batch_retries = app.config.get("OPENAI_BATCH_RETRIES", self.batch_retries)
+
+        # Keep-alive connection pool shared by every request in this process
+        self.http = client_from_config(app.config, "OPENAI", read_timeout=60)
+
+        # Compact track tables instead of raw dict reprs in the insight prompts
+        self.prompt_compaction = app.config.get("GPT_PROMPT_COMPACTION", self.prompt_compaction)
+        self.prompt_token_budget = app.config.get("GPT_PROMPT_TOKEN_BUDGET", self.prompt_token_budget)
+        self.prompt_aggregate = app.config.get("GPT_PROMPT_AGGREGATE", self.prompt_aggregate)
+        self.prompt_top_artists = app.config.get("GPT_PROMPT_TOP_ARTISTS", self.prompt_top_artists)
+
+        # Coalesce classification batches from concurrent ingests into shared requests
+        if app.config.get("GPT_MICROBATCH_ENABLED", False):
+            options = dict(
+                window_ms=app.config.get("GPT_MICROBATCH_WINDOW_MS", 50),
+                max_batch=app.config.get("GPT_MICROBATCH_MAX_BATCH", self.batch_size),
+                max_inflight=app.config.get("GPT_MICROBATCH_MAX_INFLIGHT", 4),
+            )
+            # A batched call may time out on every attempt and then retry each
+            # malformed entry on its own (one request per track)
+            max_requests = self.batch_retries + 1 + options['max_batch']
+            options['batch_timeout'] = sum(self.http.timeout) * max_requests
+            self.genre_batcher = MicroBatcher(
+                lambda items: self._classify_genre_chunks(items, len(items)), name="genres", **options)
+            self.mood_batcher = MicroBatcher(
+                lambda items: self._analyze_mood_chunks(items, len(items)), name="moods", **options)
+
+        # Content-addressed cache of chat replies (memory LRU + gpt_response_cache table)
+        self.response_cache = GPTResponseCache(app)
 
         # Validate configuration presence
         if not all([self.api_key, self.api_url, self.model]):
@@ -74,7 +152,7 @@ class ChatGPT:
         }
         try:
             # Send request to OpenAI API
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "analyze_mood")
             if response.ok:
                 result = response.json()
                 return result["choices"][0]["message"]["content"].strip()
@@ -93,6 +171,7 @@ class ChatGPT:
         Returns a ChatGPT-generated mood and personality summary based on the user's music taste.
         """
 
+        track_text = self._format_tracks(tracks, "analyze_user_tracks")
         messages = [
             {
                 "role": "system",
@@ -106,7 +185,7 @@ class ChatGPT:
             },
             {
                 "role": "user",
-                "content": f"Here is the user's listening data:\n{tracks}"
+                "content": f"Here is the user's listening data:\n{track_text}"
             }
         ]
 
@@ -122,7 +201,7 @@ class ChatGPT:
         }
         # Send request to OpenAI API
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "analyze_user_tracks")
             if response.ok:
                 result = response.json()
                 return result["choices"][0]["message"]["content"].strip()
@@ -133,7 +212,7 @@ class ChatGPT:
         if not response.ok:
             print(f"[ERROR] OpenAI API request failed: {response.status_code}, {response.text}")
             raise RuntimeError(f"OpenAI API error {response.status_code}: {response.text}")
-        response = requests.post(self.api_url, headers=headers, json=data)
+        response = self._post_chat(data, headers, "analyze_user_tracks")
 
     
     def classify_genre(self, track_name, artist, album):
@@ -165,7 +244,7 @@ class ChatGPT:
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "classify_genre")
             if response.ok:
                 return response.json()["choices"][0]["message"]["content"].strip()
             else:
@@ -174,6 +253,393 @@ class ChatGPT:
             print(f"[ERROR] Genre fetch failed: {e}")
             return None
         
+    def classify_genres_batch(self, tracks, chunk_size=None):
+        """
+        Classify the genre of many tracks with one structured-JSON prompt per chunk.
+
+        When GPT_MICROBATCH_ENABLED is set (and no chunk_size is forced), the
+        tracks are queued on the process-wide genre batcher instead, so tracks
+        from concurrent ingests share requests.
+
+        Args:
+            tracks (dict): Mapping of track ID to a (track_name, artist, album) tuple.
+            chunk_size (int): Tracks per request (defaults to OPENAI_BATCH_SIZE).
+
+        Returns:
+            dict: Mapping of track ID to genre name (None if classification failed).
+        """
+        if self.genre_batcher and not chunk_size:
+            return self.genre_batcher.map(tracks)
+        return self._classify_genre_chunks(tracks, chunk_size or self.batch_size)
+
+    def _classify_genre_chunks(self, tracks, chunk_size):
+        items = list(tracks.items())
+        genres = {}
+
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i:i + chunk_size]
+            messages = self.genre_batch_messages(chunk)
+
+            result = self._post_chat_json(messages, temperature=0.3, method="classify_genres_batch")
+            if result is None:
+                # The whole request failed; single-track calls would fail the same way
+                print(f"[GPT] Genre batch of {len(chunk)} failed, leaving it unclassified")
+                genres.update((track_id, None) for track_id, _ in chunk)
+                continue
+            if not isinstance(result, dict):
+                result = {}
+
+            for track_id, (track_name, artist, album) in chunk:
+                genre = result.get(track_id)
+                if isinstance(genre, str) and genre.strip():
+                    genres[track_id] = genre.strip()
+                else:
+                    # Malformed or missing entry – fall back to the single-track prompt
+                    print(f"[GPT] Batch genre missing for '{track_name}', retrying individually")
+                    genres[track_id] = self.classify_genre(track_name, artist, album)
+
+        return genres
+
+    def analyze_moods_batch(self, tracks, chunk_size=None):
+        """
+        Label the mood of many tracks with one structured-JSON prompt per chunk.
+
+        Routed through the process-wide mood batcher like classify_genres_batch.
+
+        Args:
+            tracks (dict): Mapping of track ID to a dict of track details
+                (e.g. name, artist, valence, energy).
+            chunk_size (int): Tracks per request (defaults to OPENAI_BATCH_SIZE).
+
+        Returns:
+            dict: Mapping of track ID to one of MOOD_LABELS (None if no valid label was returned).
+        """
+        if self.mood_batcher and not chunk_size:
+            return self.mood_batcher.map(tracks)
+        return self._analyze_mood_chunks(tracks, chunk_size or self.batch_size)
+
+    def _analyze_mood_chunks(self, tracks, chunk_size):
+        items = list(tracks.items())
+        moods = {}
+
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i:i + chunk_size]
+            messages = self.mood_batch_messages(chunk)
+
+            result = self._post_chat_json(messages, temperature=0.3, method="analyze_moods_batch")
+            if result is None:
+                # The whole request failed; single-track calls would fail the same way
+                print(f"[GPT] Mood batch of {len(chunk)} failed, leaving it unlabelled")
+                moods.update((track_id, None) for track_id, _ in chunk)
+                continue
+            if not isinstance(result, dict):
+                result = {}
+
+            for track_id, details in chunk:
+                mood = self._normalize_mood(result.get(track_id))
+                if not mood:
+                    # Malformed or off-list label – fall back to the single-track prompt
+                    print(f"[GPT] Batch mood invalid for '{details.get('name')}', retrying individually")
+                    try:
+                        mood = self._normalize_mood(self.analyze_mood(details))
+                    except Exception as e:
+                        print(f"[ERROR] Mood fallback failed: {e}")
+                moods[track_id] = mood
+
+        return moods
+
+    @staticmethod
+    def genre_batch_messages(chunk):
+        """
+        Build the structured-JSON genre prompt for a list of
+        (track_id, (track_name, artist, album)) pairs.
+        """
+        payload = [
+            {"id": track_id, "track": track_name, "artist": artist, "album": album}
+            for track_id, (track_name, artist, album) in chunk
+        ]
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are a music genre classifier. "
+                    "You will receive a JSON list of songs, each with an id, track, artist and album. "
+                    "Reply with only a JSON object mapping every id to one genre name, no extra explanation."
+                )
+            },
+            {
+                "role": "user",
+                "content": json.dumps(payload, ensure_ascii=False)
+            }
+        ]
+
+    @staticmethod
+    def mood_batch_messages(chunk):
+        """
+        Build the structured-JSON mood prompt for a list of (track_id, details) pairs.
+        """
+        payload = [dict(details, id=track_id) for track_id, details in chunk]
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "You are a music mood analysis assistant. "
+                    "You will receive a JSON list of tracks with their features. "
+                    "Infer the mood of each track and reply with only a JSON object mapping every id "
+                    "to one mood label: Happy, Sad, Angry, Chill, or Focused."
+                )
+            },
+            {
+                "role": "user",
+                "content": json.dumps(payload, ensure_ascii=False)
+            }
+        ]
+
+    @staticmethod
+    def _normalize_mood(label):
+        """
+        Map a GPT mood reply onto MOOD_LABELS, ignoring case and punctuation.
+        Returns None for anything outside the fixed set.
+        """
+        if not isinstance(label, str):
+            return None
+        cleaned = label.strip().strip(".!\"'").capitalize()
+        return cleaned if cleaned in MOOD_LABELS else None
+
+    def _post_chat_json(self, messages, temperature, method=None):
+        """
+        Send a chat completion that is expected to return a JSON document,
+        retrying up to OPENAI_BATCH_RETRIES times on HTTP or parse errors.
+        A cached reply that fails to parse is dropped from the response cache.
+
+        Returns:
+            The parsed JSON value, or None if every attempt failed.
+        """
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature
+        }
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+        for attempt in range(1, self.batch_retries + 2):
+            try:
+                response = self._post_chat(data, headers, method)
+                if not response.ok:
+                    raise RuntimeError(f"OpenAI API error {response.status_code}: {response.text}")
+                raw = response.json()["choices"][0]["message"]["content"]
+                try:
+                    return self._parse_json_content(raw)
+                except ValueError:
+                    self._forget_cached(data, method)
+                    raise
+            except Exception as e:
+                print(f"[ERROR] OpenAI batch request failed (attempt {attempt}): {e}")
+
+        return None
+
+    def _format_tracks(self, tracks, method):
+        """
+        Render a listening history for a prompt: a deduplicated, token-budgeted
+        table (see app.utils.prompt_compaction) when GPT_PROMPT_COMPACTION is on,
+        otherwise the raw list as before. Logs the tokens saved per call.
+        """
+        if not self.prompt_compaction or not isinstance(tracks, list) \
+                or not all(isinstance(track, dict) for track in tracks):
+            return f"{tracks}"
+
+        text, report = compact_tracks(
+            tracks,
+            token_budget=self.prompt_token_budget,
+            aggregate=self.prompt_aggregate,
+            top_artists=self.prompt_top_artists
+        )
+        with self.prompt_stats_lock:
+            self.prompt_stats.update(
+                calls=1,
+                raw_tokens=report['raw_tokens'],
+                compact_tokens=report['compact_tokens'],
+                saved_tokens=report['saved_tokens']
+            )
+        print(f"[GPT] {method} prompt: ~{report['raw_tokens']} -> ~{report['compact_tokens']} tokens "
+              f"(saved ~{report['saved_tokens']}; {report['unique_tracks']} unique of {report['tracks']} tracks"
+              + (f", {report['rows_dropped']} over budget" if report['rows_dropped'] else "") + ")")
+        return text
+
+    def get_prompt_stats(self):
+        """
+        Snapshot of the prompt compaction counters (calls and raw, compact and saved tokens).
+        """
+        with self.prompt_stats_lock:
+            return dict(self.prompt_stats)
+
+    def _post_chat(self, data, headers, method):
+        """
+        POST a chat completion request, answering it from the response cache
+        when the method is cached (GPT_CACHE_METHODS) and an identical request
+        was seen within its TTL. Successful live replies are stored.
+
+        Returns:
+            requests.Response or _CachedResponse
+        """
+        cache = self.response_cache
+        if not cache or not cache.enabled_for(method):
+            return self.http.post(self.api_url, headers=headers, json=data)
+
+        key = cache.make_key(method, data["model"], data["messages"], data["temperature"])
+        content = cache.get(key, method)
+        if content is not None:
+            return _CachedResponse(content)
+
+        response = self.http.post(self.api_url, headers=headers, json=data)
+        if response.ok:
+            try:
+                cache.set(key, method, data["model"], response.json()["choices"][0]["message"]["content"])
+            except (ValueError, KeyError, IndexError, TypeError):
+                pass
+        return response
+
+    def _forget_cached(self, data, method):
+        cache = self.response_cache
+        if cache and cache.enabled_for(method):
+            cache.forget(cache.make_key(method, data["model"], data["messages"], data["temperature"]))
+
+    @staticmethod
+    def _parse_json_content(raw):
+        """
+        Parse a JSON reply from ChatGPT, tolerating Markdown code fences around it.
+        """
+        raw = raw.strip()
+        if raw.startswith("```"):
+            raw = raw.strip("`")
+            if raw.lower().startswith("json"):
+                raw = raw[4:]
+        return json.loads(raw)
+
+    def infer_user_insights(self, tracks):
+        """
+        Derive every per-user text insight from one chat completion, sending the
+        track list once instead of once per insight.
+
+        The reply is validated field by field; any field that is missing or
+        malformed is filled in by its dedicated single-purpose method
+        (analyze_user_tracks, recommend_tracks_by_mood, infer_mbti_type,
+        infer_mbti_summary, infer_mood_time_ranges), so callers always get
+        the same values those methods would produce on their own.
+
+        Parameters:
+            tracks (list): A list of track dictionaries with name, artist, album, genre, and mood.
+
+        Returns:
+            dict: {
+                "mood_summary": str,
+                "recommendations": {mood: [{"name": ..., "artist": ...}, ...]},
+                "mbti_type": str,
+                "mbti_summary": str,
+                "mood_time_ranges": {mood: time window}
+            }
+        """
+        track_text = self._format_tracks(tracks, "infer_user_insights")
+        messages = [
+            {
+                "role": "system",
+                "content": (
+                    "You are a music psychologist and recommendation assistant. "
+                    "Given a list of songs with name, artist, album, genre, and mood, reply with only one JSON object "
+                    "with exactly these keys:\n"
+                    '- "mood_summary": an expressive, insightful summary of the overall mood and personality of the user. '
+                    "Do not list individual tracks. Focus on patterns and emotional themes.\n"
+                    '- "recommendations": an object mapping each mood present in the data (from Happy, Sad, Angry, Chill, Focused) '
+                    'to a list of 3 recommended songs, each with "name" and "artist". Do NOT include songs from the user\'s history.\n'
+                    '- "mbti_type": the user\'s four-letter MBTI personality type, e.g. "INFP".\n'
+                    '- "mbti_summary": the user\'s musical personality in a maximum of 5 words, without punctuation.\n'
+                    '- "mood_time_ranges": an object mapping each mood to the time of day it is most commonly felt, '
+                    'e.g. {"Chill": "Night (8pm–11pm)", "Happy": "Morning (9am–12pm)"}.'
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Here is the user's listening data:\n{track_text}"
+            }
+        ]
+
+        result = self._post_chat_json(messages, temperature=0.7, method="infer_user_insights")
+        insights = self._validate_insights(result if isinstance(result, dict) else {})
+
+        fallbacks = {
+            "mood_summary": self.analyze_user_tracks,
+            "recommendations": self.recommend_tracks_by_mood,
+            "mbti_type": self.infer_mbti_type,
+            "mbti_summary": self.infer_mbti_summary,
+            "mood_time_ranges": self.infer_mood_time_ranges,
+        }
+        missing = [field for field in INSIGHT_FIELDS if field not in insights]
+        if missing:
+            print(f"[GPT] Combined insights missing or invalid: {', '.join(missing)}; asking individually")
+        for field in missing:
+            try:
+                insights[field] = fallbacks[field](tracks)
+            except Exception as e:
+                print(f"[GPT ERROR] {field} fallback failed: {e}")
+                insights[field] = None
+
+        return insights
+
+    @classmethod
+    def _validate_insights(cls, result):
+        """
+        Keep only the fields of a combined insights reply that match the schema
+        documented in infer_user_insights, normalising them where possible.
+        """
+        valid = {}
+
+        summary = result.get("mood_summary")
+        if isinstance(summary, str) and summary.strip():
+            valid["mood_summary"] = summary.strip()
+
+        recommendations = result.get("recommendations")
+        if isinstance(recommendations, dict):
+            cleaned = {}
+            for mood, songs in recommendations.items():
+                mood = cls._normalize_mood(mood)
+                if not mood or not isinstance(songs, list):
+                    continue
+                songs = [
+                    {"name": song["name"].strip(), "artist": song["artist"].strip()}
+                    for song in songs
+                    if isinstance(song, dict)
+                    and isinstance(song.get("name"), str) and song["name"].strip()
+                    and isinstance(song.get("artist"), str) and song["artist"].strip()
+                ]
+                if songs:
+                    cleaned[mood] = songs
+            if cleaned:
+                valid["recommendations"] = cleaned
+
+        mbti = result.get("mbti_type")
+        if isinstance(mbti, str) and re.fullmatch(r"[EI][NS][TF][JP]", mbti.strip().upper()):
+            valid["mbti_type"] = mbti.strip().upper()
+
+        mbti_summary = result.get("mbti_summary")
+        if isinstance(mbti_summary, str) and 0 < len(mbti_summary.split()) <= 5:
+            valid["mbti_summary"] = mbti_summary.strip()
+
+        time_ranges = result.get("mood_time_ranges")
+        if isinstance(time_ranges, dict):
+            cleaned = {
+                mood: window.strip()
+                for mood, window in time_ranges.items()
+                if isinstance(mood, str) and isinstance(window, str) and window.strip()
+            }
+            if cleaned:
+                valid["mood_time_ranges"] = cleaned
+
+        return valid
+
     def recommend_tracks_by_mood(self, tracks):
         """
         Accepts a list of tracks with name, artist, genre, and mood.
@@ -183,6 +649,7 @@ class ChatGPT:
             dict: { "Happy": [{"name": ..., "artist": ...}, ...], ... }
         """
 
+        track_text = self._format_tracks(tracks, "recommend_tracks_by_mood")
         messages = [
             {
                 "role": "system",
@@ -198,7 +665,7 @@ class ChatGPT:
             },
             {
                 "role": "user",
-                "content": f"Here are the user's recent songs:\n{tracks}\n\nPlease recommend songs accordingly."
+                "content": f"Here are the user's recent songs:\n{track_text}\n\nPlease recommend songs accordingly."
             }
         ]
 
@@ -214,7 +681,7 @@ class ChatGPT:
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "recommend_tracks_by_mood")
             if response.ok:
                 raw = response.json()["choices"][0]["message"]["content"]
                 import json
@@ -245,6 +712,7 @@ class ChatGPT:
         Returns:
             str: The inferred MBTI type (e.g., "INFP", "ENTJ", etc.). Falls back to "INTJ" on failure.
         """
+        track_text = self._format_tracks(tracks, "infer_mbti_type")
         messages = [
             {
                 "role": "system",
@@ -255,7 +723,7 @@ class ChatGPT:
             },
             {
                 "role": "user",
-                "content": f"Here is the user's listening data:\n{tracks}\n\nWhat is their MBTI type?"
+                "content": f"Here is the user's listening data:\n{track_text}\n\nWhat is their MBTI type?"
             }
         ]
 
@@ -271,7 +739,7 @@ class ChatGPT:
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "infer_mbti_type")
             if response.ok:
                 result = response.json()["choices"][0]["message"]["content"].strip()
                 return result if result else "INTJ"
@@ -292,6 +760,8 @@ class ChatGPT:
         Returns:
             str: A single short summary string (e.g., "Calm and introspective listener")
         """
+        track_text = self._format_tracks(tracks, "infer_mbti_summary")
+
         # Define prompt with strict length requirement
         messages = [
             {
@@ -305,7 +775,7 @@ class ChatGPT:
             {
                 "role": "user",
                 "content": (
-                    f"Here is the user's music data:\n{tracks}\n\n"
+                    f"Here is the user's music data:\n{track_text}\n\n"
                     "Please give a 5-word (or fewer) summary of their music personality."
                 )
             }
@@ -324,7 +794,7 @@ class ChatGPT:
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "infer_mbti_summary")
             if response.ok:
                 return response.json()["choices"][0]["message"]["content"].strip()
             raise RuntimeError(f"GPT MBTI summary failed: {response.status_code}, {response.text}")
@@ -359,8 +829,8 @@ class ChatGPT:
 
         # Call DALL·E 3 image generation endpoint
         try:
-            response = requests.post(
-                "https://api.openai.com/v1/images/generations",
+            response = self.http.post(
+                self.images_url,
                 headers=headers,
                 json={
                     "model": "dall-e-3",
@@ -386,6 +856,7 @@ class ChatGPT:
         Given a list of track metadata, return a mapping from mood to time of day
         (e.g., "Morning (6am–9am)", "Afternoon (12pm–4pm)", etc.).
         """
+        track_text = self._format_tracks(tracks, "infer_mood_time_ranges")
         messages = [
             {
                 "role": "system",
@@ -398,7 +869,7 @@ class ChatGPT:
             },
             {
                 "role": "user",
-                "content": f"Here is the user's track data:\n{tracks}"
+                "content": f"Here is the user's track data:\n{track_text}"
             }
         ]
 
@@ -414,7 +885,7 @@ class ChatGPT:
         }
 
         try:
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = self._post_chat(data, headers, "infer_mood_time_ranges")
             if response.ok:
                 import json
                 return json.loads(response.json()["choices"][0]["message"]["content"])
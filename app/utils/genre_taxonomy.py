@@ -0,0 +1,86 @@
+"""
+Local taxonomy mapping Spotify's artist micro-genres (e.g. "melodic drill",
+"chamber pop", "uk garage") onto the display genres shown in the genre chart.
+"""
+
+import re
+
+# Ordered most specific first: the first rule with a keyword starting a word of
+# the micro-genre wins, so "k-pop" is matched before "pop" and "neo soul" before "soul".
+GENRE_RULES = (
+    ("K-Pop", ("k-pop", "korean pop", "k-rap", "korean r&b")),
+    ("J-Pop", ("j-pop", "j-rock", "anime", "japanese", "city pop", "vocaloid")),
+    ("Latin", ("latin", "reggaeton", "urbano", "bachata", "salsa", "cumbia", "corrido", "banda",
+               "mariachi", "sertanejo", "mpb", "bossa nova", "samba", "flamenco", "tango", "dembow")),
+    ("Afrobeats", ("afrobeat", "afropop", "afro", "amapiano", "highlife", "naija", "azonto")),
+    ("Metal", ("metal", "metalcore", "deathcore", "djent", "grindcore", "thrash")),
+    ("Punk", ("punk", "emo", "hardcore", "screamo", "post-hardcore")),
+    ("Hip Hop", ("hip hop", "rap", "trap", "drill", "grime", "boom bap", "phonk", "crunk", "g funk")),
+    ("R&B", ("r&b", "rnb", "neo soul", "new jack swing", "quiet storm")),
+    ("Soul", ("soul", "motown", "funk", "disco", "gospel")),
+    ("Electronic", ("edm", "house", "techno", "trance", "dubstep", "drum and bass", "dnb", "electro",
+                    "electronica", "uk garage", "bass music", "big room", "hardstyle", "synthwave",
+                    "downtempo", "idm", "breakbeat", "jungle", "future bass", "chillwave", "lo-fi",
+                    "lofi", "ambient")),
+    ("Reggae", ("reggae", "dancehall", "ska", "dub")),
+    ("Jazz", ("jazz", "bebop", "swing", "big band")),
+    ("Blues", ("blues",)),
+    ("Classical", ("classical", "orchestra", "baroque", "opera", "romantic era", "chamber music",
+                   "compositional", "early music", "minimalism", "string quartet")),
+    ("Soundtrack", ("soundtrack", "score", "broadway", "show tunes", "video game music", "musical")),
+    ("Country", ("country", "americana", "bluegrass", "honky tonk", "outlaw", "red dirt")),
+    ("Folk", ("folk", "singer-songwriter", "acoustic", "celtic", "traditional")),
+    ("Indie", ("indie", "bedroom", "dream pop", "shoegaze", "chamber pop", "art pop")),
+    ("Alternative", ("alternative", "alt ", "grunge", "new wave", "britpop")),
+    ("Rock", ("rock", "psychedelic", "garage rock", "stoner", "surf")),
+    ("Pop", ("pop", "boy band", "girl group", "teen", "adult standards", "europop")),
+)
+
+# One regex per rule; keywords only match at the start of a word, so "rap"
+# matches "uk rap" but not "trap", and "ska" does not match "alaska indie"
+_RULE_PATTERNS = tuple(
+    (display_genre, re.compile(r'(?<![a-z0-9])(?:' + '|'.join(map(re.escape, keywords)) + ')'))
+    for display_genre, keywords in GENRE_RULES
+)
+
+
+def map_micro_genre(micro_genre):
+    """
+    Map one Spotify micro-genre to a display genre.
+
+    Returns:
+        str: Display genre, or None if no rule matches.
+    """
+    text = micro_genre.lower()
+    for display_genre, pattern in _RULE_PATTERNS:
+        if pattern.search(text):
+            return display_genre
+    return None
+
+
+def map_genres(micro_genres):
+    """
+    Pick one display genre for an artist (or a track's credited artists) from
+    their Spotify micro-genres.
+
+    Each micro-genre votes for its display genre; Spotify lists the most
+    representative genres first, so earlier entries weigh more. Ties go to the
+    more specific rule (earlier in GENRE_RULES).
+
+    Args:
+        micro_genres (list): Spotify genre strings, most representative first.
+
+    Returns:
+        str: Display genre, or None if none of the genres could be mapped.
+    """
+    scores = {}
+    for position, micro_genre in enumerate(micro_genres):
+        display_genre = map_micro_genre(micro_genre)
+        if display_genre:
+            scores[display_genre] = scores.get(display_genre, 0) + 1 / (1 + position)
+
+    if not scores:
+        return None
+
+    rule_order = {display_genre: i for i, (display_genre, _) in enumerate(GENRE_RULES)}
+    return max(scores, key=lambda genre: (scores[genre], -rule_order[genre]))
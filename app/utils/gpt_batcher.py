@@ -0,0 +1,177 @@
+"""
+Process-level micro-batching of classification requests.
+
+Concurrent ingests each ask GPT to classify a handful of tracks. A
+MicroBatcher queues those requests for a short window (or until max_batch
+items are waiting), sends them as one batched call, and hands every caller
+its own results through futures, so the number of OpenAI requests grows
+with time rather than with the number of users logging in at once.
+"""
+
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class MicroBatcher:
+    """
+    Coalesces {key: item} requests from many threads into batched calls of
+    batch_fn({key: item, ...}) -> {key: result}. Requests for a key that is
+    already queued share the queued future.
+    """
+
+    def __init__(self, batch_fn, window_ms=50, max_batch=25, max_inflight=4, name='batch', batch_timeout=300):
+        """
+        Args:
+            batch_fn (callable): Classifies a dict of items, returning {key: result}.
+            window_ms (float): How long the first queued item waits for company.
+            max_batch (int): Items per batched call; a full batch is sent at once.
+            max_inflight (int): Batched calls allowed to run at the same time.
+            name (str): Label used in thread names and log lines.
+            batch_timeout (float): Longest one batched call is expected to take; map()
+                waits that long for each round of calls queued ahead of its own.
+        """
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.max_inflight = max_inflight
+        self.name = name
+        self.batch_timeout = batch_timeout
+
+        self.stats = Counter()
+        self.batch_sizes = Counter()  # {batch size: number of batched calls}
+
+        self._queue = OrderedDict()  # key -> (item, future), oldest first
+        self._first_at = None
+        self._inflight = 0  # batched calls handed to the pool and not finished yet
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+
+    def submit(self, items):
+        """
+        Queue items for the next batch.
+
+        Returns:
+            dict: {key: Future} resolving to each item's result.
+        """
+        futures = {}
+        with self._cond:
+            self._ensure_started()
+            for key, item in items.items():
+                if key in self._queue:
+                    futures[key] = self._queue[key][1]
+                    self.stats['coalesced'] += 1
+                    continue
+                future = Future()
+                self._queue[key] = (item, future)
+                futures[key] = future
+            if self._queue and self._first_at is None:
+                self._first_at = time.monotonic()
+            self.stats['submitted'] += len(items)
+            self._cond.notify()
+        return futures
+
+    def map(self, items, timeout=None):
+        """
+        Submit items and wait for their results.
+
+        Args:
+            items (dict): {key: item} to classify.
+            timeout (float): Seconds to wait (defaults to expected_wait()).
+
+        Returns:
+            dict: {key: result}; raises whatever batch_fn raised for the batch.
+                  Keys whose batch has not finished in time map to None (the
+                  batch keeps running and still resolves the shared future).
+        """
+        if timeout is None:
+            timeout = self.expected_wait(len(items))
+        futures = self.submit(items)
+        deadline = time.monotonic() + timeout
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                results[key] = None
+        timed_out = sum(1 for future in futures.values() if not future.done())
+        if timed_out:
+            print(f"[GPT Batcher] {self.name}: {timed_out} of {len(futures)} items not ready after {timeout:.0f}s")
+            with self._cond:
+                self.stats['timed_out'] += timed_out
+        return results
+
+    def expected_wait(self, new_items=0):
+        """
+        Worst-case seconds until new_items submitted now are classified: the
+        window plus one batch_timeout per round of max_inflight calls made up
+        of the batches already running, those queued and the new items' own.
+        """
+        with self._cond:
+            batches = self._inflight + math.ceil((len(self._queue) + new_items) / self.max_batch)
+        rounds = max(1, math.ceil(batches / max(1, self.max_inflight)))
+        return self.window + rounds * self.batch_timeout
+
+    def get_stats(self):
+        """
+        Counters plus the batch-size histogram.
+        """
+        with self._cond:
+            stats, batch_sizes, queued = dict(self.stats), dict(self.batch_sizes), len(self._queue)
+        batches = stats.get('batches', 0)
+        return dict(
+            stats,
+            queued=queued,
+            mean_batch_size=round(stats.get('items', 0) / batches, 2) if batches else 0.0,
+            batch_sizes={str(size): count for size, count in sorted(batch_sizes.items())}
+        )
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix=f'{self.name}-batch')
+            self._thread = threading.Thread(target=self._collect, name=f'{self.name}-batcher', daemon=True)
+            self._thread.start()
+
+    def _collect(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+
+                # Wait out the window unless a full batch is already queued
+                deadline = self._first_at + self.window
+                while len(self._queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = [self._queue.popitem(last=False) for _ in range(min(self.max_batch, len(self._queue)))]
+                self._first_at = time.monotonic() if self._queue else None
+                self._inflight += 1
+
+            self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        # Counters are shared with submit() and the other pool threads
+        with self._cond:
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+            self.batch_sizes[len(batch)] += 1
+        try:
+            results = self.batch_fn({key: item for key, (item, _) in batch})
+        except Exception as e:
+            print(f"[GPT Batcher ERROR] {self.name} batch of {len(batch)} failed: {e}")
+            with self._cond:
+                self.stats['failed_batches'] += 1
+                self._inflight -= 1
+            for _, (_, future) in batch:
+                future.set_exception(e)
+            return
+        with self._cond:
+            self._inflight -= 1
+        for key, (_, future) in batch:
+            future.set_result(results.get(key))
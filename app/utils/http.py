@@ -0,0 +1,104 @@
+"""
+Shared, pooled HTTP client used by the Spotify and OpenAI wrappers.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PooledHTTPClient:
+    """
+    Keep-alive HTTP client backed by one connection pool per process.
+
+    A single HTTPAdapter (urllib3's thread-safe pool) is shared by every thread,
+    while each thread gets its own lightweight requests.Session mounted on it,
+    so concurrent ingest threads and gunicorn threads reuse warm TCP/TLS
+    connections without sharing Session state.
+    """
+
+    def __init__(self, pool_size=10, keep_alive=True, connect_timeout=3.05, read_timeout=30,
+                 max_retries=2, retry_backoff=0.3, retry_methods=('GET',),
+                 retry_statuses=(500, 502, 503, 504)):
+        """
+        Args:
+            pool_size: Maximum number of pooled connections per host.
+            keep_alive: Reuse connections between calls (False sends Connection: close).
+            connect_timeout: Default seconds to wait for a connection.
+            read_timeout: Default seconds to wait for a response.
+            max_retries: Adapter-level retries for connection errors and retry_statuses.
+            retry_backoff: Exponential backoff factor between retries, in seconds.
+            retry_methods: HTTP methods that are safe to retry.
+            retry_statuses: Response codes that trigger a retry.
+        """
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=retry_statuses,
+            allowed_methods=frozenset(retry_methods),
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """
+        The calling thread's Session, mounted on the shared connection pool.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pool, applying the default timeouts
+        unless the caller passes its own timeout.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """
+        Drop every pooled connection (e.g. after forking a worker).
+        """
+        self.adapter.close()
+
+
+def client_from_config(config, prefix, **defaults):
+    """
+    Build a PooledHTTPClient from <prefix>_HTTP_* app config keys, falling back
+    to the shared HTTP_* keys and then to the given defaults.
+
+    Example: client_from_config(app.config, 'SPOTIFY') reads SPOTIFY_HTTP_POOL_SIZE,
+    then HTTP_POOL_SIZE.
+    """
+    def setting(name, default):
+        return config.get(f'{prefix}_HTTP_{name}', config.get(f'HTTP_{name}', default))
+
+    return PooledHTTPClient(
+        pool_size=setting('POOL_SIZE', defaults.get('pool_size', 10)),
+        keep_alive=setting('KEEP_ALIVE', defaults.get('keep_alive', True)),
+        connect_timeout=setting('CONNECT_TIMEOUT', defaults.get('connect_timeout', 3.05)),
+        read_timeout=setting('READ_TIMEOUT', defaults.get('read_timeout', 30)),
+        max_retries=setting('MAX_RETRIES', defaults.get('max_retries', 2)),
+        retry_backoff=setting('RETRY_BACKOFF', defaults.get('retry_backoff', 0.3)),
+        retry_methods=defaults.get('retry_methods', ('GET',)),
+    )
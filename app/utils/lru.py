@@ -0,0 +1,60 @@
+"""
+Small thread-safe LRU cache with per-entry expiry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded in-process cache: least recently used entries are evicted once
+    maxsize is reached, and entries older than their TTL are treated as missing.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.evictions = 0  # entries dropped to stay within maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value, or default if absent or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value, optionally expiring after ttl seconds.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
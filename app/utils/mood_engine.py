@@ -0,0 +1,252 @@
+"""
+Local, vectorised mood classification from Spotify audio features.
+
+Mood rules are plain data (loadable from configuration) and are compiled into
+NumPy predicates by MoodRuleSet; every rule set has a version string that is
+stamped on stored moods so rows scored under older rules can be found.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+
+# Columns of the feature matrix, in order
+FEATURE_COLUMNS = ('danceability', 'energy', 'valence', 'acousticness', 'instrumentalness', 'speechiness')
+
+# Same thresholds and precedence as SpotifyAPI.analyze_mood_from_features:
+# the first rule whose conditions all hold wins
+MOOD_RULES = (
+    ("Happy", (("valence", ">", 0.7), ("energy", ">", 0.6))),
+    ("Sad", (("valence", "<", 0.3), ("acousticness", ">", 0.5))),
+    ("Chill", (("danceability", ">", 0.4), ("energy", "<", 0.4))),
+    ("Angry", (("energy", ">", 0.8), ("valence", "<", 0.4))),
+    ("Focused", (("instrumentalness", ">", 0.7), ("speechiness", "<", 0.2))),
+)
+FALLBACK_MOOD = "Mixed"
+MAX_VERSION_LENGTH = 20  # AudioFeatures.mood_rules_version column width
+
+_OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+}
+
+
+class MoodRuleSet:
+    """
+    An ordered list of mood rules compiled into vectorised predicates.
+
+    Rules are given as (mood, conditions) pairs, or as dicts from configuration:
+        [{"mood": "Happy", "when": [["valence", ">", 0.7], ["energy", ">", 0.6]]}, ...]
+    Each condition is (feature column, operator, threshold) with operator one of
+    >, >=, <, <=. The first rule whose conditions all hold wins.
+    """
+
+    def __init__(self, rules, fallback=FALLBACK_MOOD, version=None):
+        """
+        Args:
+            rules (list): Mood rules, highest precedence first.
+            fallback (str): Label for rows matching no rule.
+            version (str): Rule-set version; defaults to a hash of the rules.
+
+        Raises:
+            ValueError: If a rule names an unknown column or operator.
+        """
+        self.rules = tuple(self._normalize_rule(rule) for rule in rules)
+        self.fallback = fallback
+        self.labels = [mood for mood, _ in self.rules]
+        self.codebook = np.array(self.labels + [fallback, "Unknown"])
+
+        canonical = json.dumps([[mood, [list(c) for c in conditions]] for mood, conditions in self.rules] + [fallback])
+        self.version = version or hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]
+
+        # Compile each condition once into (column index, ufunc, threshold, margin scale)
+        self._compiled = [
+            [self._compile_condition(*condition) for condition in conditions]
+            for _, conditions in self.rules
+        ]
+
+    @staticmethod
+    def _normalize_rule(rule):
+        if isinstance(rule, dict):
+            mood, conditions = rule['mood'], rule['when']
+        else:
+            mood, conditions = rule
+        return str(mood), tuple((str(name), str(op), float(threshold)) for name, op, threshold in conditions)
+
+    @staticmethod
+    def _compile_condition(name, op, threshold):
+        if name not in FEATURE_COLUMNS:
+            raise ValueError(f"Unknown mood rule feature '{name}' (expected one of {', '.join(FEATURE_COLUMNS)})")
+        if op not in _OPERATORS:
+            raise ValueError(f"Unknown mood rule operator '{op}'")
+        # Room left past the threshold on the passing side, used to scale confidence
+        room = (1.0 - threshold) if op.startswith('>') else threshold
+        return FEATURE_COLUMNS.index(name), _OPERATORS[op], op.startswith('>'), threshold, max(room, 1e-9)
+
+    def _masks(self, matrix):
+        masks = []
+        with np.errstate(invalid='ignore'):
+            for conditions in self._compiled:
+                mask = None
+                for index, compare, _, threshold, _ in conditions:
+                    hit = compare(matrix[:, index], threshold)
+                    mask = hit if mask is None else np.logical_and(mask, hit, out=mask)
+                masks.append(mask if mask is not None else np.ones(len(matrix), dtype=bool))
+        return masks
+
+    def classify_codes(self, matrix):
+        """
+        Like classify(), but returns integer codes into self.codebook
+        (rule labels, then the fallback, then "Unknown"); cheaper than strings
+        for very large matrices.
+        """
+        # Column-major layout makes every matrix[:, index] a contiguous scan
+        # (a no-op for matrices that are already column-oriented)
+        matrix = np.asfortranarray(matrix)
+        codes = np.full(len(matrix), len(self.rules), dtype=np.int8)
+        # Apply the rules lowest precedence first so earlier rules overwrite later ones
+        for code, mask in reversed(list(enumerate(self._masks(matrix)))):
+            codes[mask] = code
+        codes[np.isnan(matrix.sum(axis=1))] = len(self.rules) + 1
+        return codes
+
+    def classify(self, matrix):
+        """
+        Label every row of a column-oriented feature matrix at once; rows with
+        missing features (NaN) are "Unknown".
+        """
+        return self.codebook[self.classify_codes(matrix)]
+
+    def score(self, matrix):
+        """
+        Label every row and say how clearly it matched.
+
+        A rule's confidence is its weakest condition's margin past the threshold,
+        scaled to the room left on that side (e.g. valence 0.85 against "> 0.7"
+        is halfway to 1.0, so 0.5). Rows matching no rule get the fallback label
+        with confidence 0, as do NaN rows.
+
+        Returns:
+            tuple: (labels, confidence) arrays of length n.
+        """
+        matrix = np.asfortranarray(matrix)
+        fired = self._masks(matrix)
+        confidences = []
+        with np.errstate(invalid='ignore'):
+            for conditions in self._compiled:
+                margins = [
+                    ((matrix[:, index] - threshold) if above else (threshold - matrix[:, index])) / room
+                    for index, _, above, threshold, room in conditions
+                ]
+                confidences.append(np.minimum.reduce(margins))
+
+        labels = np.select(fired, self.labels, default=self.fallback)
+        confidence = np.clip(np.select(fired, confidences, default=0.0), 0.0, 1.0)
+        return labels, confidence
+
+
+DEFAULT_RULE_SET = MoodRuleSet(MOOD_RULES)
+
+# Compiled rule sets by their configuration, so each is compiled once per process
+_rule_sets = {}
+
+
+def rule_set_from_config(config):
+    """
+    Return the compiled MoodRuleSet described by the MOOD_RULES and
+    MOOD_RULES_VERSION config keys (the built-in MOOD_RULES when unset).
+
+    Raises:
+        ValueError: If MOOD_RULES_VERSION does not fit the mood_rules_version column.
+    """
+    rules = config.get('MOOD_RULES')
+    version = config.get('MOOD_RULES_VERSION') or None
+    if version and len(version) > MAX_VERSION_LENGTH:
+        raise ValueError(f"MOOD_RULES_VERSION '{version}' is longer than {MAX_VERSION_LENGTH} characters")
+    if not rules:
+        return DEFAULT_RULE_SET if not version else _cached_rule_set(MOOD_RULES, version)
+    return _cached_rule_set(rules, version)
+
+
+def _cached_rule_set(rules, version):
+    key = json.dumps([rules, version], sort_keys=True)
+    if key not in _rule_sets:
+        _rule_sets[key] = MoodRuleSet(rules, version=version)
+    return _rule_sets[key]
+
+
+def features_to_matrix(features_list):
+    """
+    Stack audio feature dicts into an (n, len(FEATURE_COLUMNS)) float matrix.
+
+    Rows with a missing or non-numeric feature (no features at all, or the
+    "Unavailable" placeholder returned for Spotify Free accounts) are NaN.
+
+    Returns:
+        tuple: (matrix, has_features) where has_features is a boolean mask of complete rows.
+    """
+    matrix = np.full((len(features_list), len(FEATURE_COLUMNS)), np.nan)
+    for i, features in enumerate(features_list):
+        if not features:
+            continue
+        try:
+            matrix[i] = [float(features[column]) for column in FEATURE_COLUMNS]
+        except (KeyError, TypeError, ValueError):
+            continue
+    return matrix, ~np.isnan(matrix).any(axis=1)
+
+
+def classify_mood_matrix(matrix, rule_set=None):
+    """
+    Label every row of a column-oriented feature matrix at once.
+
+    With the default rules this gives exactly the labels
+    SpotifyAPI.analyze_mood_from_features gives row by row (same strict
+    comparisons, first matching rule wins, "Mixed" otherwise); rows with
+    missing features (NaN) are "Unknown".
+
+    Args:
+        matrix (np.ndarray): Shape (n, len(FEATURE_COLUMNS)), columns in FEATURE_COLUMNS order.
+        rule_set (MoodRuleSet): Rules to apply (defaults to the built-in rules).
+
+    Returns:
+        np.ndarray: n mood labels.
+    """
+    return (rule_set or DEFAULT_RULE_SET).classify(matrix)
+
+
+def score_moods(matrix, rule_set=None):
+    """
+    Label every row of a feature matrix with a confidence score; see MoodRuleSet.score.
+    """
+    return (rule_set or DEFAULT_RULE_SET).score(matrix)
+
+
+def label_confident_moods(features_by_id, min_confidence, rule_set=None):
+    """
+    Label the tracks the rules can decide on their own.
+
+    Args:
+        features_by_id (dict): {track_id: audio features dict or None}.
+        min_confidence (float): Lowest confidence accepted without asking GPT.
+        rule_set (MoodRuleSet): Rules to apply (defaults to the built-in rules).
+
+    Returns:
+        tuple: ({track_id: mood} for confident tracks,
+                [track_id, ...] of tracks to escalate: low confidence, no rule or no features)
+    """
+    rule_set = rule_set or DEFAULT_RULE_SET
+    track_ids = list(features_by_id)
+    if not track_ids:
+        return {}, []
+
+    matrix, has_features = features_to_matrix([features_by_id[track_id] for track_id in track_ids])
+    labels, confidence = rule_set.score(matrix)
+    accepted = has_features & (labels != rule_set.fallback) & (confidence >= min_confidence)
+
+    moods = {track_id: str(label) for track_id, label, ok in zip(track_ids, labels, accepted) if ok}
+    escalate = [track_id for track_id, ok in zip(track_ids, accepted) if not ok]
+    return moods, escalate
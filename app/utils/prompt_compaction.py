@@ -0,0 +1,111 @@
+"""
+Compact serialisation of listening histories for GPT prompts.
+
+Interpolating a list of track dicts into a prompt repeats every key on every
+row and includes the same song once per time range. compact_tracks() sends
+each song once in a pipe-separated table with a single header row,
+optionally preceded by genre x mood counts and the top artists, and trims
+rows to stay within a token budget.
+"""
+
+import math
+from collections import Counter
+
+# Columns of the compact track table, in order
+TRACK_COLUMNS = ('name', 'artist', 'album', 'genre', 'mood')
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for OpenAI chat models (about 4 characters per token for
+    English text); close enough to compare prompt sizes and enforce budgets.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _cell(value):
+    text = str(value if value is not None else '').replace('\n', ' ').strip()
+    return text.replace('|', '/') or '-'
+
+
+def dedupe_tracks(tracks):
+    """
+    Collapse repeated (name, artist) pairs, keeping the first occurrence.
+
+    Returns:
+        list: (track dict, appearances) pairs in first-seen order.
+    """
+    seen = {}
+    for track in tracks:
+        key = (str(track.get('name', '')).casefold(), str(track.get('artist', '')).casefold())
+        if key in seen:
+            seen[key][1] += 1
+        else:
+            seen[key] = [track, 1]
+    return [tuple(entry) for entry in seen.values()]
+
+
+def aggregate_tracks(tracks, top_artists=10):
+    """
+    Summarise tracks as genre x mood counts and the most frequent artists.
+
+    Returns:
+        str: Two short text blocks, one line per genre and one line of artists.
+    """
+    histogram = Counter((track.get('genre') or 'Unknown', track.get('mood') or 'Unknown') for track in tracks)
+    genres = Counter(track.get('genre') or 'Unknown' for track in tracks)
+    lines = ['genre x mood counts:']
+    for genre, _ in genres.most_common():
+        moods = ', '.join(f"{mood} {count}" for (g, mood), count in histogram.most_common() if g == genre)
+        lines.append(f"{_cell(genre)}: {moods}")
+
+    artists = Counter(track.get('artist') or 'Unknown' for track in tracks).most_common(top_artists)
+    lines.append('top artists: ' + ', '.join(f"{_cell(artist)} ({count})" for artist, count in artists))
+    return '\n'.join(lines)
+
+
+def compact_tracks(tracks, token_budget=None, aggregate=False, top_artists=10):
+    """
+    Serialise a GPT track list compactly.
+
+    Args:
+        tracks (list): Track dicts with name, artist, album, genre and mood.
+        token_budget (int): Approximate token cap for the result; table rows past
+            it are dropped (the aggregates, computed over every track, are kept).
+        aggregate (bool): Prepend genre x mood counts and the top artists.
+        top_artists (int): Artists listed in the aggregate block.
+
+    Returns:
+        tuple: (text, report) where report is {'raw_tokens', 'compact_tokens',
+               'saved_tokens', 'tracks', 'unique_tracks', 'rows_dropped'}.
+    """
+    unique = dedupe_tracks(tracks)
+
+    blocks = []
+    if aggregate:
+        blocks.append(aggregate_tracks(tracks, top_artists))
+
+    header = '|'.join(TRACK_COLUMNS + ('ranges',))
+    intro = f"tracks ({len(unique)} unique of {len(tracks)}, ranges = number of time ranges it appears in):\n{header}"
+    used = estimate_tokens('\n'.join(blocks + [intro]))
+
+    rows = []
+    for track, appearances in unique:
+        row = '|'.join(_cell(track.get(column)) for column in TRACK_COLUMNS) + f"|{appearances}"
+        cost = estimate_tokens(row) + 1
+        if token_budget and used + cost > token_budget:
+            break
+        rows.append(row)
+        used += cost
+
+    text = '\n'.join(blocks + [intro] + rows)
+    raw_tokens = estimate_tokens(str(tracks))
+    compact_tokens = estimate_tokens(text)
+    return text, {
+        'raw_tokens': raw_tokens,
+        'compact_tokens': compact_tokens,
+        'saved_tokens': raw_tokens - compact_tokens,
+        'tracks': len(tracks),
+        'unique_tracks': len(unique),
+        'rows_dropped': len(unique) - len(rows),
+    }
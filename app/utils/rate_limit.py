@@ -0,0 +1,277 @@
+"""
+Token-bucket rate limiting and 429 handling for outbound API calls.
+"""
+
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+# ----------------------------------------------------------
+# Token buckets
+# ----------------------------------------------------------
+class TokenBucket:
+    """
+    In-process token bucket shared by every thread of this process.
+
+    Both bucket types expose the same two calls:
+        reserve() -> seconds the caller must wait before sending (0 = send now)
+        pause(seconds) -> stop handing out tokens for a while (after a 429)
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket stored in a local SQLite file, so every worker process on the
+    host draws from the same quota and honours the same Retry-After pause.
+
+    Each reservation is one short BEGIN IMMEDIATE transaction; wall-clock time
+    is used because monotonic clocks are not comparable across processes.
+    """
+
+    def __init__(self, path, name, rate, burst):
+        self.path = path
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._local = threading.local()
+
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_bucket ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated REAL NOT NULL, paused_until REAL NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO token_bucket (name, tokens, updated, paused_until) VALUES (?, ?, ?, 0)",
+                (name, self.burst, time.time())
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def reserve(self):
+        with self._transaction() as conn:
+            tokens, updated, paused_until = conn.execute(
+                "SELECT tokens, updated, paused_until FROM token_bucket WHERE name = ?", (self.name,)
+            ).fetchone()
+
+            now = time.time()
+            if now < paused_until:
+                return paused_until - now
+
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+
+            conn.execute(
+                "UPDATE token_bucket SET tokens = ?, updated = ? WHERE name = ?",
+                (tokens, now, self.name)
+            )
+            return wait
+
+    def pause(self, seconds):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE token_bucket SET paused_until = MAX(paused_until, ?) WHERE name = ?",
+                (time.time() + seconds, self.name)
+            )
+
+
+# ----------------------------------------------------------
+# Governor
+# ----------------------------------------------------------
+class RateLimitGovernor:
+    """
+    Gatekeeper in front of every call to one API.
+
+    Calls wait for a token before being sent. A 429 pauses the whole bucket for
+    Retry-After seconds (or an exponential, jittered backoff when the header is
+    missing) and the call is retried up to max_retries times; after that the
+    last 429 response is returned to the caller and counted as dropped.
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_retries=3, backoff_base=0.5,
+                 backoff_cap=30.0, store_path=None, name='spotify'):
+        """
+        Args:
+            rate: Sustained requests per second.
+            burst: Requests that may be sent back-to-back after an idle period.
+            max_retries: Times a throttled call is re-sent before giving up.
+            backoff_base: First backoff step (seconds) when no Retry-After is sent.
+            backoff_cap: Upper bound for any single backoff or Retry-After wait.
+            store_path: SQLite file shared by worker processes (None = this process only).
+            name: Bucket name inside the shared store.
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+        if store_path:
+            self.bucket = SharedTokenBucket(store_path, name, rate, burst)
+        else:
+            self.bucket = TokenBucket(rate, burst)
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def get_stats(self):
+        """
+        Snapshot of the counters: requests, throttled (429s received), retried,
+        dropped (gave up while still throttled) and waited_seconds.
+        """
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['waited_seconds'] = round(stats.get('waited_seconds', 0.0), 3)
+        return stats
+
+    def backoff_delay(self, response, attempt):
+        """
+        Seconds to wait before retrying a throttled response, or None if the
+        response should be returned as-is. Also pauses the shared bucket so
+        other threads and processes back off too.
+        """
+        if response.status_code != 429:
+            return None
+
+        self._count('throttled')
+        if attempt >= self.max_retries:
+            self._count('dropped')
+            print(f"🚦 Still rate limited after {attempt} retries; giving up on this call")
+            return None
+
+        retry_after = response.headers.get('Retry-After')
+        try:
+            delay = min(float(retry_after), self.backoff_cap)
+        except (TypeError, ValueError):
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        else:
+            # Spread the retries of everyone who was paused by the same 429
+            delay += random.uniform(0, self.backoff_base)
+
+        self.bucket.pause(delay)
+        self._count('retried')
+        print(f"🚦 Rate limited (429); retrying in {delay:.2f}s")
+        return delay
+
+    # ----------------------------------------------------------
+    # Sync calls
+    # ----------------------------------------------------------
+    def acquire(self):
+        """
+        Block until a token is available.
+        """
+        while True:
+            wait = self.bucket.reserve()
+            if wait <= 0:
+                return
+            self._count('waited_seconds', wait)
+            time.sleep(wait)
+
+    def send(self, send):
+        """
+        Run send() (a zero-argument callable returning a response) under the
+        governor, retrying throttled responses.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            self._count('requests')
+            response = send()
+            delay = self.backoff_delay(response, attempt)
+            if delay is None:
+                return response
+            attempt += 1
+
+    # ----------------------------------------------------------
+    # Async calls
+    # ----------------------------------------------------------
+    async def acquire_async(self):
+        """
+        Wait for a token without blocking the event loop.
+        """
+        while True:
+            wait = self.bucket.reserve()
+            if wait <= 0:
+                return
+            self._count('waited_seconds', wait)
+            await asyncio.sleep(wait)
+
+    async def send_async(self, send):
+        """
+        Async counterpart of send(): send is a zero-argument coroutine function.
+        """
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            self._count('requests')
+            response = await send()
+            delay = self.backoff_delay(response, attempt)
+            if delay is None:
+                return response
+            attempt += 1
+
+
+def governor_from_config(config, prefix):
+    """
+    Build a RateLimitGovernor from <prefix>_RATE_LIMIT_* app config keys.
+    """
+    return RateLimitGovernor(
+        rate=config.get(f'{prefix}_RATE_LIMIT_PER_SECOND', 10.0),
+        burst=config.get(f'{prefix}_RATE_LIMIT_BURST', 20),
+        max_retries=config.get(f'{prefix}_RATE_LIMIT_MAX_RETRIES', 3),
+        backoff_base=config.get(f'{prefix}_RATE_LIMIT_BACKOFF', 0.5),
+        backoff_cap=config.get(f'{prefix}_RATE_LIMIT_MAX_WAIT', 30.0),
+        store_path=config.get(f'{prefix}_RATE_LIMIT_STORE') or None,
+        name=prefix.lower(),
+    )
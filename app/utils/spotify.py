@@ -3,9 +3,12 @@ Utility functions for interacting with the Spotify API.
 """
 
 import base64
-import requests
 from urllib.parse import urlencode
 
+from app.utils.http import PooledHTTPClient, client_from_config
+from app.utils.rate_limit import RateLimitGovernor, governor_from_config
+from app.utils.spotify_async import AsyncSpotifyAPI
+
 
 class SpotifyAPI:
     """
@@ -24,7 +27,10 @@ class SpotifyAPI:
         self.redirect_uri = None
         self.auth_url = None
         self.token_url = None
-        self.api_base_url = None
+        self.api_base_url = 'https://api.spotify.com/v1/'
+        self.http = PooledHTTPClient()
+        self.governor = RateLimitGovernor()
+        self.aio = AsyncSpotifyAPI(governor=self.governor)
 
         if app is not None:
             self.init_app(app)
@@ -43,6 +49,22 @@ class SpotifyAPI:
         self.token_url = app.config['TOKEN_URL']
         self.api_base_url = app.config['API_BASE_URL']
 
+        # Keep-alive connection pool shared by every request in this process
+        self.http = client_from_config(app.config, 'SPOTIFY', read_timeout=10)
+
+        # One token bucket in front of every Web API call (sync and async) in this process
+        self.governor = governor_from_config(app.config, 'SPOTIFY')
+
+        # Async client for fan-out calls (many independent requests at once)
+        self.aio = AsyncSpotifyAPI(app, governor=self.governor)
+
+    def _get(self, url, **kwargs):
+        """
+        GET a Web API endpoint through the rate-limit governor, which waits for
+        quota and retries 429 responses before handing the response back.
+        """
+        return self.governor.send(lambda: self.http.get(url, **kwargs))
+
     def get_auth_url(self, state, scope=None):
         """
         Generate the Spotify authorization URL.
@@ -106,7 +128,7 @@ class SpotifyAPI:
         print("🔸 data:", data)
 
         try:
-            response = requests.post(self.token_url, headers=headers, data=data)
+            response = self.http.post(self.token_url, headers=headers, data=data)
             print("📡 Response status:", response.status_code)
             print("📡 Response body:", response.text)
 
@@ -135,7 +157,7 @@ class SpotifyAPI:
 
         print(f"{self.api_base_url}me", "headers= ", headers)
 
-        response = requests.get(f"{self.api_base_url}me", headers=headers)
+        response = self._get(f"{self.api_base_url}me", headers=headers)
         if response.status_code == 200:
             print("DEBUG successful call to spotify apii, response= ", response.json())
             return response.json()
@@ -164,7 +186,7 @@ class SpotifyAPI:
             'limit': limit
         }
 
-        response = requests.get(
+        response = self._get(
             f"{self.api_base_url}me/top/tracks",
             headers=headers,
             params=params
@@ -200,7 +222,7 @@ class SpotifyAPI:
             
             # Debugging output
             print(f"🔍 Fetching audio features for track IDs: {ids_param}")
-            response = requests.get(
+            response = self._get(
                 f"{self.api_base_url}audio-features",
                 headers=headers,
                 params={'ids': ids_param}
@@ -263,7 +285,7 @@ class SpotifyAPI:
 
         for i in range(0, len(artist_ids), 50):
             batch = artist_ids[i:i + 50]
-            response = requests.get(
+            response = self._get(
                 f"{self.api_base_url}artists",
                 headers=headers,
                 params={"ids": ",".join(batch)}
@@ -282,18 +304,17 @@ class SpotifyAPI:
         Search for a track on Spotify by name and artist, and return its metadata.
         Useful for fetching album images for GPT-recommended songs.
         """
-        import requests
         import urllib.parse
 
         query = f"track:{track_name} artist:{artist_name}"
         encoded_query = urllib.parse.quote(query)
 
-        url = f"https://api.spotify.com/v1/search?q={encoded_query}&type=track&limit=1"
+        url = f"{self.api_base_url}search?q={encoded_query}&type=track&limit=1"
         headers = {
             "Authorization": f"Bearer {access_token}"
         }
 
-        response = requests.get(url, headers=headers)
+        response = self._get(url, headers=headers)
         if response.status_code != 200:
             print(f"[SpotifyAPI] Search failed: {response.status_code} – {response.text}")
             return None
@@ -314,3 +335,18 @@ class SpotifyAPI:
             "id": items[0]["id"]
         }
 
+    def search_tracks(self, queries, access_token):
+        """
+        Search for many tracks concurrently through the async client.
+
+        Args:
+            queries (list): List of (track_name, artist_name) tuples.
+            access_token (str): Spotify access token.
+
+        Returns:
+            list: One search_track result per query, in the same order: None if
+                nothing matched, False if the request failed.
+        """
+        if not queries:
+            return []
+        return self.aio.run_sync(self.aio.search_tracks(queries, access_token))
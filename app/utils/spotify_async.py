@@ -0,0 +1,260 @@
+"""
+Asyncio-based Spotify API client for fan-out calls.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.utils.rate_limit import RateLimitGovernor
+
+
+class AsyncSpotifyAPI:
+    """
+    Async counterpart of SpotifyAPI with the same read methods, plus bulk
+    helpers that run many requests concurrently under a concurrency cap.
+
+    Each thread gets its own httpx.AsyncClient and semaphore (they are bound to
+    the event loop that created them); sync code calls in through run_sync().
+    """
+
+    def __init__(self, app=None, max_concurrency=10, transport=None, governor=None):
+        """
+        Initialize the async Spotify API helper.
+
+        Args:
+            app: Flask application instance (optional)
+            max_concurrency: Maximum number of Spotify requests in flight at once
+            transport: Optional httpx transport (e.g. httpx.MockTransport in tests)
+            governor: RateLimitGovernor shared with the sync client (a private one if omitted)
+        """
+        self.api_base_url = 'https://api.spotify.com/v1/'
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(10.0, connect=3.05)
+        self.transport = transport
+        self.governor = governor or RateLimitGovernor()
+        self._local = threading.local()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Initialize with a Flask application.
+
+        Args:
+            app: Flask application instance
+        """
+        self.api_base_url = app.config['API_BASE_URL']
+        self.max_concurrency = app.config.get('SPOTIFY_ASYNC_CONCURRENCY', self.max_concurrency)
+        self.timeout = httpx.Timeout(
+            app.config.get('SPOTIFY_HTTP_READ_TIMEOUT', 10.0),
+            connect=app.config.get('HTTP_CONNECT_TIMEOUT', 3.05)
+        )
+
+    # ----------------------------------------------------------
+    # Sync bridge
+    # ----------------------------------------------------------
+    def run_sync(self, coro):
+        """
+        Run a coroutine of this client to completion from synchronous code
+        (e.g. a Flask view) and close the connections it opened.
+        """
+        async def runner():
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(runner())
+
+        # Already inside an event loop on this thread: run on a helper thread instead
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, runner()).result()
+
+    async def aclose(self):
+        """
+        Close this thread's AsyncClient, if one is open.
+        """
+        state = getattr(self._local, 'state', None)
+        if state is not None:
+            self._local.state = None
+            await state['client'].aclose()
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = getattr(self._local, 'state', None)
+        if state is None or state['loop'] is not loop:
+            state = {
+                'loop': loop,
+                'client': httpx.AsyncClient(
+                    timeout=self.timeout,
+                    transport=self.transport,
+                    limits=httpx.Limits(max_connections=self.max_concurrency,
+                                        max_keepalive_connections=self.max_concurrency)
+                ),
+                'semaphore': asyncio.Semaphore(self.max_concurrency),
+            }
+            self._local.state = state
+        return state
+
+    async def _get(self, url, access_token, params=None):
+        state = self._state()
+        async with state['semaphore']:
+            return await self.governor.send_async(lambda: state['client'].get(
+                url,
+                headers={'Authorization': f'Bearer {access_token}'},
+                params=params
+            ))
+
+    # ----------------------------------------------------------
+    # Same surface as SpotifyAPI
+    # ----------------------------------------------------------
+    async def get_user_profile(self, access_token):
+        """
+        Get user profile information from Spotify, or None on failure.
+        """
+        response = await self._get(f"{self.api_base_url}me", access_token)
+        return response.json() if response.status_code == 200 else None
+
+    async def get_top_tracks(self, access_token, time_range='medium_term', limit=50):
+        """
+        Get user's top tracks for one time range, or None on failure.
+        """
+        response = await self._get(
+            f"{self.api_base_url}me/top/tracks",
+            access_token,
+            params={'time_range': time_range, 'limit': limit}
+        )
+        return response.json() if response.status_code == 200 else None
+
+    async def get_audio_features(self, access_token, track_ids):
+        """
+        Retrieve audio features for a list of track IDs, fetching every
+        100-ID batch concurrently.
+
+        Returns:
+            dict: Mapping of track ID to its audio features dictionary.
+        """
+        batches = [track_ids[i:i + 100] for i in range(0, len(track_ids), 100)]
+        responses = await asyncio.gather(*[
+            self._get(f"{self.api_base_url}audio-features", access_token, params={'ids': ",".join(batch)})
+            for batch in batches
+        ])
+
+        features_map = {}
+        for batch, response in zip(batches, responses):
+            if response.status_code == 200:
+                for item in response.json().get('audio_features', []):
+                    if item:
+                        features_map[item['id']] = item
+            elif response.status_code == 403:
+                print("Access to audio features denied. Likely due to Spotify Free account.")
+                for tid in batch:
+                    features_map[tid] = {
+                        "mood": "Unavailable",
+                        "note": "Upgrade to Spotify Premium to unlock full mood analysis."
+                    }
+            else:
+                print("Failed to fetch audio features:", response.text)
+
+        return features_map
+
+    async def get_artists_genres(self, access_token, artist_ids):
+        """
+        Get genres for a list of artist IDs, fetching every 50-ID batch concurrently.
+
+        Returns:
+            dict: {artist_id: [genres]}
+        """
+        batches = [artist_ids[i:i + 50] for i in range(0, len(artist_ids), 50)]
+        responses = await asyncio.gather(*[
+            self._get(f"{self.api_base_url}artists", access_token, params={'ids': ",".join(batch)})
+            for batch in batches
+        ])
+
+        genres_map = {}
+        for response in responses:
+            if response.status_code == 200:
+                for artist in response.json().get('artists', []):
+                    genres_map[artist['id']] = artist.get('genres', [])
+            else:
+                print("Failed to fetch artist genres:", response.text)
+
+        return genres_map
+
+    async def search_track(self, track_name, artist_name, access_token):
+        """
+        Search for a track by name and artist; returns the same shape as
+        SpotifyAPI.search_track, or None if nothing matched.
+        """
+        return (await self._search_track(track_name, artist_name, access_token)) or None
+
+    async def _search_track(self, track_name, artist_name, access_token):
+        """
+        Like search_track, but returns False when the request itself failed,
+        so callers can tell "no match" apart from "could not ask".
+        """
+        response = await self._get(
+            f"{self.api_base_url}search",
+            access_token,
+            params={'q': f"track:{track_name} artist:{artist_name}", 'type': 'track', 'limit': 1}
+        )
+        if response.status_code != 200:
+            print(f"[AsyncSpotifyAPI] Search failed: {response.status_code} – {response.text}")
+            return False
+
+        items = response.json().get("tracks", {}).get("items", [])
+        if not items:
+            return None
+
+        return {
+            "name": items[0]["name"],
+            "artist": items[0]["artists"][0]["name"],
+            "album": {
+                "name": items[0]["album"]["name"],
+                "images": items[0]["album"]["images"]
+            },
+            "id": items[0]["id"]
+        }
+
+    # ----------------------------------------------------------
+    # Bulk helpers
+    # ----------------------------------------------------------
+    async def search_tracks(self, queries, access_token):
+        """
+        Run many track searches concurrently.
+
+        Args:
+            queries (list): List of (track_name, artist_name) tuples.
+            access_token (str): Spotify access token.
+
+        Returns:
+            list: One search result per query, in the same order: None if nothing
+                matched, False if the request failed.
+        """
+        results = await asyncio.gather(
+            *[self._search_track(name, artist, access_token) for name, artist in queries],
+            return_exceptions=True
+        )
+        for (name, artist), result in zip(queries, results):
+            if isinstance(result, Exception):
+                print(f"[AsyncSpotifyAPI] Search for '{name}' by {artist} raised: {result}")
+        return [False if isinstance(result, Exception) else result for result in results]
+
+    async def get_top_tracks_for_ranges(self, access_token, time_ranges, limit=50):
+        """
+        Fetch the top tracks of several time ranges concurrently.
+
+        Returns:
+            dict: {time_range: top tracks payload or None}
+        """
+        results = await asyncio.gather(*[
+            self.get_top_tracks(access_token, time_range, limit) for time_range in time_ranges
+        ])
+        return dict(zip(time_ranges, results))
@@ -0,0 +1,109 @@
+# benchmarks/bench_login.py
+#
+# Times complete Spotify logins (token exchange, profile, ingest and GPT
+# insights) against the local Spotify and OpenAI stubs, with configurable
+# latency and 429 injection, so changes to the login path can be measured
+# reproducibly on a laptop. Each login is a new synthetic user.
+#
+# Usage:
+#     python benchmarks/bench_login.py [--logins 5] [--spotify-latency-ms 80] [--openai-latency-ms 800]
+#     python benchmarks/bench_login.py --spotify-url http://127.0.0.1:8082 --openai-url http://127.0.0.1:8081
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stubs.common import FaultInjector, install_stub_hooks, serve_in_thread
+from stubs.openai_stub import create_openai_stub
+from stubs.spotify_stub import create_spotify_stub
+
+
+def start_stubs(args):
+    """
+    Serve both stubs from this process unless external URLs were given.
+
+    Returns:
+        tuple: (spotify base URL, OpenAI base URL, servers to shut down)
+    """
+    servers = []
+    spotify_url, openai_url = args.spotify_url, args.openai_url
+    if not spotify_url:
+        faults = FaultInjector(args.spotify_latency_ms, args.jitter_ms, rate_limit_rate=args.rate_limit_rate,
+                               retry_after=args.retry_after, seed=args.seed, paths=('/v1/',))
+        server, spotify_url = serve_in_thread(install_stub_hooks(create_spotify_stub(args.seed), faults))
+        servers.append(server)
+    if not openai_url:
+        faults = FaultInjector(args.openai_latency_ms, args.jitter_ms, seed=args.seed)
+        server, openai_url = serve_in_thread(install_stub_hooks(create_openai_stub(), faults))
+        servers.append(server)
+    return spotify_url.rstrip('/'), openai_url.rstrip('/'), servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full logins against the local API stubs')
+    parser.add_argument('--logins', type=int, default=5)
+    parser.add_argument('--spotify-latency-ms', type=float, default=80)
+    parser.add_argument('--openai-latency-ms', type=float, default=800)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of Web API calls answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spotify-url', help='Use an already running Spotify stub')
+    parser.add_argument('--openai-url', help='Use an already running OpenAI stub')
+    args = parser.parse_args()
+
+    spotify_url, openai_url, servers = start_stubs(args)
+    workdir = tempfile.mkdtemp(prefix='echomood-bench-')
+
+    # Config is read from the environment when config.py is imported
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'AUTH_URL': f"{spotify_url}/authorize",
+        'TOKEN_URL': f"{spotify_url}/api/token",
+        'API_BASE_URL': f"{spotify_url}/v1/",
+        'OPENAI_API_URL': f"{openai_url}/v1/chat/completions",
+        'OPENAI_IMAGES_URL': f"{openai_url}/v1/images/generations",
+        'INGEST_BACKGROUND': 'false',
+    })
+    os.environ.setdefault('OPENAI_API_KEY', 'stub-key')
+    os.environ.setdefault('REDIRECT_URI', 'http://127.0.0.1:5000/callback')
+    os.environ.setdefault('dev_secret_key', 'bench-secret')
+
+    from app import create_app, db
+
+    app = create_app('development')
+    with app.app_context():
+        db.create_all()
+
+    print(f"\n{args.logins} logins against Spotify stub {spotify_url} and OpenAI stub {openai_url}\n")
+    timings = []
+    for login in range(args.logins):
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['state'] = 'bench'
+            start = time.perf_counter()
+            response = client.get(f'/callback?code=stub-code-{login}&state=bench')
+            timings.append(time.perf_counter() - start)
+            with client.session_transaction() as session:
+                ok = response.status_code == 302 and 'mood_summary' in session
+        print(f"login {login + 1:>3}: {timings[-1]:7.2f} s {'' if ok else '(no insights)'}")
+
+    timings.sort()
+    print(f"\nmean {sum(timings) / len(timings):.2f} s   p50 {timings[len(timings) // 2]:.2f} s   "
+          f"max {timings[-1]:.2f} s")
+    for name, url in (('Spotify', spotify_url), ('OpenAI', openai_url)):
+        stats = requests.get(f"{url}/_stub/stats", timeout=5).json()
+        print(f"{name} stub: {stats}")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
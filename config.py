@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -16,15 +17,88 @@ class Config:
     SPOTIFY_CLIENT_SECRET = os.environ.get('SPOTIFY_CLIENT_SECRET', 'your-client-secret')
     REDIRECT_URI = os.environ.get("REDIRECT_URI")
     print("URI is: ", REDIRECT_URI)
-    AUTH_URL = 'https://accounts.spotify.com/authorize'
-    TOKEN_URL = 'https://accounts.spotify.com/api/token'
-    API_BASE_URL = 'https://api.spotify.com/v1/'
+    # Spotify endpoints (point these at stubs/spotify_stub.py to run without Spotify)
+    AUTH_URL = os.environ.get('AUTH_URL', 'https://accounts.spotify.com/authorize')
+    TOKEN_URL = os.environ.get('TOKEN_URL', 'https://accounts.spotify.com/api/token')
+    API_BASE_URL = os.environ.get('API_BASE_URL', 'https://api.spotify.com/v1/').rstrip('/') + '/'
     USING_NGROK = True # set to false in prod
     
     # OPENAI API configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     OPENAI_API_URL = os.environ.get('OPENAI_API_URL', 'https://api.openai.com/v1/chat/completions')
     OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
+    # Root of the other OpenAI endpoints (files, batches); derived from OPENAI_API_URL by default
+    OPENAI_API_BASE = os.environ.get('OPENAI_API_BASE', OPENAI_API_URL.rsplit('/chat/completions', 1)[0])
+    OPENAI_IMAGES_URL = os.environ.get('OPENAI_IMAGES_URL', f"{OPENAI_API_BASE}/images/generations")  # DALL·E endpoint
+    OPENAI_BATCH_SIZE = int(os.environ.get('OPENAI_BATCH_SIZE', 25))  # tracks per batched classification prompt
+    OPENAI_BATCH_RETRIES = int(os.environ.get('OPENAI_BATCH_RETRIES', 2))  # retries per chunk before per-track fallback
+    # Cached ChatGPT replies, keyed by a hash of (method, model, messages, temperature)
+    GPT_CACHE_ENABLED = os.environ.get('GPT_CACHE_ENABLED', 'true').lower() == 'true'
+    # Comma-separated ChatGPT methods to cache; creative ones (analyze_user_tracks, infer_mbti_type, ...) are opt-in
+    GPT_CACHE_METHODS = [m.strip() for m in os.environ.get(
+        'GPT_CACHE_METHODS', 'classify_genre,classify_genres_batch,analyze_moods_batch').split(',') if m.strip()]
+    GPT_CACHE_DEFAULT_TTL = int(os.environ.get('GPT_CACHE_DEFAULT_TTL', 30 * 24 * 3600))  # seconds a cached reply is reused
+    GPT_CACHE_TTLS = json.loads(os.environ.get('GPT_CACHE_TTLS', '{}'))  # per-method overrides, e.g. {"infer_mbti_type": 86400}
+    GPT_CACHE_MEMORY_SIZE = int(os.environ.get('GPT_CACHE_MEMORY_SIZE', 1000))  # replies kept in the in-process LRU
+    GPT_CACHE_MAX_ROWS = int(os.environ.get('GPT_CACHE_MAX_ROWS', 50000))  # oldest rows beyond this are evicted
+    # Compact listening-history tables in the insight prompts (see app/utils/prompt_compaction.py)
+    GPT_PROMPT_COMPACTION = os.environ.get('GPT_PROMPT_COMPACTION', 'true').lower() == 'true'
+    GPT_PROMPT_TOKEN_BUDGET = int(os.environ.get('GPT_PROMPT_TOKEN_BUDGET', 3000))  # approx. tokens of track data per prompt
+    GPT_PROMPT_AGGREGATE = os.environ.get('GPT_PROMPT_AGGREGATE', 'false').lower() == 'true'  # prepend genre x mood counts and top artists
+    GPT_PROMPT_TOP_ARTISTS = int(os.environ.get('GPT_PROMPT_TOP_ARTISTS', 10))
+    # Process-wide micro-batching of genre/mood classification across concurrent ingests
+    GPT_MICROBATCH_ENABLED = os.environ.get('GPT_MICROBATCH_ENABLED', 'true').lower() == 'true'
+    GPT_MICROBATCH_WINDOW_MS = float(os.environ.get('GPT_MICROBATCH_WINDOW_MS', 50))  # how long a request waits for others to join its batch
+    GPT_MICROBATCH_MAX_BATCH = int(os.environ.get('GPT_MICROBATCH_MAX_BATCH', OPENAI_BATCH_SIZE))  # tracks per coalesced request
+    GPT_MICROBATCH_MAX_INFLIGHT = int(os.environ.get('GPT_MICROBATCH_MAX_INFLIGHT', 4))  # coalesced requests running at once
+    GPT_BATCH_DIR = os.environ.get('GPT_BATCH_DIR', os.path.join('instance', 'gpt_batch'))  # working directory of `flask gpt-batch`
+
+    # Pooled keep-alive HTTP clients (HTTP_* apply to both, SPOTIFY_HTTP_* / OPENAI_HTTP_* override per client)
+    HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))  # connections kept per host
+    HTTP_KEEP_ALIVE = os.environ.get('HTTP_KEEP_ALIVE', 'true').lower() == 'true'
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 2))  # adapter retries on connection errors / 5xx
+    HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.3))
+    SPOTIFY_HTTP_READ_TIMEOUT = float(os.environ.get('SPOTIFY_HTTP_READ_TIMEOUT', 10))
+    OPENAI_HTTP_READ_TIMEOUT = float(os.environ.get('OPENAI_HTTP_READ_TIMEOUT', 60))
+    SPOTIFY_ASYNC_CONCURRENCY = int(os.environ.get('SPOTIFY_ASYNC_CONCURRENCY', 10))  # max Spotify requests in flight for async fan-out
+
+    # Spotify rate-limit governor (token bucket in front of every Web API call)
+    SPOTIFY_RATE_LIMIT_PER_SECOND = float(os.environ.get('SPOTIFY_RATE_LIMIT_PER_SECOND', 10))  # sustained requests per second
+    SPOTIFY_RATE_LIMIT_BURST = int(os.environ.get('SPOTIFY_RATE_LIMIT_BURST', 20))
+    SPOTIFY_RATE_LIMIT_MAX_RETRIES = int(os.environ.get('SPOTIFY_RATE_LIMIT_MAX_RETRIES', 3))  # re-sends of a 429'd call before giving up
+    SPOTIFY_RATE_LIMIT_BACKOFF = float(os.environ.get('SPOTIFY_RATE_LIMIT_BACKOFF', 0.5))  # jittered backoff base when no Retry-After
+    SPOTIFY_RATE_LIMIT_MAX_WAIT = float(os.environ.get('SPOTIFY_RATE_LIMIT_MAX_WAIT', 30))  # cap on any single Retry-After wait
+    SPOTIFY_RATE_LIMIT_STORE = os.environ.get('SPOTIFY_RATE_LIMIT_STORE', '')  # SQLite file shared by worker processes ('' = per process)
+
+    # Cache of Spotify search results for recommended songs (search_cache table + in-process LRU)
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 30 * 24 * 3600))  # seconds a found track is reused
+    SEARCH_CACHE_NEGATIVE_TTL = int(os.environ.get('SEARCH_CACHE_NEGATIVE_TTL', 24 * 3600))  # seconds a "no match" is remembered
+    SEARCH_CACHE_MEMORY_SIZE = int(os.environ.get('SEARCH_CACHE_MEMORY_SIZE', 2000))  # entries kept in the in-process LRU
+    ARTIST_GENRE_TTL = int(os.environ.get('ARTIST_GENRE_TTL', 30 * 24 * 3600))  # seconds before an artist's Spotify genres are refetched
+
+    # Local mood engine (audio-feature rules) in front of GPT mood labelling
+    MOOD_ENGINE_ENABLED = os.environ.get('MOOD_ENGINE_ENABLED', 'true').lower() == 'true'
+    MOOD_ENGINE_MIN_CONFIDENCE = float(os.environ.get('MOOD_ENGINE_MIN_CONFIDENCE', 0.1))  # 0-1; below this a track is escalated to GPT
+    # JSON list of {"mood": ..., "when": [[feature, op, threshold], ...]}, first match wins (unset = built-in rules)
+    MOOD_RULES = json.loads(os.environ['MOOD_RULES']) if os.environ.get('MOOD_RULES') else None
+    MOOD_RULES_VERSION = os.environ.get('MOOD_RULES_VERSION', '')  # stamped on stored moods ('' = hash of the rules)
+
+    # Ingest pipeline
+    INGEST_CONCURRENT = os.environ.get('INGEST_CONCURRENT', 'true').lower() == 'true'  # fetch/enrich time ranges in parallel
+    INGEST_MAX_WORKERS = int(os.environ.get('INGEST_MAX_WORKERS', 3))  # thread pool bound for concurrent ingest
+    INGEST_BACKGROUND = os.environ.get('INGEST_BACKGROUND', 'true').lower() == 'true'  # queue ingest for worker.py instead of running it in /callback
+    INGEST_WORKER_POLL_INTERVAL = float(os.environ.get('INGEST_WORKER_POLL_INTERVAL', 2.0))  # seconds between queue polls
+    INGEST_JOB_TIMEOUT = int(os.environ.get('INGEST_JOB_TIMEOUT', 600))  # seconds before a running job is considered stuck
+    INGEST_JOB_MAX_ATTEMPTS = int(os.environ.get('INGEST_JOB_MAX_ATTEMPTS', 2))
+    INGEST_FRESHNESS_TTL = int(os.environ.get('INGEST_FRESHNESS_TTL', 3600))  # seconds a user's ingest stays fresh (0 = always re-ingest)
+    INGEST_ATTACH_TIMEOUT = int(os.environ.get('INGEST_ATTACH_TIMEOUT', 120))  # seconds an inline login waits on another in-flight ingest
+
+    # Per-user GPT insights
+    INSIGHT_MODE = os.environ.get('INSIGHT_MODE', 'combined')  # 'combined' (one structured GPT call) or 'parallel' (separate calls run concurrently)
+    INSIGHT_MAX_WORKERS = int(os.environ.get('INSIGHT_MAX_WORKERS', 6))  # thread pool bound for parallel insight calls
+    INSIGHT_CALL_TIMEOUT = float(os.environ.get('INSIGHT_CALL_TIMEOUT', 30))  # seconds one parallel insight call may run
+    INSIGHT_DEADLINE = float(os.environ.get('INSIGHT_DEADLINE', 60))  # seconds before parallel insights are assembled from whatever finished
 
     # database stuff
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///app.db')  # SQLite database for development, actual for prod
@@ -62,6 +62,43 @@ document.addEventListener('DOMContentLoaded', () => {
         scrollContainer.scrollBy({ left: 300, behavior: 'smooth' });
       });
     }
+
+    // Poll the background ingest job and reload once the results are ready
+    const ingestStatus = document.getElementById('ingest-status');
+
+    if (ingestStatus) {
+      const stageText = document.getElementById('ingest-stage');
+      const progressBar = document.getElementById('ingest-progress');
+
+      const pollIngest = () => {
+        fetch(ingestStatus.dataset.statusUrl)
+          .then(response => {
+            if (response.status === 401) {
+              // Session expired: reloading sends the user back to log in
+              window.location.reload();
+              return;
+            }
+            if (!response.ok) {
+              // The job is gone or not ours; stop polling and say so
+              stageText.innerText = 'Could not check on your analysis. Please refresh the page.';
+              progressBar.hidden = true;
+              return;
+            }
+            return response.json().then(job => {
+              if (job.finished) {
+                window.location.reload();
+                return;
+              }
+              stageText.innerText = job.stage || 'Analysing your Spotify listening history...';
+              progressBar.value = job.progress || 0;
+              setTimeout(pollIngest, 2000);
+            });
+          })
+          .catch(() => setTimeout(pollIngest, 5000));
+      };
+
+      pollIngest();
+    }
   
   });
   
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Local stand-ins for the external APIs EchoMood calls, for offline tests and benchmarks.
+"""
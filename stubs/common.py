@@ -0,0 +1,237 @@
+# stubs/common.py
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import requests
+from flask import Response, jsonify, request
+from werkzeug.serving import make_server
+
+# Response headers worth keeping in a recording
+_RECORDED_HEADERS = ('Content-Type', 'Retry-After', 'Location')
+
+
+def serve_in_thread(app, host='127.0.0.1', port=0):
+    """
+    Serve a stub Flask app from a background thread (port 0 picks a free port).
+
+    Returns:
+        tuple: (server, base URL such as "http://127.0.0.1:54321"); call
+               server.shutdown() to stop it.
+    """
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name=f'{app.name}-server', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+# ----------------------------------------------------------
+# Fault injection
+# ----------------------------------------------------------
+class FaultInjector:
+    """
+    Adds latency, server errors and 429 throttling to a stub's responses.
+    Every setting can be changed at runtime through POST /_stub/config.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=None,
+                 paths=None):
+        """
+        Args:
+            latency_ms (float): Delay added to every request.
+            jitter_ms (float): Extra uniformly random delay, 0..jitter_ms.
+            error_rate (float): Fraction of requests answered with a 503.
+            rate_limit_rate (float): Fraction of requests answered with a 429.
+            retry_after (float): Retry-After seconds sent with a 429.
+            seed (int): Seed for reproducible fault sequences.
+            paths (tuple): Path prefixes errors and 429s are limited to, e.g.
+                ('/v1/',) to leave the token endpoint alone (None = every path).
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.paths = tuple(paths) if paths else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def settings(self):
+        return {name: getattr(self, name)
+                for name in ('latency_ms', 'jitter_ms', 'error_rate', 'rate_limit_rate', 'retry_after')}
+
+    def update(self, **settings):
+        for name, value in settings.items():
+            if name in self.settings():
+                setattr(self, name, float(value))
+
+    def apply(self, path):
+        """
+        Sleep for the configured latency and return a fault response, or None
+        to let the request through.
+        """
+        with self.lock:
+            delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            roll = self.random.random()
+        if delay:
+            time.sleep(delay / 1000.0)
+        if self.paths and not path.startswith(self.paths):
+            return None
+        if roll < self.rate_limit_rate:
+            response = jsonify({"error": {"status": 429, "message": "API rate limit exceeded (stub)"}})
+            response.status_code = 429
+            response.headers['Retry-After'] = f"{self.retry_after:g}"
+            return response
+        if roll < self.rate_limit_rate + self.error_rate:
+            response = jsonify({"error": {"status": 503, "message": "Service unavailable (stub)"}})
+            response.status_code = 503
+            return response
+        return None
+
+
+# ----------------------------------------------------------
+# Record / replay
+# ----------------------------------------------------------
+class Cassette:
+    """
+    Recorded responses in a JSONL file, keyed by method, path, query string
+    and a hash of the request body (credentials are never part of the key).
+
+    In record mode requests are forwarded to the real upstream and every
+    response is appended to the file; in replay mode recorded responses are
+    served back, and requests that were never recorded fall through to the
+    stub's own synthetic handlers.
+    """
+
+    def __init__(self, path, mode='replay', upstream=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError("Cassette mode must be 'record' or 'replay'")
+        if mode == 'record' and not upstream:
+            raise ValueError("Recording needs the upstream base URL")
+        self.path = path
+        self.mode = mode
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.entries = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+
+    @staticmethod
+    def request_key():
+        query = '&'.join(sorted(request.query_string.decode('utf-8').split('&'))) if request.query_string else ''
+        body = hashlib.sha256(request.get_data()).hexdigest()[:16] if request.get_data() else ''
+        return f"{request.method} {request.path}?{query}#{body}"
+
+    def replay(self):
+        entry = self.entries.get(self.request_key())
+        if entry is None:
+            return None
+        return Response(entry['body'], status=entry['status'], headers=entry['headers'])
+
+    def record(self):
+        """
+        Forward the current request upstream, store the response and return it.
+        """
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() in ('authorization', 'content-type', 'accept')}
+        upstream = requests.request(request.method, f"{self.upstream}{request.full_path.rstrip('?')}",
+                                    headers=headers, data=request.get_data(), timeout=120, allow_redirects=False)
+        entry = {
+            'key': self.request_key(),
+            'status': upstream.status_code,
+            'headers': {name: upstream.headers[name] for name in _RECORDED_HEADERS if name in upstream.headers},
+            'body': upstream.text
+        }
+        with self.lock:
+            self.entries[entry['key']] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return Response(entry['body'], status=entry['status'], headers=entry['headers'])
+
+
+def install_stub_hooks(app, faults=None, cassette=None):
+    """
+    Wire fault injection, record/replay and the /_stub control endpoints into
+    a stub app. Faults are applied before replay, so recorded sessions can be
+    replayed under different latency and error conditions.
+
+    Control endpoints:
+        GET  /_stub/stats   request counts per endpoint and status
+        GET  /_stub/config  current fault settings
+        POST /_stub/config  update fault settings from a JSON object
+    """
+    faults = faults or FaultInjector()
+    stats = Counter()
+    app.extensions['stub_faults'] = faults
+    app.extensions['stub_stats'] = stats
+
+    @app.before_request
+    def inject():
+        if request.path.startswith('/_stub/'):
+            return None
+        stats[f"{request.method} {request.path}"] += 1
+        fault = faults.apply(request.path)
+        if fault is not None:
+            stats[f"injected {fault.status_code}"] += 1
+            return fault
+        if cassette is not None:
+            if cassette.mode == 'record':
+                stats['recorded'] += 1
+                return cassette.record()
+            replayed = cassette.replay()
+            stats['replayed' if replayed is not None else 'replay_misses'] += 1
+            return replayed
+        return None
+
+    @app.get('/_stub/stats')
+    def stub_stats():
+        return jsonify(dict(stats))
+
+    @app.route('/_stub/config', methods=['GET', 'POST'])
+    def stub_config():
+        if request.method == 'POST':
+            faults.update(**(request.get_json(silent=True) or {}))
+        return jsonify(faults.settings())
+
+    return app
+
+
+def add_stub_arguments(parser, port):
+    """
+    Command-line options shared by the stub servers.
+    """
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Extra random delay, 0..jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After seconds on injected 429s')
+    parser.add_argument('--fault-paths', nargs='*', help='Path prefixes errors and 429s apply to (default: all)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible faults and data')
+    parser.add_argument('--record', metavar='CASSETTE', help='Proxy to --upstream and record responses here')
+    parser.add_argument('--replay', metavar='CASSETTE', help='Serve responses recorded earlier')
+    parser.add_argument('--upstream', help='Real API root to proxy to when recording, e.g. https://api.spotify.com')
+
+
+def hooks_from_args(args):
+    """
+    Build the FaultInjector and optional Cassette described by add_stub_arguments options.
+    """
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                           args.retry_after, args.seed, args.fault_paths)
+    cassette = None
+    if args.record:
+        cassette = Cassette(args.record, 'record', args.upstream)
+    elif args.replay:
+        cassette = Cassette(args.replay, 'replay')
+    return faults, cassette
@@ -0,0 +1,247 @@
+# stubs/openai_stub.py
+#
+# Local stand-in for the OpenAI endpoints EchoMood uses: chat completions,
+# image generation, file upload and download, and the Batch API. Every prompt
+# gets a deterministic reply of the shape its caller expects, so logins and
+# backfills can be run end to end without an API key. Latency, errors, 429s
+# and record/replay are provided by stubs/common.py.
+#
+# Usage:
+#     python stubs/openai_stub.py [--port 8081] [--polls 1] [--latency-ms 400]
+#     OPENAI_API_URL=http://127.0.0.1:8081/v1/chat/completions flask run
+#     OPENAI_API_BASE=http://127.0.0.1:8081/v1 flask gpt-batch run --interval 1
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+from flask import Flask, Response, jsonify, request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stubs.common import add_stub_arguments, hooks_from_args, install_stub_hooks
+
+STUB_GENRES = ("Pop", "Rock", "Hip-Hop", "Electronic", "Indie", "R&B", "Jazz", "Classical")
+STUB_MOODS = ("Happy", "Sad", "Angry", "Chill", "Focused")
+STUB_MBTI = ("INFP", "ENFP", "INTJ", "ISFJ")
+STUB_TIME_RANGES = {"Happy": "Morning (9am–12pm)", "Sad": "Late night (11pm–2am)", "Angry": "Afternoon (3pm–6pm)",
+                    "Chill": "Night (8pm–11pm)", "Focused": "Work hours (9am–5pm)"}
+
+
+def _pick(options, seed):
+    # Stable choice per input, so repeated runs give the same labels
+    return options[int(hashlib.md5(str(seed).encode('utf-8')).hexdigest(), 16) % len(options)]
+
+
+def stub_mood(details):
+    """
+    Mood from valence/energy when present (same thresholds as the audio-feature
+    rules), otherwise a stable pick by track name.
+    """
+    valence, energy = details.get('valence'), details.get('energy')
+    if valence is None or energy is None:
+        return _pick(STUB_MOODS, details.get('name'))
+    if valence > 0.6 and energy > 0.5:
+        return "Happy"
+    if valence < 0.4 and energy > 0.7:
+        return "Angry"
+    if valence < 0.4:
+        return "Sad"
+    return "Chill" if energy < 0.5 else "Focused"
+
+
+def _moods_in(text):
+    # Moods mentioned in a listening-history prompt, in a stable order
+    return [mood for mood in STUB_MOODS if mood in text] or ["Chill"]
+
+
+def _stub_recommendations(moods):
+    return {mood: [{"name": f"Stub Pick {mood} {n}", "artist": f"Stub Artist {n}"} for n in range(1, 4)]
+            for mood in moods}
+
+
+def _stub_summary(moods):
+    return f"A listener who moves between {', '.join(moods)} moods with a steady, curious ear."
+
+
+def stub_chat_reply(body):
+    """
+    Answer a chat completion request body with a deterministic reply content,
+    shaped like what the ChatGPT method that sent the prompt parses: JSON
+    objects for batched labels, combined insights, recommendations and time
+    ranges, a bare label or short sentence for the rest.
+    """
+    messages = body.get('messages') or []
+    system = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+    user = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+    moods = _moods_in(user)
+
+    if 'genre classifier' in system:
+        items = json.loads(user)
+        return json.dumps({item['id']: _pick(STUB_GENRES, item.get('artist')) for item in items})
+    if 'mood analysis assistant' in system and user.lstrip().startswith('['):
+        items = json.loads(user)
+        return json.dumps({item['id']: stub_mood(item) for item in items})
+    if 'mood analysis assistant' in system:
+        return _pick(STUB_MOODS, user)
+    if 'reply with only one JSON object' in system:
+        return json.dumps({
+            "mood_summary": _stub_summary(moods),
+            "recommendations": _stub_recommendations(moods),
+            "mbti_type": _pick(STUB_MBTI, user),
+            "mbti_summary": "Curious and mood driven listener",
+            "mood_time_ranges": {mood: STUB_TIME_RANGES[mood] for mood in moods}
+        }, ensure_ascii=False)
+    if 'recommendation assistant' in system:
+        return json.dumps(_stub_recommendations(moods))
+    if 'time-of-day' in system:
+        return json.dumps({mood: STUB_TIME_RANGES[mood] for mood in moods}, ensure_ascii=False)
+    if 'MBTI personality type' in system:
+        return _pick(STUB_MBTI, user)
+    if '5 words' in system:
+        return "Curious and mood driven listener"
+    if 'music psychologist' in system:
+        return _stub_summary(moods)
+    if 'What is the most appropriate genre label' in user:
+        return _pick(STUB_GENRES, user)
+    return "Chill"
+
+
+def completion(body, content):
+    """
+    Wrap reply content in the chat.completion response shape.
+    """
+    return {
+        "id": f"chatcmpl-stub-{hashlib.md5(content.encode('utf-8')).hexdigest()[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get('model', 'stub'),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+def create_openai_stub(polls_until_done=1):
+    """
+    Build the stub app. Files and batches live in memory for the life of the app.
+
+    Args:
+        polls_until_done (int): Status checks a batch reports "in_progress" for
+            before it completes, to exercise polling.
+    """
+    app = Flask('openai_stub')
+    files, batches = {}, {}
+    ids = itertools.count(1)
+
+    def add_file(content, filename, purpose):
+        file_id = f"file-stub{next(ids)}"
+        files[file_id] = {
+            "meta": {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                     "filename": filename, "purpose": purpose},
+            "content": content
+        }
+        return files[file_id]["meta"]
+
+    def run_batch(batch):
+        # Answer every request line of the input file and write the output file
+        lines = []
+        for line in files[batch['input_file_id']]['content'].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            body = completion(entry['body'], stub_chat_reply(entry['body']))
+            lines.append(json.dumps({
+                "id": f"batch_req_{next(ids)}",
+                "custom_id": entry['custom_id'],
+                "response": {"status_code": 200, "request_id": f"req_{next(ids)}", "body": body},
+                "error": None
+            }))
+        output = add_file(('\n'.join(lines) + '\n').encode('utf-8'), 'batch_output.jsonl', 'batch_output')
+        batch.update(status='completed', output_file_id=output['id'], completed_at=int(time.time()),
+                     request_counts={"total": len(lines), "completed": len(lines), "failed": 0})
+
+    @app.post('/v1/chat/completions')
+    def chat_completions():
+        body = request.get_json(silent=True) or {}
+        if not body.get('messages'):
+            return jsonify({"error": {"message": "messages is required"}}), 400
+        return jsonify(completion(body, stub_chat_reply(body)))
+
+    @app.post('/v1/images/generations')
+    def image_generations():
+        body = request.get_json(silent=True) or {}
+        seed = hashlib.md5(str(body.get('prompt')).encode('utf-8')).hexdigest()[:12]
+        return jsonify({"created": int(time.time()),
+                        "data": [{"url": f"https://picsum.photos/seed/{seed}/1024",
+                                  "revised_prompt": body.get('prompt')}]})
+
+    @app.post('/v1/files')
+    def upload_file():
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({"error": {"message": "file is required"}}), 400
+        return jsonify(add_file(upload.read(), upload.filename, request.form.get('purpose', 'batch')))
+
+    @app.get('/v1/files/<file_id>/content')
+    def file_content(file_id):
+        if file_id not in files:
+            return jsonify({"error": {"message": f"No such File object: {file_id}"}}), 404
+        return Response(files[file_id]['content'], mimetype='application/octet-stream')
+
+    @app.post('/v1/batches')
+    def create_batch():
+        body = request.get_json()
+        if body.get('input_file_id') not in files:
+            return jsonify({"error": {"message": "input_file_id not found"}}), 400
+        batch_id = f"batch_stub{next(ids)}"
+        batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": body.get('endpoint'),
+            "input_file_id": body['input_file_id'], "completion_window": body.get('completion_window', '24h'),
+            "status": "validating", "output_file_id": None, "error_file_id": None,
+            "created_at": int(time.time()), "completed_at": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": body.get('metadata'), "_polls": 0
+        }
+        return jsonify({k: v for k, v in batches[batch_id].items() if not k.startswith('_')})
+
+    @app.get('/v1/batches')
+    def list_batches():
+        # Newest first, paged with limit/after like the real endpoint
+        listed = [{k: v for k, v in batch.items() if not k.startswith('_')} for batch in reversed(batches.values())]
+        after = request.args.get('after')
+        if after:
+            ids_listed = [batch['id'] for batch in listed]
+            listed = listed[ids_listed.index(after) + 1:] if after in ids_listed else []
+        limit = min(int(request.args.get('limit', 20)), 100)
+        page = listed[:limit]
+        return jsonify({"object": "list", "data": page, "first_id": page[0]['id'] if page else None,
+                        "last_id": page[-1]['id'] if page else None, "has_more": len(listed) > limit})
+
+    @app.get('/v1/batches/<batch_id>')
+    def get_batch(batch_id):
+        batch = batches.get(batch_id)
+        if batch is None:
+            return jsonify({"error": {"message": f"No such Batch object: {batch_id}"}}), 404
+        if batch['status'] != 'completed':
+            batch['_polls'] += 1
+            if batch['_polls'] > polls_until_done:
+                run_batch(batch)
+            else:
+                batch['status'] = 'in_progress'
+        return jsonify({k: v for k, v in batch.items() if not k.startswith('_')})
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local OpenAI API stand-in')
+    add_stub_arguments(parser, port=8081)
+    parser.add_argument('--polls', type=int, default=1, help='Status checks before a batch completes')
+    args = parser.parse_args()
+    faults, cassette = hooks_from_args(args)
+    app = install_stub_hooks(create_openai_stub(args.polls), faults, cassette)
+    app.run(host=args.host, port=args.port, threaded=True)
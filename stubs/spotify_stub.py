@@ -0,0 +1,206 @@
+# stubs/spotify_stub.py
+#
+# Local stand-in for the Spotify Accounts and Web API endpoints EchoMood uses:
+# authorize, token, me, me/top/tracks, audio-features, artists and search.
+# Every response is synthesised deterministically from the request, so the
+# same login always sees the same library, and can be slowed down, throttled
+# or replaced by recorded responses (see stubs/common.py).
+#
+# Usage:
+#     python stubs/spotify_stub.py [--port 8082] [--latency-ms 80] [--rate-limit-rate 0.05]
+#     AUTH_URL=http://127.0.0.1:8082/authorize TOKEN_URL=http://127.0.0.1:8082/api/token \
+#     API_BASE_URL=http://127.0.0.1:8082/v1/ flask run
+
+import argparse
+import hashlib
+import itertools
+import os
+import random
+import secrets
+import sys
+from urllib.parse import urlencode
+
+from flask import Flask, jsonify, redirect, request
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from stubs.common import add_stub_arguments, hooks_from_args, install_stub_hooks
+
+# Where each time range starts within a user's library, so that the ranges
+# share most of their songs the way Spotify's own top-track lists do
+RANGE_OFFSETS = {'short_term': 0, 'medium_term': 15, 'long_term': 30}
+ARTIST_POOL = 40
+GENRE_POOL = ("pop", "indie rock", "hip hop", "electronic", "r&b", "jazz", "classical", "folk")
+
+
+def _rng(*parts):
+    # Independent, reproducible random stream per entity
+    return random.Random(hashlib.md5('|'.join(map(str, parts)).encode('utf-8')).hexdigest())
+
+
+def _artist(index, seed):
+    return {"id": f"stubartist{index:03d}", "name": f"Stub Artist {index}", "type": "artist",
+            "uri": f"spotify:artist:stubartist{index:03d}",
+            "genres": [] if index % 7 == 0 else [_rng(seed, 'genre', index).choice(GENRE_POOL)]}
+
+
+def _track(index, seed):
+    rng = _rng(seed, 'track', index)
+    artist = _artist(rng.randrange(ARTIST_POOL), seed)
+    track_id = f"stubtrack{index:04d}"
+    return {
+        "id": track_id,
+        "name": f"Stub Song {index}",
+        "type": "track",
+        "uri": f"spotify:track:{track_id}",
+        "artists": [{key: artist[key] for key in ("id", "name", "type", "uri")}],
+        "album": {
+            "id": f"stubalbum{index // 3:04d}",
+            "name": f"Stub Album {index // 3}",
+            "images": [{"url": f"https://picsum.photos/seed/{track_id}/640", "height": 640, "width": 640}]
+        },
+        "popularity": rng.randint(10, 95),
+        "duration_ms": rng.randint(120_000, 300_000),
+        "explicit": False
+    }
+
+
+def _audio_features(track_id, seed):
+    rng = _rng(seed, 'features', track_id)
+    return {
+        "id": track_id, "type": "audio_features",
+        "danceability": round(rng.random(), 3), "energy": round(rng.random(), 3),
+        "valence": round(rng.random(), 3), "acousticness": round(rng.random(), 3),
+        "instrumentalness": round(rng.random() ** 3, 3), "speechiness": round(rng.random() * 0.3, 3),
+        "liveness": round(rng.random() * 0.5, 3), "tempo": round(rng.uniform(60, 180), 3),
+        "loudness": round(rng.uniform(-20, -3), 3), "key": rng.randrange(12), "mode": rng.randrange(2),
+        "time_signature": 4, "duration_ms": rng.randint(120_000, 300_000)
+    }
+
+
+def create_spotify_stub(seed=0, features_status=200, users=None):
+    """
+    Build the stub app.
+
+    Args:
+        seed (int): Selects the synthetic library; the same seed always
+            produces the same tracks, artists and audio features.
+        features_status (int): Status for audio-features (403 mimics a
+            Spotify Free account, where features are unavailable).
+        users (int): Number of distinct synthetic users; logins are assigned
+            to them round-robin. Defaults to a new user for every login.
+    """
+    app = Flask('spotify_stub')
+    tokens = {}  # access/refresh token -> user index
+    logins = itertools.count()
+
+    def bearer_user():
+        header = request.headers.get('Authorization', '')
+        token = header[len('Bearer '):] if header.startswith('Bearer ') else None
+        return tokens.get(token)
+
+    def unauthorized():
+        return jsonify({"error": {"status": 401, "message": "Invalid access token"}}), 401
+
+    def issue_tokens(user_index, refresh_token=None):
+        access_token = f"stub-access-{secrets.token_hex(8)}"
+        tokens[access_token] = user_index
+        body = {"access_token": access_token, "token_type": "Bearer", "expires_in": 3600,
+                "scope": "user-read-email user-read-private user-top-read"}
+        if refresh_token is None:
+            refresh_token = f"stub-refresh-{secrets.token_hex(8)}"
+            tokens[refresh_token] = user_index
+            body["refresh_token"] = refresh_token
+        return jsonify(body)
+
+    @app.get('/authorize')
+    def authorize():
+        # Approve straight away, as if the user clicked "Agree"
+        redirect_uri = request.args.get('redirect_uri')
+        if not redirect_uri:
+            return jsonify({"error": "redirect_uri is required"}), 400
+        index = next(logins)
+        params = {"code": f"stub-code-{index % users if users else index}"}
+        if request.args.get('state'):
+            params["state"] = request.args['state']
+        return redirect(f"{redirect_uri}?{urlencode(params)}")
+
+    @app.post('/api/token')
+    def token():
+        grant = request.form.get('grant_type')
+        if grant == 'authorization_code':
+            code = request.form.get('code', '')
+            if not code.startswith('stub-code-'):
+                return jsonify({"error": "invalid_grant", "error_description": "Invalid authorization code"}), 400
+            return issue_tokens(int(code.rsplit('-', 1)[1]))
+        if grant == 'refresh_token':
+            refresh_token = request.form.get('refresh_token')
+            if refresh_token not in tokens:
+                return jsonify({"error": "invalid_grant", "error_description": "Invalid refresh token"}), 400
+            return issue_tokens(tokens[refresh_token], refresh_token)
+        return jsonify({"error": "unsupported_grant_type"}), 400
+
+    @app.get('/v1/me')
+    def me():
+        user = bearer_user()
+        if user is None:
+            return unauthorized()
+        return jsonify({"id": f"stubuser{user}", "display_name": f"Stub User {user}", "type": "user",
+                        "email": f"stubuser{user}@example.com", "country": "AU", "product": "premium",
+                        "images": [], "uri": f"spotify:user:stubuser{user}"})
+
+    @app.get('/v1/me/top/tracks')
+    def top_tracks():
+        user = bearer_user()
+        if user is None:
+            return unauthorized()
+        time_range = request.args.get('time_range', 'medium_term')
+        limit = min(int(request.args.get('limit', 20)), 50)
+        # Each user's library is a window over the catalog; the ranges overlap
+        start = user * 7 + RANGE_OFFSETS.get(time_range, 0)
+        items = [_track(index, seed) for index in range(start, start + limit)]
+        return jsonify({"items": items, "total": limit, "limit": limit, "offset": 0, "next": None})
+
+    @app.get('/v1/audio-features')
+    def audio_features():
+        if bearer_user() is None:
+            return unauthorized()
+        if features_status != 200:
+            return jsonify({"error": {"status": features_status, "message": "Forbidden"}}), features_status
+        ids = [track_id for track_id in request.args.get('ids', '').split(',') if track_id][:100]
+        return jsonify({"audio_features": [_audio_features(track_id, seed) for track_id in ids]})
+
+    @app.get('/v1/artists')
+    def artists():
+        if bearer_user() is None:
+            return unauthorized()
+        ids = [artist_id for artist_id in request.args.get('ids', '').split(',') if artist_id][:50]
+        found = []
+        for artist_id in ids:
+            index = artist_id.removeprefix('stubartist')
+            found.append(_artist(int(index), seed) if index.isdigit() else None)
+        return jsonify({"artists": found})
+
+    @app.get('/v1/search')
+    def search():
+        if bearer_user() is None:
+            return unauthorized()
+        query = request.args.get('q', '')
+        limit = min(int(request.args.get('limit', 1)), 50)
+        # Any query finds a stable catalog track, beyond the range used for libraries
+        first = 10_000 + int(hashlib.md5(query.encode('utf-8')).hexdigest(), 16) % 10_000
+        items = [_track(index, seed) for index in range(first, first + limit)]
+        return jsonify({"tracks": {"items": items, "total": limit, "limit": limit, "offset": 0}})
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Spotify Web API stand-in')
+    add_stub_arguments(parser, port=8082)
+    parser.add_argument('--users', type=int, default=None, help='Distinct synthetic users (default: one per login)')
+    parser.add_argument('--features-status', type=int, default=200, help='Use 403 to mimic a Spotify Free account')
+    args = parser.parse_args()
+    faults, cassette = hooks_from_args(args)
+    app = install_stub_hooks(create_spotify_stub(args.seed or 0, args.features_status, args.users), faults, cassette)
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -147,3 +147,1172 @@ def test_accept_friend_request(client):
 
 
 
+
+
+# Test: Batched genre classification maps results by track ID and retries malformed entries individually
+def test_classify_genres_batch_falls_back_for_malformed_entries(monkeypatch):
+    from app.utils.chatgpt import ChatGPT
+
+    gpt = ChatGPT()
+    batch_replies = []
+
+    # Step 1: Stub the batched request to return one valid and one malformed entry
+    def fake_post_chat_json(messages, temperature, method=None):
+        batch_replies.append(messages)
+        return {"t1": "Indie Pop", "t2": ""}
+
+    monkeypatch.setattr(gpt, '_post_chat_json', fake_post_chat_json)
+    monkeypatch.setattr(gpt, 'classify_genre', lambda name, artist, album: f"Single:{name}")
+
+    # Step 2: Classify two tracks in one chunk
+    genres = gpt.classify_genres_batch({
+        "t1": ("Song One", "Artist A", "Album A"),
+        "t2": ("Song Two", "Artist B", "Album B"),
+    })
+
+    # Step 3: Only the malformed entry should hit the per-track fallback
+    assert len(batch_replies) == 1
+    assert genres == {"t1": "Indie Pop", "t2": "Single:Song Two"}
+
+
+# Test: A batched request that fails outright leaves its chunk unlabelled without per-track calls
+def test_failed_batch_chunk_skips_single_track_fallback(monkeypatch):
+    from app.utils.chatgpt import ChatGPT
+
+    gpt = ChatGPT()
+    single_calls = []
+
+    # Step 1: Every batched request fails; the reply to the second genre chunk parses but is malformed
+    replies = iter([None, {"t3": ""}])
+    monkeypatch.setattr(gpt, '_post_chat_json', lambda messages, temperature, method=None: next(replies, None))
+    monkeypatch.setattr(gpt, 'classify_genre',
+                        lambda name, artist, album: single_calls.append(name) or f"Single:{name}")
+    monkeypatch.setattr(gpt, 'analyze_mood', lambda details: single_calls.append(details['name']) or "Happy")
+
+    # Step 2: Classify two chunks of genres, then one chunk of moods
+    genres = gpt.classify_genres_batch({
+        "t1": ("One", "A", "Album"),
+        "t2": ("Two", "B", "Album"),
+        "t3": ("Three", "C", "Album"),
+    }, chunk_size=2)
+    moods = gpt.analyze_moods_batch({"t1": {"name": "One"}, "t2": {"name": "Two"}})
+
+    # Step 3: Only the malformed entry of a parsed reply was retried on its own
+    assert genres == {"t1": None, "t2": None, "t3": "Single:Three"}
+    assert moods == {"t1": None, "t2": None}
+    assert single_calls == ["Three"]
+
+
+# Test: Batched mood labelling only accepts the fixed mood set
+def test_analyze_moods_batch_validates_labels(monkeypatch):
+    from app.utils.chatgpt import ChatGPT
+
+    gpt = ChatGPT()
+
+    # Step 1: Stub the batched reply with one valid, one lower-case and one off-list label
+    monkeypatch.setattr(gpt, '_post_chat_json',
+                        lambda messages, temperature, method=None: {"t1": "Happy", "t2": "chill.", "t3": "Nostalgic"})
+    monkeypatch.setattr(gpt, 'analyze_mood', lambda details: "Melancholy")
+
+    # Step 2: Label three tracks
+    moods = gpt.analyze_moods_batch({
+        "t1": {"name": "One", "artist": "A", "valence": 0.9, "energy": 0.8},
+        "t2": {"name": "Two", "artist": "B", "valence": 0.5, "energy": 0.2},
+        "t3": {"name": "Three", "artist": "C", "valence": 0.1, "energy": 0.3},
+    })
+
+    # Step 3: Labels are normalised, and an invalid fallback leaves the mood empty
+    assert moods == {"t1": "Happy", "t2": "Chill", "t3": None}
+
+
+# Test: Combined insights keep valid fields and ask individually only for missing or invalid ones
+def test_infer_user_insights_falls_back_per_field(monkeypatch):
+    from app.utils.chatgpt import ChatGPT
+
+    gpt = ChatGPT()
+    individual_calls = []
+
+    # Step 1: Stub a combined reply with a lower-case MBTI, an off-list mood, a long summary
+    # and no time ranges
+    monkeypatch.setattr(gpt, '_post_chat_json', lambda messages, temperature, method=None: {
+        "mood_summary": "A reflective late-night listener.",
+        "recommendations": {"chill": [{"name": "Rec", "artist": "Rec Artist"}, {"name": ""}],
+                            "Nostalgic": [{"name": "Old", "artist": "Band"}]},
+        "mbti_type": "infp",
+        "mbti_summary": "Far too many words for a short summary",
+    })
+    monkeypatch.setattr(gpt, 'infer_mbti_summary',
+                        lambda tracks: individual_calls.append('mbti_summary') or "Dreamy night owl")
+    monkeypatch.setattr(gpt, 'infer_mood_time_ranges',
+                        lambda tracks: individual_calls.append('mood_time_ranges') or {"Chill": "Night"})
+    monkeypatch.setattr(gpt, 'analyze_user_tracks', lambda tracks: individual_calls.append('mood_summary'))
+
+    # Step 2: Ask for every insight at once
+    insights = gpt.infer_user_insights([{"name": "Song", "artist": "A", "mood": "Chill"}])
+
+    # Step 3: Valid fields are normalised, and only the two bad ones were asked for individually
+    assert individual_calls == ['mbti_summary', 'mood_time_ranges']
+    assert insights == {
+        "mood_summary": "A reflective late-night listener.",
+        "recommendations": {"Chill": [{"name": "Rec", "artist": "Rec Artist"}]},
+        "mbti_type": "INFP",
+        "mbti_summary": "Dreamy night owl",
+        "mood_time_ranges": {"Chill": "Night"},
+    }
+
+
+# Test: Identical deterministic GPT requests are answered from the response cache, across processes
+def test_gpt_response_cache_tiers_and_eviction(client):
+    from app.models import GPTResponse
+    from app.utils.chatgpt import ChatGPT
+
+    class FakeOpenAIHTTP:
+        def __init__(self, reply=None):
+            self.posts = []
+            self.reply = reply
+
+        def post(self, url, headers=None, json=None):
+            self.posts.append(json)
+            content = self.reply or f"Reply {len(self.posts)}"
+            return type('Response', (), {'ok': True, 'status_code': 200, 'text': content,
+                                         'json': lambda self: {'choices': [{'message': {'content': content}}]}})()
+
+    app = client.application
+    app.config['GPT_CACHE_MAX_ROWS'] = 2
+    with app.app_context():
+        from app import db
+
+        # Step 1: The second identical genre request is a memory hit
+        gpt = ChatGPT(app)
+        gpt.http = FakeOpenAIHTTP()
+        assert gpt.classify_genre('Song', 'Artist', 'Album') == 'Reply 1'
+        assert gpt.classify_genre('Song', 'Artist', 'Album') == 'Reply 1'
+        assert len(gpt.http.posts) == 1
+
+        # Step 2: Creative and high-temperature methods are not cached unless opted in
+        assert gpt.infer_mbti_summary([{'name': 'Song'}]) != gpt.infer_mbti_summary([{'name': 'Song'}])
+        assert not gpt.response_cache.enabled_for('analyze_mood')
+
+        # Step 3: Cached replies are written on the next commit, and a fresh process reads them back
+        db.session.commit()
+        fresh = ChatGPT(app)
+        fresh.http = FakeOpenAIHTTP()
+        assert fresh.classify_genre('Song', 'Artist', 'Album') == 'Reply 1'
+        assert fresh.http.posts == []
+        assert fresh.response_cache.get_stats()['db_hits'] == 1
+
+        # Step 4: Beyond GPT_CACHE_MAX_ROWS the oldest rows are evicted
+        fresh.classify_genre('Other', 'Artist', 'Album')
+        fresh.classify_genre('Third', 'Artist', 'Album')
+        db.session.commit()
+        assert GPTResponse.query.count() == 2
+        stats = fresh.response_cache.get_stats()
+        assert (stats['evictions'], stats['by_method']['classify_genre']['writes']) == (1, 2)
+
+        # Step 5: A stored reply that fails to parse is forgotten, and the retry goes back to OpenAI
+        messages = [{'role': 'user', 'content': 'labels'}]
+        key = fresh.response_cache.make_key('classify_genres_batch', fresh.model, messages, 0.3)
+        fresh.response_cache.set(key, 'classify_genres_batch', fresh.model, 'not json')
+        db.session.commit()
+        retry = ChatGPT(app)
+        retry.http = FakeOpenAIHTTP(reply='{"t1": "Pop"}')
+        assert retry._post_chat_json(messages, temperature=0.3, method='classify_genres_batch') == {'t1': 'Pop'}
+        assert len(retry.http.posts) == 1
+
+        # Step 6: More clients add no commit listeners, and counters from many threads all land
+        from concurrent.futures import ThreadPoolExecutor
+        listeners = len(db.session().dispatch.before_commit)
+        cache = ChatGPT(app).response_cache
+        ChatGPT(app)
+        assert len(db.session().dispatch.before_commit) == listeners
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: cache._count('classify_genre', 'misses'), range(4000)))
+        assert cache.get_stats()['by_method']['classify_genre']['misses'] == 4000
+
+
+# Test: Insight prompts send each song once in a compact table within the token budget
+def test_prompt_compaction_dedupes_and_respects_budget(monkeypatch):
+    from app.utils.chatgpt import ChatGPT
+    from app.utils.prompt_compaction import compact_tracks
+
+    tracks = [{"name": f"Song {i % 40}", "artist": f"Artist {i % 8}", "album": "Album",
+               "genre": "Pop" if i % 2 else "Rock", "mood": "Happy" if i % 2 else "Sad"} for i in range(120)]
+
+    # Step 1: Duplicates across time ranges collapse into one row with their count
+    text, report = compact_tracks(tracks, aggregate=True)
+    assert (report['unique_tracks'], report['rows_dropped']) == (40, 0)
+    assert 'Song 1|Artist 1|Album|Pop|Happy|3' in text and 'Pop: Happy 60' in text
+    assert report['saved_tokens'] > report['compact_tokens']
+
+    # Step 2: A tight budget drops table rows, not the aggregates
+    small, small_report = compact_tracks(tracks, token_budget=150, aggregate=True)
+    assert small_report['rows_dropped'] > 0 and 'top artists:' in small
+    assert small_report['compact_tokens'] <= 150
+
+    # Step 3: ChatGPT prompts carry the compact table and tally the tokens saved
+    gpt = ChatGPT()
+    prompts = []
+    monkeypatch.setattr(gpt, '_post_chat_json',
+                        lambda messages, temperature, method=None: prompts.append(messages) or {})
+    monkeypatch.setattr(gpt, 'analyze_user_tracks', lambda t: None)
+    monkeypatch.setattr(gpt, 'recommend_tracks_by_mood', lambda t: {})
+    monkeypatch.setattr(gpt, 'infer_mbti_type', lambda t: 'INTJ')
+    monkeypatch.setattr(gpt, 'infer_mbti_summary', lambda t: 'Quiet')
+    monkeypatch.setattr(gpt, 'infer_mood_time_ranges', lambda t: {})
+    gpt.infer_user_insights(tracks)
+    assert "'name'" not in prompts[0][1]['content'] and 'name|artist|album|genre|mood' in prompts[0][1]['content']
+    stats = gpt.get_prompt_stats()
+    assert stats['calls'] == 1 and stats['saved_tokens'] > 0
+
+
+# Test: Classification requests from concurrent callers are coalesced into shared batches
+def test_micro_batcher_coalesces_concurrent_requests():
+    import time
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.utils.gpt_batcher import MicroBatcher
+
+    batches = []
+
+    def classify(items):
+        batches.append(sorted(items))
+        return {key: f"genre-{value}" for key, value in items.items()}
+
+    # Step 1: Six callers asking at once share one request; a key asked twice is classified once
+    batcher = MicroBatcher(classify, window_ms=100, max_batch=50)
+    requests = [{f"t{i}": i, f"t{i + 10}": i + 10, "shared": 99} for i in range(6)]
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(batcher.map, requests))
+    assert results[3] == {"t3": "genre-3", "t13": "genre-13", "shared": "genre-99"}
+    assert len(batches) == 1 and len(batches[0]) == 13
+    stats = batcher.get_stats()
+    assert (stats['coalesced'], stats['batch_sizes']) == (5, {'13': 1})
+
+    # Step 2: A full batch is sent without waiting out the window
+    start = time.monotonic()
+    full = MicroBatcher(classify, window_ms=5000, max_batch=3)
+    assert full.map({"a": 1, "b": 2, "c": 3}) == {"a": "genre-1", "b": "genre-2", "c": "genre-3"}
+    assert time.monotonic() - start < 1
+
+    # Step 3: A failed batch raises in every waiting caller
+    failing = MicroBatcher(lambda items: 1 / 0, window_ms=1)
+    with pytest.raises(ZeroDivisionError):
+        failing.map({"x": 1})
+
+    # Step 4: A batch that never returns leaves its keys unclassified after batch_timeout
+    release = threading.Event()
+    stuck = MicroBatcher(lambda items: release.wait() and {}, window_ms=1, batch_timeout=0.2)
+    start = time.monotonic()
+    assert stuck.map({"x": 1, "y": 2}) == {"x": None, "y": None}
+    assert time.monotonic() - start < 1
+    assert stuck.get_stats()['timed_out'] == 2
+    release.set()
+
+    # Step 5: The wait allows one batch_timeout per round of calls ahead in the queue
+    queued = MicroBatcher(classify, window_ms=0, max_batch=2, max_inflight=2, batch_timeout=10)
+    assert queued.expected_wait(2) == 10
+    assert queued.expected_wait(6) == 20
+
+
+# Minimal stand-ins for SpotifyAPI / ChatGPT used by the ingest tests below
+class FakeSpotify:
+    def __init__(self, items_by_range, artist_genres=None):
+        self.items_by_range = items_by_range
+        self.artist_genres = artist_genres or {}
+        self.feature_calls = []
+        self.search_calls = []
+        self.artist_calls = []
+
+    def get_top_tracks(self, access_token, time_range='medium_term', limit=50):
+        return {'items': self.items_by_range.get(time_range, [])}
+
+    def search_track(self, track_name, artist_name, access_token):
+        return {'name': track_name, 'artist': artist_name, 'id': 'rec-id',
+                'album': {'name': 'Rec Album', 'images': [{'url': 'http://img/rec.jpg'}]}}
+
+    def search_tracks(self, queries, access_token):
+        self.search_calls.extend(queries)
+        return [None if name == 'Unknown Song' else self.search_track(name, artist, access_token)
+                for name, artist in queries]
+
+    def get_artists_genres(self, access_token, artist_ids):
+        self.artist_calls.append(list(artist_ids))
+        return {artist_id: self.artist_genres.get(artist_id, []) for artist_id in artist_ids}
+
+    def get_audio_features(self, access_token, track_ids):
+        self.feature_calls.append(list(track_ids))
+        return {tid: {'id': tid, 'danceability': 0.5, 'energy': 0.9, 'key': 1, 'loudness': -5.0,
+                      'mode': 1, 'speechiness': 0.05, 'acousticness': 0.1, 'instrumentalness': 0.0,
+                      'liveness': 0.1, 'valence': 0.9, 'tempo': 120.0, 'duration_ms': 200000,
+                      'time_signature': 4}
+                for tid in track_ids}
+
+
+class FakeGPT:
+    model = 'fake-model'
+
+    def __init__(self):
+        self.genre_batches = []
+        self.mood_batches = []
+
+    def classify_genres_batch(self, tracks, chunk_size=None):
+        self.genre_batches.append(list(tracks))
+        return {tid: 'Pop' for tid in tracks}
+
+    def analyze_moods_batch(self, tracks, chunk_size=None):
+        self.mood_batches.append(list(tracks))
+        return {tid: 'Happy' for tid in tracks}
+
+    def analyze_user_tracks(self, tracks):
+        self.summary_calls = getattr(self, 'summary_calls', 0) + 1
+        return 'Upbeat listener'
+
+    def recommend_tracks_by_mood(self, tracks):
+        return {'Happy': [{'name': 'Rec', 'artist': 'Rec Artist'}]}
+
+    def infer_mbti_type(self, tracks):
+        return 'ENFP'
+
+    def infer_mbti_summary(self, tracks):
+        return 'Sunny and social'
+
+    def generate_personality_image_url(self, mbti, mood):
+        return 'http://img/portrait.png'
+
+    def infer_mood_time_ranges(self, tracks):
+        return {'Happy': 'Morning (9am–12pm)'}
+
+    def infer_user_insights(self, tracks):
+        self.combined_calls = getattr(self, 'combined_calls', 0) + 1
+        return {
+            'mood_summary': self.analyze_user_tracks(tracks),
+            'recommendations': self.recommend_tracks_by_mood(tracks),
+            'mbti_type': self.infer_mbti_type(tracks),
+            'mbti_summary': self.infer_mbti_summary(tracks),
+            'mood_time_ranges': self.infer_mood_time_ranges(tracks),
+        }
+
+
+def make_track_item(track_id):
+    return {
+        'id': track_id,
+        'name': f'Song {track_id}',
+        'popularity': 50,
+        'artists': [{'id': f'artist-{track_id}', 'name': f'Artist {track_id}'}],
+        'album': {'name': f'Album {track_id}', 'images': [{'url': f'http://img/{track_id}.jpg'}]},
+    }
+
+
+# Test: Ingest enriches each unique track once and fans the labels out to every time range,
+# both when the network stages run one after another and in parallel
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_ingest_enriches_unique_tracks_once(client, concurrent):
+    from app.models import User, Track, AudioFeatures
+    from app.services.spotify_ingest import fetch_and_store_user_data
+
+    # Step 1: Create a Spotify-connected user
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot',
+                            access_token='token'))
+        db.session.commit()
+
+        # Step 2: Run ingest against fakes where track 'a' appears in every time range
+        spotify = FakeSpotify({
+            'short_term': [make_track_item('a'), make_track_item('b')],
+            'medium_term': [make_track_item('a'), make_track_item('c')],
+            'long_term': [make_track_item('a'), make_track_item('d')],
+        })
+        gpt = FakeGPT()
+        mood_counts = fetch_and_store_user_data('spotify-user', spotify, gpt, concurrent=concurrent)
+
+        # Step 3: One audio-features request and one GPT genre batch for the 4 unique tracks;
+        # their clearly happy features are labelled locally without a GPT mood batch
+        assert len(spotify.feature_calls) == 1
+        assert sorted(spotify.feature_calls[0]) == ['a', 'b', 'c', 'd']
+        assert [sorted(batch) for batch in gpt.genre_batches] == [['a', 'b', 'c', 'd']]
+        assert gpt.mood_batches == []
+
+        # Step 4: Every per-range row is stored with its labels
+        assert mood_counts == {'Happy': 6}
+        assert Track.query.filter_by(user_id='spotify-user', genre='Pop').count() == 6
+        assert AudioFeatures.query.count() == 4
+
+
+# Test: Re-running ingest upserts existing tracks in place and keeps their stored labels
+def test_ingest_upserts_existing_tracks(client):
+    from app.models import User, Track
+    from app.services.spotify_ingest import fetch_and_store_user_data
+
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot',
+                            access_token='token'))
+        db.session.commit()
+
+        # Step 1: First ingest stores two tracks
+        fetch_and_store_user_data('spotify-user', FakeSpotify({'short_term': [make_track_item('a'),
+                                                                              make_track_item('b')]}), FakeGPT())
+
+        # Step 2: Second ingest returns the same tracks in reverse order
+        gpt = FakeGPT()
+        fetch_and_store_user_data('spotify-user', FakeSpotify({'short_term': [make_track_item('b'),
+                                                                              make_track_item('a')]}), gpt)
+
+        # Step 3: No duplicate rows, ranks updated, and GPT not asked again
+        assert Track.query.filter_by(user_id='spotify-user').count() == 2
+        assert db.session.get(Track, ('b', 'spotify-user', 'short_term')).rank == 1
+        assert gpt.genre_batches == [] and gpt.mood_batches == []
+
+
+# Test: A classification batch that times out leaves the range incomplete instead of failing ingest
+def test_ingest_finishes_when_a_classification_batch_times_out(client):
+    import threading
+    from app.models import User, Track
+    from app.services.spotify_ingest import fetch_and_store_user_data
+    from app.utils.gpt_batcher import MicroBatcher
+
+    release = threading.Event()
+
+    class StuckGPT(FakeGPT):
+        genre_batcher = MicroBatcher(lambda items: release.wait() and {}, window_ms=1, batch_timeout=0.2)
+
+        def classify_genres_batch(self, tracks, chunk_size=None):
+            self.genre_batches.append(list(tracks))
+            return self.genre_batcher.map(tracks)
+
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot', access_token='token'))
+        db.session.commit()
+        items = {'short_term': [make_track_item('a'), make_track_item('b')]}
+
+        # Step 1: The genre batch never returns, but ingest still stores the tracks without genres
+        fetch_and_store_user_data('spotify-user', FakeSpotify(items), StuckGPT())
+        assert Track.query.filter_by(user_id='spotify-user', genre=None).count() == 2
+        release.set()
+
+        # Step 2: The incomplete range is classified again on the next ingest
+        gpt = FakeGPT()
+        fetch_and_store_user_data('spotify-user', FakeSpotify(items), gpt)
+        assert [sorted(batch) for batch in gpt.genre_batches] == [['a', 'b']]
+        assert Track.query.filter_by(user_id='spotify-user', genre='Pop').count() == 2
+
+
+# Test: A second user with the same songs is served from the annotation catalog, not GPT
+def test_ingest_reuses_catalog_annotations_across_users(client):
+    from app.models import User, Track, TrackAnnotation
+    from app.services.spotify_ingest import fetch_and_store_user_data
+
+    with client.application.app_context():
+        from app import db
+        db.session.add_all([
+            User(id='user-a', email='a@example.com', first_name='A', access_token='token'),
+            User(id='user-b', email='b@example.com', first_name='B', access_token='token'),
+        ])
+        db.session.commit()
+        items = {'short_term': [make_track_item('hit-1'), make_track_item('hit-2')]}
+
+        # Step 1: The first user's ingest classifies the songs with GPT and fills the catalog
+        fetch_and_store_user_data('user-a', FakeSpotify(items), FakeGPT())
+        assert TrackAnnotation.query.count() == 2
+
+        # Step 2: The second user's ingest should not call GPT at all
+        gpt = FakeGPT()
+        fetch_and_store_user_data('user-b', FakeSpotify(items), gpt)
+
+        # Step 3: Labels come from the catalog
+        assert gpt.genre_batches == [] and gpt.mood_batches == []
+        assert Track.query.filter_by(user_id='user-b', genre='Pop', mood='Happy').count() == 2
+
+
+# Test: A queued ingest job is run by the worker and its insights reach the visualise page
+def test_ingest_job_runs_in_worker_and_reports_status(client):
+    from app.models import User, IngestJob
+    from app.services.ingest_jobs import enqueue_ingest, run_worker
+
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot',
+                            access_token='token'))
+        db.session.commit()
+
+        # Step 1: Queue a job the way /callback does
+        job_id = enqueue_ingest('spotify-user')[0].id
+
+    with client.session_transaction() as session:
+        session['user_id'] = 'spotify-user'
+        session['ingest_job_id'] = job_id
+
+    # Step 2: The status endpoint reports the job as queued
+    assert client.get(f'/api/ingest-status/{job_id}').get_json()['status'] == 'queued'
+
+    # Step 3: Drain the queue with the worker
+    spotify = FakeSpotify({'short_term': [make_track_item('a')]})
+    run_worker(client.application, spotify, FakeGPT(), once=True)
+
+    with client.application.app_context():
+        assert db.session.get(IngestJob, job_id).status == 'done'
+    assert client.get(f'/api/ingest-status/{job_id}').get_json()['finished'] is True
+
+    # Step 4: Visualise copies the finished job's insights into the session
+    response = client.get('/visualise')
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        assert 'ingest_job_id' not in session
+        assert session['mbti_type'] == 'ENFP'
+        assert session['mood_counts'] == {'Happy': 1}
+
+
+# Test: A second ingest request for the same user attaches to the in-flight job
+def test_enqueue_ingest_is_single_flight_per_user(client):
+    from app.models import User, IngestJob
+    from app.services.ingest_jobs import enqueue_ingest
+    from app.services.single_flight import single_flight_lock, LockTimeout
+
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot',
+                            access_token='token'))
+        db.session.commit()
+
+        # Step 1: Two logins in a row produce one job
+        first, first_attached = enqueue_ingest('spotify-user')
+        second, second_attached = enqueue_ingest('spotify-user', run_inline=True)
+        assert (first_attached, second_attached) == (False, True)
+        assert first.id == second.id
+        assert IngestJob.query.count() == 1
+
+        # Step 2: While the user's lock is held, another caller cannot take it
+        with single_flight_lock('ingest:spotify-user'):
+            with pytest.raises(LockTimeout):
+                with single_flight_lock('ingest:spotify-user', wait=0):
+                    pass
+
+        # Step 3: Once the job finishes, the next login starts a fresh one
+        first.status = 'done'
+        db.session.commit()
+        third, third_attached = enqueue_ingest('spotify-user')
+        assert third_attached is False and third.id != first.id
+
+
+# Test: A repeat ingest with unchanged top tracks skips enrichment and reuses stored insights
+def test_repeat_ingest_reuses_unchanged_ranges_and_insights(client):
+    from app.models import User
+    from app.services.insights import generate_user_insights
+    from app.services.freshness import get_fresh_insights
+
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot',
+                            access_token='token'))
+        db.session.commit()
+        items = {'short_term': [make_track_item('a'), make_track_item('b')]}
+
+        # Step 1: First login computes everything
+        first_gpt = FakeGPT()
+        first = generate_user_insights('spotify-user', FakeSpotify(items), first_gpt)
+        assert first_gpt.summary_calls == 1 and first_gpt.combined_calls == 1
+
+        # Step 2: Second login with the same top tracks
+        spotify, gpt = FakeSpotify(items), FakeGPT()
+        second = generate_user_insights('spotify-user', spotify, gpt)
+
+        # Step 3: No audio-feature fetch or GPT call, same insights
+        assert spotify.feature_calls == []
+        assert getattr(gpt, 'combined_calls', 0) == 0
+        assert second['mood_summary'] == first['mood_summary']
+
+        # Step 4: Within the TTL the stored insights are served without any ingest
+        assert get_fresh_insights('spotify-user', ttl_seconds=3600)['mbti_type'] == 'ENFP'
+        assert get_fresh_insights('spotify-user', ttl_seconds=0) is None
+
+
+# Test: Parallel insight calls overlap, chain the portrait after MBTI and drop calls past their timeout
+def test_parallel_insight_calls_run_concurrently_within_deadline(client):
+    import time
+    from app.models import User
+    from app.services.insight_orchestrator import run_insight_calls
+    from app.services.insights import generate_user_insights
+
+    def slow(value, seconds=0.2):
+        def call():
+            time.sleep(seconds)
+            return value
+        return call
+
+    def fail():
+        raise RuntimeError('boom')
+
+    # Step 1: Four 0.2s calls finish in about max(call), and the portrait receives the MBTI result
+    start = time.monotonic()
+    results, report = run_insight_calls(
+        {'a': slow('A'), 'b': slow('B'), 'c': slow('C'), 'mbti': slow('INTJ')},
+        dependents={'portrait': ('mbti', lambda mbti: f'img-{mbti}')},
+        call_timeout=5, deadline=5
+    )
+    assert time.monotonic() - start < 0.6
+    assert results == {'a': 'A', 'b': 'B', 'c': 'C', 'mbti': 'INTJ', 'portrait': 'img-INTJ'}
+    assert all(entry['status'] == 'ok' and entry['seconds'] >= 0 for entry in report.values())
+
+    # Step 2: A slow call is abandoned at its timeout; a failed dependency skips its dependent
+    start = time.monotonic()
+    results, report = run_insight_calls(
+        {'fast': slow('F', 0.01), 'stuck': slow('S', 2), 'mbti': fail},
+        dependents={'portrait': ('mbti', lambda mbti: 'never')},
+        call_timeout=0.2, deadline=5
+    )
+    assert time.monotonic() - start < 1
+    assert results == {'fast': 'F'}
+    assert {name: entry['status'] for name, entry in report.items()} == {
+        'fast': 'ok', 'stuck': 'timeout', 'mbti': 'error', 'portrait': 'skipped'}
+
+    # Step 3: In parallel mode the insights come from the individual GPT calls
+    client.application.config['INSIGHT_MODE'] = 'parallel'
+    with client.application.app_context():
+        from app import db
+        db.session.add(User(id='spotify-user', email='s@example.com', first_name='Spot', access_token='token'))
+        db.session.commit()
+        gpt = FakeGPT()
+        insights = generate_user_insights('spotify-user', FakeSpotify({'short_term': [make_track_item('a')]}), gpt)
+        assert getattr(gpt, 'combined_calls', 0) == 0 and gpt.summary_calls == 1
+        assert (insights['mbti_type'], insights['personality_image_url']) == ('ENFP', 'http://img/portrait.png')
+        assert insights['recommended_tracks_by_mood']['Happy'][0]['name'] == 'Rec'
+
+
+class SlowGPT(FakeGPT):
+    """FakeGPT whose insight calls sleep first (or only the portrait, with portrait_only)."""
+
+    def __init__(self, seconds, portrait_only=False):
+        super().__init__()
+        self.seconds = seconds
+        self.portrait_only = portrait_only
+        self.portraits = []
+
+    def _wait(self, portrait=False):
+        import time
+        if portrait or not self.portrait_only:
+            time.sleep(self.seconds)
+
+    def analyze_user_tracks(self, tracks):
+        self._wait()
+        return super().analyze_user_tracks(tracks)
+
+    def recommend_tracks_by_mood(self, tracks):
+        self._wait()
+        return super().recommend_tracks_by_mood(tracks)
+
+    def infer_mbti_type(self, tracks):
+        self._wait()
+        return super().infer_mbti_type(tracks)
+
+    def infer_mbti_summary(self, tracks):
+        self._wait()
+        return super().infer_mbti_summary(tracks)
+
+    def infer_mood_time_ranges(self, tracks):
+        self._wait()
+        return super().infer_mood_time_ranges(tracks)
+
+    def generate_personality_image_url(self, mbti, mood):
+        self.portraits.append(mbti)
+        self._wait(portrait=True)
+        return super().generate_personality_image_url(mbti, mood)
+
+
+# Test: Parallel insight calls that all time out fall back to the sequential defaults,
+# and a timed-out portrait is not requested a second time
+def test_parallel_insights_fall_back_when_calls_time_out(client):
+    import time
+    from app.models import User
+    from app.services.insights import generate_user_insights
+
+    app = client.application
+    app.config.update(INSIGHT_MODE='parallel', INSIGHT_CALL_TIMEOUT=0.1, INSIGHT_DEADLINE=5)
+    with app.app_context():
+        from app import db
+        for user_id in ('slow-all', 'slow-portrait'):
+            db.session.add(User(id=user_id, email=f'{user_id}@example.com', first_name='Slow', access_token='token'))
+        db.session.commit()
+
+        # Step 1: Every call times out; the job still completes with each method's own fallback
+        gpt = SlowGPT(0.4)
+        insights = generate_user_insights('slow-all', FakeSpotify({'short_term': [make_track_item('a')]}), gpt)
+        assert insights['mood_summary'] is None and insights['recommended_tracks_by_mood'] == {}
+        assert (insights['mbti_type'], insights['mbti_summary']) == ('INTJ', 'Calm and introspective listener')
+        assert insights['mood_time_ranges'] == {}
+
+        # Step 2: The portrait was skipped with the MBTI call, so it is made once for the fallback type
+        assert gpt.portraits == ['INTJ'] and insights['personality_image_url'] == 'http://img/portrait.png'
+
+        # Step 3: When only the portrait times out it is left empty, not requested again
+        gpt = SlowGPT(0.4, portrait_only=True)
+        insights = generate_user_insights('slow-portrait', FakeSpotify({'short_term': [make_track_item('b')]}), gpt)
+        time.sleep(0.5)
+        assert insights['mbti_type'] == 'ENFP' and insights['personality_image_url'] is None
+        assert gpt.portraits == ['ENFP']
+
+
+# Test: The Batch API backfill fills missing genres/moods end to end against the local stub, resuming between steps
+def test_gpt_batch_backfill_against_stub(client, tmp_path):
+    import json
+    from app.models import Track, AudioFeatures, TrackAnnotation
+    from stubs.common import serve_in_thread
+    from stubs.openai_stub import create_openai_stub
+
+    server, base_url = serve_in_thread(create_openai_stub(polls_until_done=1))
+    app = client.application
+    app.config['OPENAI_API_BASE'] = f"{base_url}/v1"
+    runner = app.test_cli_runner()
+    workdir = str(tmp_path / 'job')
+
+    try:
+        # Step 1: Two users share an unlabelled track; one track's genre is already in the catalog
+        with app.app_context():
+            from app import db
+            for user_id in ('u1', 'u2'):
+                db.session.add(Track(id='t1', user_id=user_id, time_range='short_term', name='One', artist='A'))
+            db.session.add(Track(id='t2', user_id='u1', time_range='short_term', name='Two', artist='B',
+                                 mood='Unavailable'))
+            db.session.add(Track(id='t3', user_id='u1', time_range='long_term', name='Three', artist='C',
+                                 genre='Jazz', mood='Chill'))
+            db.session.add(AudioFeatures(id='t1', valence=0.9, energy=0.8))
+            db.session.add(TrackAnnotation(id='t2', genre='Indie', model='earlier'))
+            db.session.commit()
+
+        # Step 2: prepare serves t2's genre from the catalog and writes Batch API lines for the rest
+        result = runner.invoke(args=['gpt-batch', '--dir', workdir, 'prepare', '--chunk-size', '1'])
+        assert result.exit_code == 0, result.output
+        lines = [json.loads(line) for line in open(tmp_path / 'job' / 'requests.jsonl')]
+        assert [line['custom_id'] for line in lines] == ['genre-00000', 'mood-00000', 'mood-00001']
+        assert lines[0]['url'] == '/v1/chat/completions' and lines[0]['body']['model'] == app.config['OPENAI_MODEL']
+
+        # Step 3: submit, then a first poll finds the batch still running
+        assert runner.invoke(args=['gpt-batch', '--dir', workdir, 'submit']).exit_code == 0
+        result = runner.invoke(args=['gpt-batch', '--dir', workdir, 'poll'])
+        assert 'in_progress' in result.output
+
+        # Step 4: run resumes the job without resubmitting, then applies the results
+        result = runner.invoke(args=['gpt-batch', '--dir', workdir, 'run', '--interval', '0'])
+        assert result.exit_code == 0, result.output
+        assert 'Applied 1 genres and 2 moods' in result.output
+        with app.app_context():
+            rows = {(t.id, t.user_id): (t.genre, t.mood) for t in Track.query}
+            assert rows[('t1', 'u1')] == rows[('t1', 'u2')] and rows[('t1', 'u1')][1] == 'Happy'
+            assert rows[('t2', 'u1')][0] == 'Indie' and rows[('t2', 'u1')][1] != 'Unavailable'
+            assert rows[('t3', 'u1')] == ('Jazz', 'Chill')
+            assert db.session.get(TrackAnnotation, 't1').genre == rows[('t1', 'u1')][0]
+
+        # Step 5: Nothing is left for the next run
+        result = runner.invoke(args=['gpt-batch', '--dir', workdir, 'run', '--interval', '0'])
+        assert result.exit_code == 0 and 'Batch job is applied' in result.output
+        assert open(tmp_path / 'job' / 'requests.jsonl').read() == ''
+    finally:
+        server.shutdown()
+
+
+# Test: A submit interrupted after the batch was created adopts that batch instead of creating another
+def test_gpt_batch_submit_resumes_without_a_second_batch(client, tmp_path, monkeypatch):
+    import requests
+    from app.models import Track
+    from app.services import gpt_batch
+    from app.utils.chatgpt import ChatGPT
+    from stubs.common import serve_in_thread
+    from stubs.openai_stub import create_openai_stub
+
+    server, base_url = serve_in_thread(create_openai_stub())
+    app = client.application
+    app.config['OPENAI_API_BASE'] = f"{base_url}/v1"
+    workdir = str(tmp_path / 'job')
+
+    try:
+        with app.app_context():
+            from app import db
+            db.session.add(Track(id='t1', user_id='u1', time_range='short_term', name='One', artist='A'))
+            db.session.commit()
+            gpt = ChatGPT(app)
+            gpt_batch.prepare_batch(workdir, gpt)
+
+            # Step 1: The process dies right after POST /batches, before the batch ID is saved
+            save_manifest = gpt_batch.save_manifest
+
+            def crash_once_submitted(workdir, manifest):
+                if manifest['state'] == 'submitted':
+                    raise KeyboardInterrupt
+                save_manifest(workdir, manifest)
+
+            monkeypatch.setattr(gpt_batch, 'save_manifest', crash_once_submitted)
+            with pytest.raises(KeyboardInterrupt):
+                gpt_batch.submit_batch(workdir, gpt)
+            monkeypatch.setattr(gpt_batch, 'save_manifest', save_manifest)
+            assert gpt_batch.load_manifest(workdir)['state'] == 'submitting'
+
+            # Step 2: Submitting again finds that batch by its input file
+            manifest = gpt_batch.submit_batch(workdir, gpt)
+            batches = requests.get(f"{base_url}/v1/batches", timeout=5).json()['data']
+            assert len(batches) == 1
+            assert (manifest['state'], manifest['batch_id']) == ('submitted', batches[0]['id'])
+    finally:
+        server.shutdown()
+
+
+# Test: gpt-batch falls back to GPT_BATCH_DIR without --dir, and fails cleanly when neither is set
+def test_gpt_batch_uses_configured_dir(client, tmp_path):
+    from config import Config
+
+    app = client.application
+    runner = app.test_cli_runner()
+
+    # Step 1: The default config names a job directory
+    assert Config.GPT_BATCH_DIR
+
+    # Step 2: prepare without --dir writes its job into GPT_BATCH_DIR
+    app.config['GPT_BATCH_DIR'] = str(tmp_path / 'default-job')
+    result = runner.invoke(args=['gpt-batch', 'prepare'])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / 'default-job' / 'manifest.json').exists()
+
+    # Step 3: With no directory at all the command reports an error instead of crashing
+    app.config['GPT_BATCH_DIR'] = ''
+    result = runner.invoke(args=['gpt-batch', 'prepare'])
+    assert result.exit_code != 0 and 'No job directory' in result.output
+
+
+def login_through_stubs(monkeypatch, database, spotify_url, openai_url):
+    """Build an app wired to the stub servers and complete a Spotify login with it."""
+    from config import TestingConfig
+    from app.models import Track
+
+    # A file database, as in a deployment: GPT worker threads use their own connections
+    for key, value in {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{database}",
+                       'AUTH_URL': f"{spotify_url}/authorize", 'TOKEN_URL': f"{spotify_url}/api/token",
+                       'API_BASE_URL': f"{spotify_url}/v1/", 'OPENAI_API_URL': f"{openai_url}/v1/chat/completions",
+                       'OPENAI_IMAGES_URL': f"{openai_url}/v1/images/generations",
+                       'INGEST_BACKGROUND': False, 'SPOTIFY_RATE_LIMIT_BACKOFF': 0.01}.items():
+        monkeypatch.setattr(TestingConfig, key, value)
+    app = create_app('testing')
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        with client.session_transaction() as session:
+            session['state'] = 'login-state'
+        response = client.get('/callback?code=stub-code-0&state=login-state')
+        with app.app_context():
+            tracks = sorted((t.id, t.time_range, t.genre, t.mood) for t in Track.query)
+        with client.session_transaction() as session:
+            return response, tracks, dict(session)
+
+
+# Test: A full login runs against the Spotify/OpenAI stubs with injected 429s, is recorded,
+# and replays identically with the upstream stub gone
+def test_login_against_stubs_with_faults_and_replay(monkeypatch, tmp_path):
+    import requests
+    from stubs.common import Cassette, FaultInjector, install_stub_hooks, serve_in_thread
+    from stubs.openai_stub import create_openai_stub
+    from stubs.spotify_stub import create_spotify_stub
+
+    cassette = str(tmp_path / 'spotify.jsonl')
+    upstream, upstream_url = serve_in_thread(create_spotify_stub(seed=1))
+    openai, openai_url = serve_in_thread(install_stub_hooks(create_openai_stub()))
+    faults = FaultInjector(rate_limit_rate=0.25, retry_after=0, seed=3, paths=('/v1/',))
+    recorder, recorder_url = serve_in_thread(install_stub_hooks(
+        create_spotify_stub(), faults, Cassette(cassette, 'record', upstream_url)))
+
+    try:
+        # Step 1: The stub's authorize endpoint sends the browser back with a code
+        location = requests.get(f"{recorder_url}/authorize", allow_redirects=False,
+                                params={'redirect_uri': 'http://localhost/callback', 'state': 's'}).headers['Location']
+        assert location == 'http://localhost/callback?code=stub-code-0&state=s'
+
+        # Step 2: Login through the recording stub; throttled Web API calls are retried
+        response, tracks, session = login_through_stubs(monkeypatch, tmp_path / 'record.db', recorder_url, openai_url)
+        assert response.status_code == 302 and session['user_id'] == 'stubuser0'
+        assert len(tracks) == 150 and all(genre and mood for _, _, genre, mood in tracks)
+        assert session['mbti_type'] in ('INFP', 'ENFP', 'INTJ', 'ISFJ')
+        stats = requests.get(f"{recorder_url}/_stub/stats").json()
+        assert stats['injected 429'] >= 1 and stats['recorded'] >= 6
+        assert requests.get(f"{openai_url}/_stub/stats").json()['POST /v1/chat/completions'] >= 1
+    finally:
+        recorder.shutdown()
+        upstream.shutdown()
+
+    # Step 3: Replaying the cassette with no upstream gives the same library
+    replayer, replayer_url = serve_in_thread(install_stub_hooks(
+        create_spotify_stub(seed=99), cassette=Cassette(cassette, 'replay')))
+    try:
+        _, replayed, session = login_through_stubs(monkeypatch, tmp_path / 'replay.db', replayer_url, openai_url)
+        assert replayed == tracks and session['user_id'] == 'stubuser0'
+        stats = requests.get(f"{replayer_url}/_stub/stats").json()
+        assert stats['replayed'] >= 6 and 'replay_misses' not in stats
+    finally:
+        replayer.shutdown()
+        openai.shutdown()
+
+
+# Test: The pooled HTTP client gives each thread its own Session on one shared connection pool
+def test_pooled_http_client_shares_adapter_across_threads():
+    import threading
+    from app.utils.http import client_from_config
+
+    # Step 1: Build a client from config, with a per-client override
+    client = client_from_config({'HTTP_POOL_SIZE': 4, 'SPOTIFY_HTTP_READ_TIMEOUT': 7}, 'SPOTIFY')
+    assert client.timeout == (3.05, 7)
+
+    # Step 2: Collect the Session seen by two different threads
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(client.session)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Step 3: Separate Sessions, same mounted adapter
+    assert sessions[0] is not sessions[1]
+    assert sessions[0].get_adapter('https://api.spotify.com') is client.adapter
+    assert sessions[1].get_adapter('https://api.spotify.com') is client.adapter
+
+
+# Test: OpenAI POSTs are not retried by the connection pool, only by the explicit retry loop
+def test_openai_posts_are_not_retried_by_the_adapter(client):
+    import requests
+    from app.utils.chatgpt import ChatGPT
+    from stubs.common import FaultInjector, install_stub_hooks, serve_in_thread
+    from stubs.openai_stub import create_openai_stub
+
+    server, base_url = serve_in_thread(install_stub_hooks(create_openai_stub(), FaultInjector(error_rate=1.0)))
+    app = client.application
+    app.config.update(OPENAI_API_URL=f"{base_url}/v1/chat/completions",
+                      OPENAI_IMAGES_URL=f"{base_url}/v1/images/generations", OPENAI_BATCH_RETRIES=1)
+    try:
+        with app.app_context():
+            gpt = ChatGPT(app)
+
+            # Step 1: A 503 on image generation is not re-sent
+            assert gpt.generate_personality_image_url('INFP', 'Chill') is None
+
+            # Step 2: A failing JSON completion is sent once per explicit attempt
+            assert gpt._post_chat_json([{'role': 'user', 'content': 'hi'}], temperature=0.3) is None
+
+        stats = requests.get(f"{base_url}/_stub/stats").json()
+        assert stats['POST /v1/images/generations'] == 1
+        assert stats['POST /v1/chat/completions'] == 2
+    finally:
+        server.shutdown()
+
+
+# Test: The async Spotify client fans searches out concurrently, capped and in order
+def test_async_spotify_search_tracks_concurrent_and_ordered():
+    import asyncio
+    import httpx
+    from app.utils.spotify_async import AsyncSpotifyAPI
+
+    in_flight = {'now': 0, 'max': 0}
+
+    # Step 1: Fake Spotify search endpoint that takes a little while to answer
+    async def handler(request):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.01)
+        in_flight['now'] -= 1
+        name = request.url.params['q'].split('track:')[1].split(' artist:')[0]
+        items = [] if name == 'missing' else [{
+            'id': f'id-{name}', 'name': name, 'artists': [{'name': 'Artist'}],
+            'album': {'name': 'Album', 'images': [{'url': f'http://img/{name}.jpg'}]}
+        }]
+        return httpx.Response(200, json={'tracks': {'items': items}})
+
+    aio = AsyncSpotifyAPI(max_concurrency=4, transport=httpx.MockTransport(handler))
+
+    # Step 2: Search twelve recommendations through the sync bridge
+    queries = [(f'song{i}', 'Artist') for i in range(11)] + [('missing', 'Nobody')]
+    results = aio.run_sync(aio.search_tracks(queries, 'token'))
+
+    # Step 3: Results line up with the queries and the cap was respected
+    assert [r['name'] for r in results[:11]] == [f'song{i}' for i in range(11)]
+    assert results[11] is None
+    assert 1 < in_flight['max'] <= 4
+
+
+# Test: A 429 pauses the shared bucket for Retry-After, is retried, and is counted
+def test_rate_limit_governor_honours_retry_after(tmp_path):
+    from types import SimpleNamespace
+    from app.utils.rate_limit import RateLimitGovernor
+
+    # Step 1: Two governors (two "processes") sharing one SQLite bucket
+    store = str(tmp_path / 'spotify-bucket.db')
+    first = RateLimitGovernor(rate=100, burst=5, max_retries=1, backoff_base=0.01, store_path=store)
+    second = RateLimitGovernor(rate=100, burst=5, max_retries=1, backoff_base=0.01, store_path=store)
+
+    # Step 2: The first call is throttled once, then succeeds
+    replies = iter([SimpleNamespace(status_code=429, headers={'Retry-After': '0.2'}),
+                    SimpleNamespace(status_code=200, headers={})])
+    assert first.send(lambda: next(replies)).status_code == 200
+    assert first.get_stats()['throttled'] == 1
+    assert first.get_stats()['retried'] == 1
+
+    # Step 3: A pause taken by one process holds back the other
+    first.bucket.pause(5)
+    assert second.bucket.reserve() > 4
+
+    # Step 4: A call still throttled after its retries is returned and counted as dropped
+    no_retry = RateLimitGovernor(max_retries=0)
+    always_429 = SimpleNamespace(status_code=429, headers={'Retry-After': '1'})
+    assert no_retry.send(lambda: always_429).status_code == 429
+    assert no_retry.get_stats()['dropped'] == 1
+
+
+# Test: Recommendation searches are cached in the database, including misses
+def test_search_cache_reuses_hits_and_misses(client):
+    from app.services import search_cache
+    from app.services.search_cache import search_tracks_cached
+    from app.models import SearchCache
+
+    with client.application.app_context():
+        search_cache._memory_cache().clear()
+        spotify = FakeSpotify({})
+        queries = [('Song A', 'Artist'), ('Unknown Song', 'Nobody'), ('  song a ', 'ARTIST')]
+
+        # Step 1: First lookup searches each distinct song once and stores both outcomes
+        first = search_tracks_cached(queries, 'token', spotify)
+        assert spotify.search_calls == [('Song A', 'Artist'), ('Unknown Song', 'Nobody')]
+        assert first[0]['album']['images'][0]['url'] == 'http://img/rec.jpg'
+        assert first[1] is None and first[2] == first[0]
+        assert SearchCache.query.filter_by(found=False).count() == 1
+
+        # Step 2: With the in-process LRU emptied, the database answers without searching
+        search_cache._memory_cache().clear()
+        spotify.search_calls.clear()
+        assert search_tracks_cached(queries, 'token', spotify) == first
+        assert spotify.search_calls == []
+
+        # Step 3: A failed request is not cached
+        failing = FakeSpotify({})
+        failing.search_tracks = lambda queries, access_token: [False for _ in queries]
+        assert search_tracks_cached([('New Song', 'Artist')], 'token', failing) == [None]
+        assert db.session.get(SearchCache, 'new song|artist') is None
+
+
+# Test: Genres come from cached Spotify artist genres; GPT only sees artists without any
+def test_ingest_resolves_genres_from_artists(client):
+    from app.models import User, Track, Artist
+    from app.services.spotify_ingest import fetch_and_store_user_data
+
+    with client.application.app_context():
+        db.session.add_all([
+            User(id='user-1', email='one@example.com', first_name='One', access_token='token'),
+            User(id='user-2', email='two@example.com', first_name='Two', access_token='token'),
+        ])
+        db.session.commit()
+
+        # Step 1: Artist of 'a' has micro-genres, artist of 'b' has none on Spotify
+        spotify = FakeSpotify({'short_term': [make_track_item('a'), make_track_item('b')]},
+                              artist_genres={'artist-a': ['melodic drill', 'uk hip hop']})
+        gpt = FakeGPT()
+        fetch_and_store_user_data('user-1', spotify, gpt)
+
+        # Step 2: Artists were fetched in one bulk call and only 'b' went to GPT
+        assert [sorted(ids) for ids in spotify.artist_calls] == [['artist-a', 'artist-b']]
+        assert gpt.genre_batches == [['b']]
+        assert db.session.get(Track, ('a', 'user-1', 'short_term')).genre == 'Hip Hop'
+        assert db.session.get(Artist, 'artist-b').genres == '[]'
+
+        # Step 3: Another user's ingest of a new track by the same artist uses the artist cache
+        spotify = FakeSpotify({'short_term': [dict(make_track_item('c'), artists=[{'id': 'artist-a', 'name': 'A'}])]})
+        gpt = FakeGPT()
+        fetch_and_store_user_data('user-2', spotify, gpt)
+        assert spotify.artist_calls == []
+        assert gpt.genre_batches == []
+        assert db.session.get(Track, ('c', 'user-2', 'short_term')).genre == 'Hip Hop'
+
+
+# Test: The local mood engine labels confident tracks and escalates the rest
+def test_local_mood_engine_escalates_low_confidence_tracks():
+    from app.utils.mood_engine import label_confident_moods
+
+    base = {'danceability': 0.5, 'acousticness': 0.1, 'instrumentalness': 0.0, 'speechiness': 0.05}
+
+    # Step 1: A clearly happy track, a borderline one, one matching no rule and one without features
+    moods, escalate = label_confident_moods({
+        'clear': dict(base, valence=0.95, energy=0.9),
+        'borderline': dict(base, valence=0.71, energy=0.9),
+        'mixed': dict(base, valence=0.5, energy=0.5),
+        'unavailable': {'mood': 'Unavailable'},
+    }, min_confidence=0.1)
+
+    # Step 2: Only the clear case is labelled locally
+    assert moods == {'clear': 'Happy'}
+    assert escalate == ['borderline', 'mixed', 'unavailable']
+
+    # Step 3: Lowering the threshold accepts the borderline track too
+    moods, _ = label_confident_moods({'borderline': dict(base, valence=0.71, energy=0.9)}, min_confidence=0.0)
+    assert moods == {'borderline': 'Happy'}
+
+
+# Test: Matrix mood scoring matches the per-track rules exactly, and the backfill re-scores stale rows
+def test_mood_matrix_matches_rules_and_backfill(client):
+    import numpy as np
+    from app.models import AudioFeatures
+    from app.utils.spotify import SpotifyAPI
+    from app.utils.mood_engine import FEATURE_COLUMNS, classify_mood_matrix
+
+    # Step 1: Random rows plus rows sitting exactly on every threshold
+    rng = np.random.default_rng(7)
+    matrix = rng.random((5000, len(FEATURE_COLUMNS)))
+    matrix[:len(FEATURE_COLUMNS) * 5] = np.repeat([0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8], 5)[:len(FEATURE_COLUMNS) * 5, None]
+
+    # Step 2: Vectorised labels equal the row-by-row labels
+    expected = [SpotifyAPI.analyze_mood_from_features(dict(zip(FEATURE_COLUMNS, row))) for row in matrix]
+    assert classify_mood_matrix(matrix).tolist() == expected
+
+    # Step 3: The backfill fixes stored moods in chunks
+    with client.application.app_context():
+        from app.services.mood_scoring import rescore_audio_features
+        for i, row in enumerate(matrix[:25]):
+            db.session.add(AudioFeatures(id=f't{i:02d}', mood='Stale', **dict(zip(FEATURE_COLUMNS, row))))
+        db.session.commit()
+
+        result = rescore_audio_features(chunk_size=10)
+        assert (result['scanned'], result['changed']) == (25, 25)
+        assert [f.mood for f in AudioFeatures.query.order_by(AudioFeatures.id)] == expected[:25]
+        assert rescore_audio_features(chunk_size=10)['scanned'] == 0
+        assert rescore_audio_features(chunk_size=10, only_stale=False)['changed'] == 0
+
+
+# Test: Mood rules from config get their own version, and rows scored under older rules are re-scored
+def test_configured_mood_rules_version_and_lazy_rescore(client, monkeypatch):
+    from config import TestingConfig
+    from app.models import AudioFeatures
+    from app.services.mood_scoring import refresh_stale_moods, rescore_audio_features
+    from app.utils.mood_engine import DEFAULT_RULE_SET, MoodRuleSet, rule_set_from_config
+
+    # Step 1: Configured rules compile to a new version; unknown features and over-long
+    # versions are rejected, and a bad version stops the app at startup
+    rules = [{"mood": "Happy", "when": [["valence", ">=", 0.5]]},
+             {"mood": "Sad", "when": [["valence", "<", 0.5]]}]
+    custom = rule_set_from_config({'MOOD_RULES': rules})
+    assert custom.version != DEFAULT_RULE_SET.version
+    assert rule_set_from_config({'MOOD_RULES': rules}) is custom
+    with pytest.raises(ValueError):
+        MoodRuleSet([{"mood": "Loud", "when": [["loudness", ">", -5]]}])
+    with pytest.raises(ValueError):
+        rule_set_from_config({'MOOD_RULES_VERSION': 'v' * 21})
+    monkeypatch.setattr(TestingConfig, 'MOOD_RULES_VERSION', 'v' * 21)
+    with pytest.raises(ValueError):
+        create_app('testing')
+
+    features = dict(danceability=0.5, energy=0.5, acousticness=0.1, instrumentalness=0.0, speechiness=0.05)
+    with client.application.app_context():
+        db.session.add_all([AudioFeatures(id='t1', valence=0.6, **features),
+                            AudioFeatures(id='t2', valence=0.2, **features)])
+        db.session.commit()
+
+        # Step 2: Bulk re-score under the built-in rules stamps their version
+        rescore_audio_features()
+        assert {f.mood for f in AudioFeatures.query} == {'Mixed'}
+
+        # Step 3: After switching rules, displayed rows are re-scored lazily
+        client.application.config['MOOD_RULES'] = rules
+        rows = AudioFeatures.query.order_by(AudioFeatures.id).all()
+        assert refresh_stale_moods(rows) == 2
+        assert [(f.mood, f.mood_rules_version) for f in rows] == [('Happy', custom.version), ('Sad', custom.version)]
+        assert refresh_stale_moods(rows) == 0
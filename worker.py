@@ -0,0 +1,23 @@
+# worker.py
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from app import create_app, spotify_api, gpt
+from app.services.ingest_jobs import run_worker
+
+# Load config name from env, default to 'development'
+config_name = os.getenv('FLASK_CONFIG', 'development')
+app = create_app(config_name)
+
+# Main Worker Entry Point
+if __name__ == '__main__':
+    # Pass --once to drain the queue and exit (e.g. from cron)
+    run_worker(app, spotify_api, gpt, once='--once' in sys.argv)